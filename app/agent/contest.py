@@ -0,0 +1,199 @@
+import time
+import asyncio
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.protocols import AgentMessage
+from app.llm.scheduler import LLMScheduler
+
+
+PENDING, RUNNING, SOLVED, ABANDONED = "pending", "running", "solved", "abandoned"
+
+# priors of an ABC by task letter: (points, probability to solve it, expected minutes of work)
+DIFFICULTY_PRIORS = [
+    (100, 0.95, 2.0),
+    (200, 0.9, 3.0),
+    (300, 0.8, 5.0),
+    (400, 0.6, 8.0),
+    (475, 0.4, 12.0),
+    (550, 0.2, 15.0),
+    (600, 0.1, 20.0),
+]
+
+# an attempt ladder entry: solve the problem in this directory, 'success' means all local tests passed
+Attempt = Callable[[Path], Awaitable[AgentMessage]]
+
+
+@dataclass
+class ProblemBudget:
+    """The scheduling state of one problem: its value, its odds, and what was spent on it so far."""
+    problem_dir: Path
+    rank: int
+    points: float
+    p_solve: float
+    expected_minutes: float
+    status: str = PENDING
+    attempts: int = 0
+    preemptions: int = 0
+    time_spent: float = 0.0
+    result: Optional[AgentMessage] = None
+
+    @property
+    def name(self) -> str:
+        return self.problem_dir.name
+
+    def value_rate(self) -> float:
+        """Expected points per minute of work, the order in which problems are worked on."""
+        return self.points * self.p_solve / self.expected_minutes
+
+
+class ContestScheduler:
+    """
+    Spends a global wall-clock budget on the problems of a contest by expected value.
+    At most 'max_concurrent' problems are worked on at once, always the ones with the most expected points per minute,
+    so the easy problems go first. Each problem climbs an attempt ladder (e.g. pipeline, speculative solve, agent);
+    every attempt runs for a time slice proportional to the expected time of the problem and is preempted at its end.
+    Failed and preempted attempts lower the odds of a problem; solved problems and the ones that became hopeless
+    (ladder exhausted or odds below 'min_p_solve') free their slot for the next best problem.
+    """
+    def __init__(
+        self,
+        problem_dirs: List[Path],
+        attempts: List[Attempt],
+        budget: float = 100 * 60,
+        max_concurrent: int = 2,
+        slice_factor: float = 3.0,
+        failure_decay: float = 0.5,
+        preemption_decay: float = 0.7,
+        min_p_solve: float = 0.05,
+        llm_scheduler: Optional[LLMScheduler] = None,
+    ):
+        """
+        Args:
+            problem_dirs (List[Path]): The problems, in contest order (A, B, C, ...), which sets their priors.
+            attempts (List[Attempt]): The attempt ladder, cheapest first. A problem gets one attempt per rung.
+            budget (float): Wall-clock budget of the whole contest in seconds.
+            max_concurrent (int): Number of problems worked on at the same time, i.e. how the LLM and the judge are shared.
+            slice_factor (float): A time slice is this many times the expected minutes of the problem.
+            failure_decay (float): Factor applied to the odds of a problem after a failed attempt.
+            preemption_decay (float): Factor applied to the odds of a problem after a preempted attempt.
+            min_p_solve (float): Problems with lower odds are abandoned.
+            llm_scheduler (Optional[LLMScheduler]): Re-ranked on every dispatch so the LLM queue favours the most valuable problems.
+        """
+        self.attempts = attempts
+        self.budget = budget
+        self.max_concurrent = max_concurrent
+        self.slice_factor = slice_factor
+        self.failure_decay = failure_decay
+        self.preemption_decay = preemption_decay
+        self.min_p_solve = min_p_solve
+        self.llm_scheduler = llm_scheduler
+        self.problems = []
+        for rank, problem_dir in enumerate(problem_dirs):
+            points, p_solve, minutes = DIFFICULTY_PRIORS[min(rank, len(DIFFICULTY_PRIORS) - 1)]
+            self.problems.append(ProblemBudget(Path(problem_dir), rank, points, p_solve, minutes))
+        self._deadline: Optional[float] = None
+
+    def remaining(self) -> float:
+        return max(0.0, self._deadline - time.monotonic()) if self._deadline is not None else self.budget
+
+    def _next(self) -> Optional[ProblemBudget]:
+        pending = [problem for problem in self.problems if problem.status == PENDING]
+        if not pending:
+            return None
+        # prefer what can still be finished before the deadline; anything is better than an idle slot
+        fits = [problem for problem in pending if problem.expected_minutes * 60 <= self.remaining()] or pending
+        return max(fits, key=lambda problem: (problem.value_rate(), -problem.rank))
+
+    def _rerank(self):
+        if self.llm_scheduler is None:
+            return
+        active = [problem for problem in self.problems if problem.status in (PENDING, RUNNING)]
+        for order, problem in enumerate(sorted(active, key=lambda problem: -problem.value_rate())):
+            self.llm_scheduler.register_client(f"Solver-{problem.name}", order)
+
+    async def _attempt(self, problem: ProblemBudget) -> Optional[AgentMessage]:
+        """Run the next rung of the ladder within the problem's slice. None if it was preempted."""
+        attempt = self.attempts[problem.attempts]
+        time_slice = min(self.slice_factor * problem.expected_minutes * 60, self.remaining())
+        print(f"[ContestScheduler]: '{problem.name}' attempt {problem.attempts + 1}/{len(self.attempts)} for up to {time_slice:.0f}s (p={problem.p_solve:.2f}).")
+        try:
+            return await asyncio.wait_for(attempt(problem.problem_dir), timeout=time_slice)
+        except asyncio.TimeoutError:
+            return None
+
+    def _settle(self, problem: ProblemBudget, result: Optional[AgentMessage], elapsed: float):
+        problem.time_spent += elapsed
+        if result is not None and result.status == 'success':
+            problem.status = SOLVED
+            problem.result = result
+            print(f"[ContestScheduler]: '{problem.name}' solved after {problem.time_spent:.0f}s.")
+            return
+
+        if result is None:
+            # preempted: likely harder than expected, give it a longer slice on the same rung later
+            problem.preemptions += 1
+            problem.p_solve *= self.preemption_decay
+            problem.expected_minutes *= 2
+            outcome = "preempted"
+        else:
+            problem.result = result
+            problem.attempts += 1
+            problem.p_solve *= self.failure_decay
+            outcome = "failed"
+        if problem.attempts >= len(self.attempts) or problem.p_solve < self.min_p_solve:
+            problem.status = ABANDONED
+            print(f"[ContestScheduler]: '{problem.name}' {outcome}, abandoned after {problem.time_spent:.0f}s.")
+        else:
+            problem.status = PENDING
+            print(f"[ContestScheduler]: '{problem.name}' {outcome}, re-queued (p={problem.p_solve:.2f}).")
+
+    async def run(self) -> List[ProblemBudget]:
+        """Work on the problems until all are settled or the budget is spent. Unfinished attempts are cancelled at the deadline."""
+        self._deadline = time.monotonic() + self.budget
+        running: Dict[asyncio.Task, tuple] = {}
+        try:
+            while True:
+                while len(running) < self.max_concurrent and self.remaining() > 0:
+                    problem = self._next()
+                    if problem is None:
+                        break
+                    problem.status = RUNNING
+                    self._rerank()
+                    running[asyncio.ensure_future(self._attempt(problem))] = (problem, time.monotonic())
+                if not running:
+                    break
+
+                done, _ = await asyncio.wait(running, timeout=self.remaining(), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    print("[ContestScheduler]: Contest budget spent.")
+                    break
+                for task in done:
+                    problem, started = running.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        result = AgentMessage(status="failure", source="ContestScheduler", message_type="error", error=str(e))
+                    self._settle(problem, result, time.monotonic() - started)
+        finally:
+            for task, (problem, started) in running.items():
+                task.cancel()
+                problem.time_spent += time.monotonic() - started
+                problem.status = PENDING
+            await asyncio.gather(*running, return_exceptions=True)
+        return self.problems
+
+    def report(self) -> str:
+        """Per-problem status, attempts and time spent as a fixed-width text table."""
+        headers = ["problem", "status", "failed_attempts", "preemptions", "time_spent", "p_solve"]
+        cells = [headers] + [
+            [p.name, p.status, str(p.attempts), str(p.preemptions), f"{p.time_spent:.1f}", f"{p.p_solve:.2f}"]
+            for p in self.problems
+        ]
+        solved = sum(p.status == SOLVED for p in self.problems)
+        cells.append(["TOTAL", f"{solved}/{len(self.problems)} solved", "", "", f"{sum(p.time_spent for p in self.problems):.1f}", ""])
+        widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+        lines = ["  ".join(value.ljust(width) for value, width in zip(row, widths)) for row in cells]
+        lines.insert(1, "  ".join("-" * width for width in widths))
+        return "\n".join(lines)
@@ -1,19 +1,37 @@
 import asyncio
 import json
 from pathlib import Path
+from typing import Optional
 
 from app.tool.pipeline import *
 from app.agent.base import BaseAgent
 from app.protocols import AgentMessage
 from app.agent.solver import ProblemSolverAgent
+from app.agent.contest import ContestScheduler, SOLVED
+from app.llm.metrics import current_contest
 from app.tool.registry import ToolRegistry, Tool
+from app.tool.judge import judge_solution, AC
+from app.tool.code_gen import repair_code
+from app.tool.complexity import profile_complexity
+from app.tool.stress import generate_stress_programs, stress_test, BRUTE_FILE, SMALL_GENERATOR_FILE
+from app.tool.warm_pool import close_shared_pool
 from app.prompt.OVERALL_GOAL import OVERALL_GOAL_PROMPT
 
 class MasterAgent(BaseAgent):
     """
     Chief Commander of the Competition. Responsible for planning and distributing tasks to subordinate ProblemSolverAgents.
     """
-    async def execute(self, initial_goal: str, contest_url: str):
+    async def execute(self, initial_goal: str, contest_url: str, speculative: bool = False, budget: float = 100 * 60, max_concurrent: int = 2):
+        """
+        Parse the contest and solve its problems within a wall-clock budget.
+        A ContestScheduler works on the problems with the most expected points per minute first and lets each climb
+        the attempt ladder: the solve pipeline, a speculative solve (see 'speculative_solve') and finally the agentic solver.
+        With 'speculative', the pipeline rung is skipped, to get to an accepted solution sooner at the price of more LLM calls.
+
+        Args:
+            budget (float): Wall-clock budget of the contest in seconds, e.g. the 100 minutes of an ABC.
+            max_concurrent (int): Number of problems worked on at the same time.
+        """
         await self._log(f"--- MasterAgent Activated. Goal: {initial_goal} ---")
 
         # 1. 执行固定的解析流水线
@@ -39,30 +57,73 @@ class MasterAgent(BaseAgent):
         # prepare tools for each solver 
         solver_tool_registry = self._create_solver_tool_registry()
         
-        solver_tasks = []
-        for p_dir in problem_dirs:
-            solver_agent = ProblemSolverAgent(
+        # all solvers share one backend; queue their requests so it is saturated but not overloaded
+        scheduler = self.llm.scheduler or self.llm.enable_scheduler()
+        metrics = self.llm.metrics or self.llm.enable_metrics()
+        contest_name = problem_dirs[0].parent.name
+        current_contest.set(contest_name)
+
+        solvers = {}
+        for rank, p_dir in enumerate(problem_dirs):
+            solvers[p_dir] = ProblemSolverAgent(
                 problem_dir=p_dir,
                 tool_registry=solver_tool_registry,
                 llm=self.llm # TODO: use a fine-tuned llm for CP
             )
-            
-            solver_tasks.append(
-                solver_agent.execute(overall_goal=OVERALL_GOAL_PROMPT)
-            )
-        
+            # problems are listed A, B, C, ...: the easier ones win ties in the LLM queue (re-ranked by the contest scheduler)
+            scheduler.register_client(solvers[p_dir].name, rank)
+
+        last_failure = {}
+
+        def remembered(attempt):
+            async def run(p_dir: Path) -> AgentMessage:
+                result = await attempt(p_dir)
+                if result.status != 'success':
+                    last_failure[p_dir] = result.payload.get("summary") if result.payload else result.error
+                return result
+            return run
+
+        async def agent_attempt(p_dir: Path) -> AgentMessage:
+            # the agentic loop only takes over what the fixed pipelines could not solve
+            solver_agent = solvers[p_dir]
+            if not solver_agent.memory:
+                solver_agent.memory.add_note(0, f"Step 0: The deterministic solve pipeline did not reach AC: {last_failure.get(p_dir)}")
+            return await solver_agent.execute(overall_goal=OVERALL_GOAL_PROMPT)
+
+        # the fixed analyze -> plan -> code -> judge -> repair pipeline first, it needs no routing calls
+        ladder = [] if speculative else [lambda p_dir: solve_pipeline(str(p_dir), llm=self.llm)]
+        ladder += [lambda p_dir: speculative_solve(str(p_dir), llm=self.llm), agent_attempt]
+        contest = ContestScheduler(
+            problem_dirs,
+            [remembered(attempt) for attempt in ladder],
+            budget=budget,
+            max_concurrent=max_concurrent,
+            llm_scheduler=scheduler,
+        )
+
         # execute
-        await self._log(f"Dispatching {len(solver_tasks)} ProblemSolverAgents to work in parallel...")
-        solver_results = await asyncio.gather(*solver_tasks)
+        await self._log(f"Solving {len(problem_dirs)} problems within {budget / 60:.0f} minutes, {max_concurrent} at a time...")
+        try:
+            problems = await contest.run()
+        finally:
+            # the judges, stress tests and profiles all ran on the shared pool of warm workers
+            await close_shared_pool()
         
-        await self._log("\n--- All ProblemSolverAgents have finished. Final Report: ---")
+        await self._log("\n--- Contest budget used. Final Report: ---")
         successful_solves = 0
-        for res in solver_results:
-            if res.status == 'success':
+        for problem in problems:
+            if problem.status == SOLVED:
                 successful_solves += 1
-            print(res.to_json())
+            if problem.result is not None:
+                print(problem.result.to_json())
+        await self._log(f"Time spent per problem:\n{contest.report()}")
         
-        await self._log(f"\nContest processing complete. {successful_solves}/{len(solver_results)} problems were successfully processed.")
+        await self._log(f"LLM queue stats: {scheduler.stats()}")
+        metrics_path = problem_dirs[0].parent / "llm_metrics.jsonl"
+        await metrics.export_jsonl(metrics_path, contest=contest_name)
+        await self._log(f"LLM usage per problem (all calls exported to '{metrics_path}'):\n{metrics.summary_table('problem', contest=contest_name)}")
+        await self._log(f"LLM usage per stage:\n{metrics.summary_table('caller', contest=contest_name)}")
+        await self._log(f"\nContest processing complete. {successful_solves}/{len(problems)} problems were solved.")
 
     def _create_solver_tool_registry(self) -> ToolRegistry:
         """定义 ProblemSolverAgent 能使用的工具。"""
@@ -79,11 +140,50 @@ class MasterAgent(BaseAgent):
                 payload={"summary": f"Generated {num_cases} cases."}
             )
 
+        async def profile_solution_complexity(problem_dir: str, max_n: Optional[int] = None) -> AgentMessage:
+            return await profile_complexity(problem_dir=problem_dir, llm=self.llm, max_scale=max_n)
+
+        async def stress_test_solution(problem_dir: str, iterations: int = 1000) -> AgentMessage:
+            p_dir = Path(problem_dir)
+            if not ((p_dir / BRUTE_FILE).exists() and (p_dir / SMALL_GENERATOR_FILE).exists()):
+                # the plan and the statement come from the problem context
+                programs_msg = await generate_stress_programs(plan=None, description=None, problem_dir=problem_dir, llm=self.llm)
+                if programs_msg.status == 'failure':
+                    return programs_msg
+            return await stress_test(problem_dir=problem_dir, iterations=iterations)
+
+        async def repair_solution(problem_dir: str, code_file: str = "main.py") -> AgentMessage:
+            judge_msg = await judge_solution(problem_dir=problem_dir, code_file=code_file, max_failures=2)
+            if judge_msg.status == 'failure' or judge_msg.payload["verdict"] == AC:
+                return judge_msg
+            failures = [res for res in judge_msg.payload["results"] if res["verdict"] != AC]
+            return await repair_code(problem_dir=problem_dir, failures=failures, llm=self.llm, code_file=code_file)
+
         registry = ToolRegistry()
         registry.register_function(
             func=generate_test_cases,
             name="generate_additional_test_cases",
             description="Generates extra edge-case tests for the current problem. Parameters: {'num_cases': 'int'}"
         )
+        registry.register_function(
+            func=judge_solution,
+            name="judge_solution",
+            description="Runs the current main.py locally against every sol_N.in/ans_N.out pair and reports a verdict per test (AC/WA/TLE/RE/MLE with timings). The limits default to the ones on the problem page. Parameters: {'code_file': 'str', 'time_limit': 'float', 'memory_limit_mb': 'int'}"
+        )
+        registry.register_function(
+            func=profile_solution_complexity,
+            name="profile_solution_complexity",
+            description="Generates large inputs (N=10^3, 10^4, 10^5, max) with an LLM-written generator, runs main.py on them and reports the empirical time complexity. Parameters: {'max_n': 'int'}"
+        )
+        registry.register_function(
+            func=stress_test_solution,
+            name="stress_test_solution",
+            description="Compares main.py with an LLM-written brute-force solution on many small random inputs and saves the smallest disagreeing input as a verified test case. Parameters: {'iterations': 'int'}"
+        )
+        registry.register_function(
+            func=repair_solution,
+            name="repair_solution",
+            description="Judges main.py and, if it fails, rewrites it from the failing inputs with their expected and actual outputs. Parameters: {'code_file': 'str'}"
+        )
         # registry.register_function(func=generate_code, ...)
         return registry
\ No newline at end of file
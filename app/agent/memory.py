@@ -0,0 +1,134 @@
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from app.protocols import AgentMessage
+
+
+# payload fields worth keeping in the summary of an older tool result
+SUMMARY_FIELDS = ("verdict", "passed", "total", "estimate", "likely_tle", "mismatches", "code_path")
+
+
+def estimate_tokens(text: str) -> int:
+    """A cheap token count estimate (about 4 characters per token), good enough for budgeting prompts."""
+    return len(text) // 4 + 1
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars] + f"... [{len(text) - max_chars} characters truncated]"
+
+
+@dataclass
+class MemoryEntry:
+    """One line of the history. 'text' is the full record, 'summary' the compact form used for older steps."""
+    step: int
+    text: str
+    summary: str
+
+
+class AgentMemory:
+    """
+    The step history of an agent, rendered into its prompt under a token budget.
+    The last 'keep_recent' steps are kept verbatim (but compact JSON, without large payloads);
+    older tool results shrink to one-line summaries, repeated identical results collapse into a back reference,
+    and if the summaries still do not fit, the oldest ones are dropped.
+    """
+    def __init__(self, token_budget: int = 1500, keep_recent: int = 2, max_payload_tokens: int = 400):
+        """
+        Args:
+            token_budget (int): Upper bound of the estimated tokens of the rendered history.
+            keep_recent (int): Number of most recent steps that are shown in full.
+            max_payload_tokens (int): Upper bound of a single verbatim tool result.
+        """
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.max_payload_tokens = max_payload_tokens
+        self.entries: List[MemoryEntry] = []
+        # the last result summary per tool, to collapse repeated identical results
+        self._last_results: Dict[str, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __bool__(self) -> bool:
+        return bool(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+        self._last_results.clear()
+
+    def add_note(self, step: int, text: str):
+        """A short record that is kept as is, such as an error or a decision."""
+        self.entries.append(MemoryEntry(step=step, text=text, summary=text))
+
+    def add_decision(self, step: int, tool_name: str, parameters: dict):
+        self.add_note(step, f"Step {step}: Decided to use tool '{tool_name}' with parameters: {parameters}")
+
+    def add_result(self, step: int, tool_name: str, message: AgentMessage):
+        summary_line = self.summarize(message)
+        previous = self._last_results.get(tool_name)
+        if previous is not None and previous[1] == summary_line:
+            summary = f"Result from {tool_name}: same as in step {previous[0]}."
+        else:
+            summary = f"Result from {tool_name}: {summary_line}"
+            self._last_results[tool_name] = (step, summary_line)
+        text = f"Result from {tool_name}: {_truncate(self._compact_json(message), self.max_payload_tokens)}"
+        self.entries.append(MemoryEntry(step=step, text=text, summary=summary))
+
+    @staticmethod
+    def summarize(message: AgentMessage) -> str:
+        """A one-line structured summary of a tool result: status, summary or error, and the key scalar fields."""
+        parts = [message.status]
+        payload = message.payload if isinstance(message.payload, dict) else {}
+        if message.error:
+            parts.append(f"error: {message.error}")
+        elif payload.get("summary"):
+            parts.append(str(payload["summary"]))
+        fields = {k: payload[k] for k in SUMMARY_FIELDS if k in payload and k != "summary"}
+        if fields:
+            parts.append(json.dumps(fields, ensure_ascii=False))
+        return _truncate(" | ".join(parts), 80)
+
+    @staticmethod
+    def _compact_json(message: AgentMessage) -> str:
+        data = message.model_dump(exclude_none=True)
+        payload = data.get("payload")
+        if isinstance(payload, dict):
+            # long lists (per-test results, points, histories) are what blow up the prompt; keep their size only
+            data["payload"] = {
+                k: (f"<{len(v)} items>" if isinstance(v, (list, dict)) and len(json.dumps(v, default=str)) > 400 else v)
+                for k, v in payload.items()
+            }
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+    def render(self, empty_text: Optional[str] = None) -> str:
+        """The history for the prompt, within the token budget."""
+        if not self.entries:
+            return empty_text or ""
+
+        recent_steps = sorted({entry.step for entry in self.entries})[-self.keep_recent:] if self.keep_recent else []
+        recent = [entry.text for entry in self.entries if entry.step in recent_steps]
+        older = [entry.summary for entry in self.entries if entry.step not in recent_steps]
+
+        budget = self.token_budget - sum(map(estimate_tokens, recent))
+        kept = []
+        # keep the newest summaries that fit, the oldest steps matter least
+        for line in reversed(older):
+            cost = estimate_tokens(line)
+            if cost > budget:
+                break
+            kept.append(line)
+            budget -= cost
+        kept.reverse()
+
+        lines = []
+        if len(kept) < len(older):
+            lines.append(f"({len(older) - len(kept)} earlier entries omitted)")
+        return "\n".join(lines + kept + recent)
+
+    def to_list(self) -> List[Any]:
+        """The full history, e.g. for the final report."""
+        return [entry.text for entry in self.entries]
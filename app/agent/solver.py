@@ -1,70 +1,80 @@
-import json
 from pathlib import Path
+from typing import Any, Optional
+
+from pydantic import BaseModel, Field
 
 from app.agent.base import BaseAgent
+from app.context import ProblemContext, get_problem_context
+from app.agent.memory import AgentMemory
+from app.prompt.builder import build_messages
 from app.tool.registry import ToolRegistry
 from app.protocols import AgentMessage
+from app.llm.scheduler import current_client, PRIORITY_ANALYSIS
+from app.llm.metrics import current_caller, current_problem
 
 MAX_STEP = 5
 
+
+class ToolCall(BaseModel):
+    """The decision of one step: which tool to use next and with what."""
+    tool_name: str
+    parameters: dict = Field(default_factory=dict)
+
+
 class ProblemSolverAgent(BaseAgent):
     """
     An agent responsible for solving individual problems. 
     It has its own “think-act” loop and calls on specific problem solving tools.
     """
+    problem_dir: Path
+    tool_registry: Any = None
+    memory: AgentMemory = Field(default_factory=AgentMemory, description="The step history, bounded for the prompt.")
+    context: Optional[ProblemContext] = Field(None, description="The problem context shared with the tools, loaded in 'execute'.")
+
     def __init__(self, problem_dir: Path, tool_registry: ToolRegistry, **kwargs):
-        super().__init__(name=f"Solver-{problem_dir.name}", **kwargs)
-        self.problem_dir = problem_dir
-        self.tool_registry = tool_registry
+        super().__init__(name=f"Solver-{problem_dir.name}", problem_dir=problem_dir, tool_registry=tool_registry, **kwargs)
 
-    def _build_prompt(self, goal: str) -> str:
-        history_str = "\n".join(self.memory) if self.memory else "This is the first step. Analyze the problem and decide what to do next."
+    def _build_messages(self, goal: str) -> list:
+        history_str = self.memory.render("This is the first step. Analyze the problem and decide what to do next.")
         tools_prompt = self.tool_registry.get_tools_prompt()
         
-        try:
-            problem_statement = (self.problem_dir / "problem.md").read_text(encoding="utf-8")
-        except FileNotFoundError:
-            problem_statement = "Error: problem.md not found."
+        problem_statement = self.context.statement if self.context is not None else "Error: problem.md not found."
 
-        return f"""
+        task = f"""
             You are an expert competitive programming problem-solving agent. Your goal is: "{goal}" for the problem located in the directory '{self.problem_dir}'.
 
-            ### Problem Statement
-            {problem_statement}
-
-            ### History of your actions for THIS problem:
-            ---
-            {history_str}
-            ---
-
-            Here are the tools that you might use:
-            {tools_prompt}
-
             Based on the problem statement and history, what is the next single tool to use to solve this problem?
             Your response MUST be a single JSON object with "tool_name" and "parameters".
             If you believe the problem is solved or no further action is needed, use the "finish" tool.
         """
+        # only the history changes between steps: it goes last, so every step reuses the cached prefix
+        return build_messages(task, description=problem_statement, tools=tools_prompt, history=history_str)
 
     async def execute(self, overall_goal: str) -> AgentMessage:
         """Perform a single prob solution process."""
         await self._log(f"Activating to solve problem. Goal: {overall_goal}")
+        # every LLM request made from this task (tools included) is queued on behalf of this solver
+        current_client.set(self.name)
+        current_problem.set(self.problem_dir.name)
+        try:
+            self.context = await get_problem_context(self.problem_dir)
+        except FileNotFoundError as e:
+            await self._log(f"Warning: {e}")
 
         for i in range(MAX_STEP): # avoid infinite loop
             await self._log(f"--- Step {i+1}: Thinking about problem '{self.problem_dir.name}' ---")
             
-            prompt = self._build_prompt(overall_goal)
-            # TODO: change the chat
-            response_str, _ = await self.llm.chat([{"role": "user", "content": prompt}], format_type="json")
-            
+            messages = self._build_messages(overall_goal)
+            current_caller.set(self.name)
             try:
-                action = json.loads(response_str)
-                tool_name = action.get("tool_name")
-                parameters = action.get("parameters", {})
+                action, _ = await self.llm.chat_json(messages, schema=ToolCall, priority=PRIORITY_ANALYSIS)
+                tool_name = action.tool_name
+                parameters = action.parameters
             except Exception as e:
-                self.memory.append(f"Result: Failed to parse LLM response. Error: {e}")
+                self.memory.add_note(i + 1, f"Result: Failed to parse LLM response. Error: {e}")
                 continue
 
-            self.memory.append(f"Step {i+1}: Decided to use tool '{tool_name}' with parameters: {parameters}")
+            self.memory.add_decision(i + 1, tool_name, parameters)
             
             # terminate the task successfully
             if tool_name == "finish":
@@ -74,22 +84,24 @@ class ProblemSolverAgent(BaseAgent):
 
             tool_obj = self.tool_registry.get_tool(tool_name)
             if not tool_obj:
-                self.memory.append(f"Result: Error, tool '{tool_name}' does not exist.")
+                self.memory.add_note(i + 1, f"Result: Error, tool '{tool_name}' does not exist.")
                 continue
 
             try:
                 if "problem_dir" in tool_obj.callable.__code__.co_varnames:
                     parameters["problem_dir"] = str(self.problem_dir)
                 
+                # LLM calls made by the tool are accounted to it
+                current_caller.set(tool_name)
                 result_msg: AgentMessage = await tool_obj.callable(**parameters)
-                self.memory.append(f"Result from {tool_name}: {result_msg.model_dump_json(indent=2)}")
+                self.memory.add_result(i + 1, tool_name, result_msg)
             except Exception as e:
-                self.memory.append(f"Result: Error executing tool '{tool_name}': {e}")
+                self.memory.add_note(i + 1, f"Result: Error executing tool '{tool_name}': {e}")
         
         final_summary = f"Reached max steps for problem '{self.problem_dir.name}'. See history for details."
         return AgentMessage(
             source=self.name, 
             status="failure", 
             message_type="max_steps_reached", 
-            payload={"summary": final_summary, "history": self.memory}
+            payload={"summary": final_summary, "history": self.memory.to_list()}
         )
\ No newline at end of file
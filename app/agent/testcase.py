@@ -1,10 +1,10 @@
-import json
 import asyncio
 import aiofiles
 from pathlib import Path
 
 
 from app.agent.base import BaseAgent
+from app.llm.json_extract import JSONExtractionError
 
 
 class TestCaseGeneratorAgent(BaseAgent):
@@ -68,10 +68,8 @@ class TestCaseGeneratorAgent(BaseAgent):
 			await self._log("Error: LLM is not provided to the agent.")
 			return
 			
-		llm_response_str, _ = await self.llm.chat(messages, format_type="json")
-
 		try:
-			response_data = json.loads(llm_response_str)
+			response_data, _ = await self.llm.chat_json(messages)
 			generated_cases = response_data.get("test_cases", [])
 
 			if not generated_cases or not isinstance(generated_cases, list):
@@ -90,7 +88,7 @@ class TestCaseGeneratorAgent(BaseAgent):
 			await asyncio.gather(*write_tasks)
 			await self._log(f"Successfully generated and wrote {len(generated_cases)} new test cases to {target_dir}")
 
-		except json.JSONDecodeError:
-			await self._log(f"Error: Failed to decode JSON from LLM response. Response was: {llm_response_str}")
+		except JSONExtractionError as e:
+			await self._log(f"Error: Failed to decode JSON from LLM response: {e}")
 		except Exception as e:
 			await self._log(f"An unexpected error occurred: {e}")
@@ -0,0 +1,99 @@
+import re
+import asyncio
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from app.tool.problem_spec import ProblemSpec, load_problem_spec
+
+
+STATEMENT_FILE = "problem.md"
+
+
+def collect_test_cases(problem_dir: Path) -> List[Tuple[str, Path, Path]]:
+    """Return (name, input_path, answer_path) for every 'sol_N.in' that has a matching 'ans_N.out', ordered by N."""
+    cases = []
+    for input_path in Path(problem_dir).glob("sol_*.in"):
+        match = re.fullmatch(r"sol_(\d+)\.in", input_path.name)
+        answer_path = input_path.with_name(f"ans_{match.group(1)}.out") if match else None
+        if answer_path and answer_path.exists():
+            cases.append((int(match.group(1)), input_path, answer_path))
+    return [(f"case_{index}", inp, ans) for index, inp, ans in sorted(cases)]
+
+
+@dataclass
+class ProblemContext:
+    """
+    Everything known about one problem, loaded from its directory once and shared by the solver and its tools:
+    the statement, the parsed 'problem.json' (limits, constraints, formats), the samples, the analysis and plan
+    produced so far and the inventory of test cases.
+    """
+    problem_dir: Path
+    statement: str
+    spec: Optional[ProblemSpec] = None
+    samples: List[Dict[str, str]] = field(default_factory=list)
+    test_cases: List[Tuple[str, Path, Path]] = field(default_factory=list)
+    analysis: Optional[dict] = None
+    plan: Optional[dict] = None
+
+    @classmethod
+    async def load(cls, problem_dir: Path) -> "ProblemContext":
+        """Read the problem directory in a worker thread, so that concurrent solvers do not block the event loop."""
+        return await asyncio.to_thread(cls._load_sync, Path(problem_dir))
+
+    @classmethod
+    def _load_sync(cls, problem_dir: Path) -> "ProblemContext":
+        statement_path = problem_dir / STATEMENT_FILE
+        if not statement_path.exists():
+            raise FileNotFoundError(f"Could not find problem file at {statement_path}")
+        test_cases = collect_test_cases(problem_dir)
+        samples = []
+        for name, input_path, answer_path in test_cases:
+            # the official samples are the first cases, generated ones start at 101
+            if int(name.split("_")[1]) > 100:
+                break
+            samples.append({
+                "input": input_path.read_text(encoding="utf-8"),
+                "output": answer_path.read_text(encoding="utf-8"),
+            })
+        return cls(
+            problem_dir=problem_dir,
+            statement=statement_path.read_text(encoding="utf-8"),
+            spec=load_problem_spec(problem_dir),
+            samples=samples,
+            test_cases=test_cases,
+        )
+
+    async def refresh_tests(self):
+        """Re-scan the test cases, after a tool added some (generated cases, stress test counterexamples)."""
+        self.test_cases = await asyncio.to_thread(collect_test_cases, self.problem_dir)
+
+
+_contexts: Dict[Path, ProblemContext] = {}
+_loading: Dict[Path, asyncio.Future] = {}
+
+
+async def get_problem_context(problem_dir) -> ProblemContext:
+    """The shared context of a problem directory, loaded on first use. Concurrent first uses share one load."""
+    key = Path(problem_dir).resolve()
+    if key not in _contexts:
+        if key not in _loading:
+            _loading[key] = asyncio.ensure_future(ProblemContext.load(Path(problem_dir)))
+        loading = _loading[key]
+        try:
+            # shielded: a cancelled solver must not cancel the load the others are waiting for
+            _contexts[key] = await asyncio.shield(loading)
+        finally:
+            if loading.done():
+                _loading.pop(key, None)
+    return _contexts[key]
+
+
+def peek_problem_context(problem_dir) -> Optional[ProblemContext]:
+    """The context of a problem directory if it was already loaded, without loading it."""
+    return _contexts.get(Path(problem_dir).resolve())
+
+
+def invalidate_problem_context(problem_dir):
+    """Forget the context of a problem directory, e.g. after its statement was fetched again."""
+    _contexts.pop(Path(problem_dir).resolve(), None)
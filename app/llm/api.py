@@ -1,7 +1,8 @@
 import os
 import sys
 import openai
-from typing import Optional
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
 
 from app.agent.base import BaseLLM
 
@@ -11,13 +12,20 @@ class ApiLLM(BaseLLM):
     It uses the openai library as a generic interface.
     NOTE: Using ApiLLM.create(...) to create LLM is safer.
     """
-    def __init__(self, model_name: str, api_key: Optional[str] = None, base_url: Optional[str] = None):
+
+    DEFAULT_MAX_IN_FLIGHT = 8
+    SUPPORTS_N = True
+
+    def __init__(self, model_name: str, api_key: Optional[str] = None, base_url: Optional[str] = None, supports_n: bool = True):
         """
         Args:
             model_name (str): name of the model to use (e.g., "gpt-4o", "llama3-8b-8192").
             api_key (Optional[str]): API key. If None, will try to read it from the environment variable.
             base_url (Optional[str]): address of the API. If None, the official OpenAI address is used.
+            supports_n (bool): whether the endpoint accepts "n" > 1. Some OpenAI-compatible servers (e.g. Groq) do not,
+                then 'chat_n' sends concurrent requests instead.
         """
+        self.SUPPORTS_N = supports_n
         
         self.api_key = api_key or os.getenv("OPENAI_API_KEY") or os.getenv("GROQ_API_KEY")
         if not self.api_key:
@@ -44,24 +52,62 @@ class ApiLLM(BaseLLM):
             print(f"Could not verify model with the API. Please check your API key and model name. Error: {e}")
             sys.exit(1)
 
-    async def chat(self, messages: list, format_type: Optional[str] = None) -> tuple:
+    async def _chat(self, messages: list, format_type: Optional[str] = None, options: Optional[dict] = None) -> tuple:
+        contents, response_time, usage = await self._chat_n(messages, 1, format_type, options)
+        return contents[0], response_time, usage
+
+    async def _chat_n(self, messages: list, n: int, format_type: Optional[str] = None, options: Optional[dict] = None) -> tuple:
+        """Send one request asking for 'n' samples. Return (contents, response time, usage)."""
         try:
             chat_options = {
                 "model": self.model_name,
                 "messages": messages,
-                "n": 1,
+                "n": n,
             }
+            if options:
+                # OpenAI-compatible sampling parameters, e.g. temperature, top_p, seed, max_tokens
+                chat_options.update(options)
             if format_type == "json":
                 print(f"  (Using JSON mode for '{self.model_name}')")
                 chat_options["response_format"] = {"type": "json_object"}
 
             response = await self.client.chat.completions.create(**chat_options)
 
-            content = response.choices[0].message.content
+            contents = [choice.message.content for choice in response.choices]
+            response_time = datetime.fromtimestamp(response.created, timezone.utc).isoformat()
+            usage = {
+                "prompt_tokens": response.usage.prompt_tokens if response.usage else None,
+                "completion_tokens": response.usage.completion_tokens if response.usage else None,
+                "model": response.model,
+            }
 
-            return content, "NOT AVAILABLE"
+            return contents, response_time, usage
 
         except Exception as e:
             error_message = f"An error occurred while interacting with the API: {e}"
             print(error_message)
-            return error_message, None
\ No newline at end of file
+            return [error_message], None, None
+
+    async def _stream(self, messages: list, format_type: Optional[str] = None, options: Optional[dict] = None, usage: Optional[dict] = None) -> AsyncIterator[str]:
+        chat_options = {
+            "model": self.model_name,
+            "messages": messages,
+            "stream": True,
+            # the last chunk then carries the token counts
+            "stream_options": {"include_usage": True},
+        }
+        if options:
+            chat_options.update(options)
+        if format_type == "json":
+            chat_options["response_format"] = {"type": "json_object"}
+
+        stream = await self.client.chat.completions.create(**chat_options)
+        try:
+            async for chunk in stream:
+                if chunk.usage is not None and usage is not None:
+                    usage.update(prompt_tokens=chunk.usage.prompt_tokens, completion_tokens=chunk.usage.completion_tokens)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # closing the HTTP response makes the server stop generating
+            await stream.close()
@@ -1,13 +1,45 @@
 import re
 import sys
+import time
 import asyncio
-from typing import Optional
+from contextlib import nullcontext
+from contextvars import ContextVar
+from datetime import datetime, timezone
 from abc import ABC, abstractmethod
+from typing import AsyncIterator, Callable, Optional, Type
+
+from pydantic import BaseModel
+
+from app.llm.cache import LLMResponseCache
+from app.llm.metrics import LLMMetrics
+from app.llm.json_extract import JSONExtractionError, JSONObjectScanner, extract_json
+from app.llm.scheduler import LLMScheduler, PRIORITY_DEFAULT, current_client
+
+
+# sampling options (e.g. {"temperature": 0.8}) applied to every request made from the current task,
+# so a whole chain of tools can be run at another temperature without passing options through each of them
+current_sampling: ContextVar[Optional[dict]] = ContextVar("current_sampling", default=None)
+
+
+def _with_sampling(options: Optional[dict]) -> Optional[dict]:
+    """The options of a request on top of the sampling options of the current task; explicit options win."""
+    sampling = current_sampling.get()
+    if not sampling:
+        return options
+    return {**sampling, **(options or {})}
 
 
 class BaseLLM(ABC):
     """An abstract LLM class."""
 
+    # concurrent requests a backend of this type handles well, used by 'enable_scheduler'
+    DEFAULT_MAX_IN_FLIGHT = 2
+    # whether one request can return several samples; a backend that sets it implements
+    # '_chat_n(messages, n, format_type, options)' -> (contents, response time, usage)
+    SUPPORTS_N = False
+    # how long Ollama keeps the model (and its prompt cache) loaded after a request; its own default is 5 minutes
+    DEFAULT_KEEP_ALIVE = "30m"
+
     def __init__(self, model_name: str):
         """
         Initialize the LLM based on the name of the model.
@@ -23,6 +55,10 @@ class BaseLLM(ABC):
         print(f"Start initializing the LLM: {model_name}...")
         self.model_name = model_name
         self.client = self._create_client()
+        self.cache: Optional[LLMResponseCache] = None
+        self.scheduler: Optional[LLMScheduler] = None
+        self.metrics: Optional[LLMMetrics] = None
+        self.keep_alive: Optional[str] = self.DEFAULT_KEEP_ALIVE
 
     @classmethod
     async def create(cls, model_name: str, **kwargs):
@@ -57,14 +93,279 @@ class BaseLLM(ABC):
             print(f"Can not build the service. Error : {e}")
             sys.exit(1)
 
-    async def chat(self, messages: list, format_type: Optional[str] = None) -> tuple:
-        """This method could communicate with the LLM. Return the Tuple(response part, response time)."""
+    def enable_cache(self, cache: Optional[LLMResponseCache] = None) -> LLMResponseCache:
+        """Replay identical requests from a persistent response cache. Uses the default on-disk cache if none is given."""
+        self.cache = cache or LLMResponseCache()
+        return self.cache
+
+    def enable_scheduler(self, max_in_flight: Optional[int] = None) -> LLMScheduler:
+        """Put a concurrency-limited, priority-aware scheduler in front of this backend."""
+        self.scheduler = LLMScheduler(max_in_flight or self.DEFAULT_MAX_IN_FLIGHT)
+        return self.scheduler
+
+    def enable_metrics(self, metrics: Optional[LLMMetrics] = None) -> LLMMetrics:
+        """Record tokens, latency and the caller of every request. Pass a shared LLMMetrics to collect several LLMs in one place."""
+        self.metrics = metrics or LLMMetrics()
+        return self.metrics
+
+    def _record(self, call: Optional[dict], client: Optional[str], usage: Optional[dict] = None, **fields):
+        if call is not None:
+            self.metrics.record(call, self.model_name, client if client is not None else current_client.get(), usage, **fields)
+
+    async def chat(
+        self,
+        messages: list,
+        format_type: Optional[str] = None,
+        options: Optional[dict] = None,
+        use_cache: bool = True,
+        priority: int = PRIORITY_DEFAULT,
+        client: Optional[str] = None,
+    ) -> tuple:
+        """
+        This method could communicate with the LLM. Return the Tuple(response part, response time).
+        If the request fails, the response time is None and the response part is the error message: check it before using the text.
+
+        Args:
+            messages (list): Chat messages.
+            format_type (Optional[str]): "json" to ask the model for a JSON object.
+            options (Optional[dict]): Sampling options such as {"temperature": 0, "seed": 42}.
+            use_cache (bool): Look the request up in the response cache (if one is enabled). Failed requests are never cached.
+            priority (int): Priority class for the scheduler (see app.llm.scheduler), lower is served first.
+            client (Optional[str]): Who the request is for, used for fair queuing. Defaults to the current solver.
+        """
+        options = _with_sampling(options)
+        call = self.metrics.start() if self.metrics is not None else None
+        key = None
+        if self.cache is not None and use_cache:
+            key = LLMResponseCache.make_key(self.model_name, messages, format_type, options)
+            cached = await self.cache.get(key)
+            if cached is not None:
+                self._record(call, client, cache_hit=True)
+                return cached["content"], cached["response_time"]
+
+        queued_at = time.perf_counter()
+        async with self._admission(priority, client):
+            queue_wait = time.perf_counter() - queued_at
+            content, response_time, usage = await self._chat(messages, format_type, options)
+        self._record(call, client, usage, queue_wait=round(queue_wait, 4), ok=response_time is not None)
+
+        if key is not None and response_time is not None:
+            await self.cache.put(key, {"content": content, "response_time": response_time})
+        return content, response_time
+
+    def _admission(self, priority: int, client: Optional[str]):
+        """A scheduler slot if a scheduler is enabled, otherwise a no-op."""
+        return self.scheduler.slot(priority, client) if self.scheduler is not None else nullcontext()
+
+    async def stream_chat(
+        self,
+        messages: list,
+        format_type: Optional[str] = None,
+        options: Optional[dict] = None,
+        priority: int = PRIORITY_DEFAULT,
+        client: Optional[str] = None,
+        usage: Optional[dict] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream the response as text chunks (roughly one token each). Closing the iterator early
+        (e.g. by breaking out of 'async for' and calling 'aclose') stops the generation on the backend.
+        If 'usage' is given, the token counts the backend reports at the end of the stream are stored in it.
+        """
+        options = _with_sampling(options)
+        async with self._admission(priority, client):
+            async for chunk in self._stream(messages, format_type, options, usage):
+                yield chunk
+
+    async def chat_until(
+        self,
+        messages: list,
+        stop_when: Optional[Callable[[str], bool]] = None,
+        max_tokens: Optional[int] = None,
+        format_type: Optional[str] = None,
+        options: Optional[dict] = None,
+        use_cache: bool = True,
+        priority: int = PRIORITY_DEFAULT,
+        client: Optional[str] = None,
+        stop_key: Optional[str] = None,
+    ) -> tuple:
+        """
+        Like 'chat', but streams the response and cancels the generation as soon as 'stop_when(text so far)' is true
+        or 'max_tokens' chunks arrived. Return the Tuple(response part, response time).
+
+        Args:
+            stop_when (Optional[Callable[[str], bool]]): Predicate on the accumulated text, e.g. "the code block is closed".
+            max_tokens (Optional[int]): Token budget of the response.
+            stop_key (Optional[str]): Name of the stop rule in the cache key. Defaults to the qualified name of 'stop_when'.
+        """
+        options = _with_sampling(options)
+        call = self.metrics.start() if self.metrics is not None else None
+        key = None
+        if self.cache is not None and use_cache:
+            # a truncated response is only valid for the same stop rule and budget
+            stop_rule = stop_key if stop_key is not None else getattr(stop_when, "__qualname__", None)
+            key = LLMResponseCache.make_key(self.model_name, messages, format_type, options, stop_when=stop_rule, max_tokens=max_tokens)
+            cached = await self.cache.get(key)
+            if cached is not None:
+                self._record(call, client, cache_hit=True, streamed=True)
+                return cached["content"], cached["response_time"]
+
+        content = ""
+        received = 0
+        # only a response that ended by itself or by 'stop_when' is complete; one cut by the budget is not cached
+        complete = True
+        usage = {}
+        start = time.perf_counter()
+        stream = self.stream_chat(messages, format_type, options, priority=priority, client=client, usage=usage)
+        try:
+            async for chunk in stream:
+                if not received:
+                    # includes the queue wait, which is part of what the caller experiences
+                    usage["ttft"] = round(time.perf_counter() - start, 4)
+                content += chunk
+                received += 1
+                if stop_when is not None and stop_when(content):
+                    break
+                if max_tokens is not None and received >= max_tokens:
+                    print(f"Stopped the generation of '{self.model_name}' after the budget of {max_tokens} tokens.")
+                    complete = False
+                    break
+        except Exception as e:
+            error_message = f"Some error occur when streaming: {e}"
+            print(error_message)
+            self._record(call, client, usage, ok=False, streamed=True)
+            return error_message, None
+        finally:
+            await stream.aclose()
+
+        # a stream that was stopped early never gets the final usage report, count the chunks instead
+        usage.setdefault("completion_tokens", received)
+        self._record(call, client, usage, streamed=True)
+        response_time = datetime.now(timezone.utc).isoformat()
+        if key is not None and complete:
+            await self.cache.put(key, {"content": content, "response_time": response_time})
+        return content, response_time
+
+    async def chat_json(
+        self,
+        messages: list,
+        schema: Optional[Type[BaseModel]] = None,
+        max_tokens: Optional[int] = None,
+        options: Optional[dict] = None,
+        use_cache: bool = True,
+        priority: int = PRIORITY_DEFAULT,
+        client: Optional[str] = None,
+    ) -> tuple:
+        """
+        Ask for a JSON object. The response is streamed and stopped as soon as the object is closed, then extracted
+        tolerantly (see app.llm.json_extract). Return the Tuple(parsed object, response time); the object is an
+        instance of 'schema' if one is given, a dict otherwise.
+        Only a response the object could be extracted from (and validated) is cached.
+
+        Raises:
+            JSONExtractionError: The request failed or the response holds no parsable object.
+            pydantic.ValidationError: The object does not fit 'schema'.
+        """
+        options = _with_sampling(options)
+        key = None
+        if self.cache is not None and use_cache:
+            key = LLMResponseCache.make_key(self.model_name, messages, "json", options, stop_when=JSONObjectScanner.__qualname__, max_tokens=max_tokens)
+            cached = await self.cache.get(key)
+            if cached is not None:
+                try:
+                    value = extract_json(cached["content"], schema)
+                except ValueError:
+                    # cached for another schema, ask again
+                    pass
+                else:
+                    call = self.metrics.start() if self.metrics is not None else None
+                    self._record(call, client, cache_hit=True, streamed=True)
+                    return value, cached["response_time"]
+
+        content, response_time = await self.chat_until(
+            messages,
+            stop_when=JSONObjectScanner(),
+            max_tokens=max_tokens,
+            format_type="json",
+            options=options,
+            use_cache=False,
+            priority=priority,
+            client=client,
+        )
+        if response_time is None:
+            raise JSONExtractionError(content)
+        value = extract_json(content, schema)
+        if key is not None:
+            await self.cache.put(key, {"content": content, "response_time": response_time})
+        return value, response_time
+
+    async def chat_n(
+        self,
+        messages: list,
+        n: int,
+        format_type: Optional[str] = None,
+        options: Optional[dict] = None,
+        use_cache: bool = True,
+        priority: int = PRIORITY_DEFAULT,
+        client: Optional[str] = None,
+    ) -> tuple:
+        """
+        Draw 'n' independent samples for the same messages. Return the Tuple(list of response parts, response time),
+        or ([error message], None) if no sample could be generated.
+        Backends that support it answer with one batched request, the others get 'n' concurrent requests.
+        """
+        options = _with_sampling(options)
+        call = self.metrics.start() if self.metrics is not None else None
+        key = None
+        if self.cache is not None and use_cache:
+            key = LLMResponseCache.make_key(self.model_name, messages, format_type, options, n=n)
+            cached = await self.cache.get(key)
+            if cached is not None:
+                self._record(call, client, cache_hit=True, samples=n)
+                return cached["content"], cached["response_time"]
+
+        if self.SUPPORTS_N:
+            queued_at = time.perf_counter()
+            async with self._admission(priority, client):
+                queue_wait = time.perf_counter() - queued_at
+                contents, response_time, usage = await self._chat_n(messages, n, format_type, options)
+            self._record(call, client, usage, queue_wait=round(queue_wait, 4), samples=n, ok=response_time is not None)
+        else:
+            # every request is recorded on its own by 'chat'
+            results = await asyncio.gather(*[
+                self.chat(messages, format_type, self._sample_options(options, i), use_cache=False, priority=priority, client=client)
+                for i in range(n)
+            ])
+            contents = [content for content, response_time in results if response_time is not None]
+            response_time = max((response_time for _, response_time in results if response_time is not None), default=None)
+            if response_time is None:
+                contents = [results[0][0]]
+
+        if key is not None and response_time is not None:
+            await self.cache.put(key, {"content": contents, "response_time": response_time})
+        return contents, response_time
+
+    @staticmethod
+    def _sample_options(options: Optional[dict], index: int) -> Optional[dict]:
+        # with a fixed seed every request would return the same sample
+        if not options or "seed" not in options:
+            return options
+        return {**options, "seed": options["seed"] + index}
+
+    async def _chat(self, messages: list, format_type: Optional[str] = None, options: Optional[dict] = None) -> tuple:
+        """
+        Send one request to the backend. Return (content, response time, usage), or (error message, None, None) on failure.
+        The usage dict holds what the backend reports: 'prompt_tokens', 'completion_tokens' and 'ttft' (in seconds).
+        """
         try:
             chat_options = {
                 "model": self.model_name,
                 "messages": messages,
-                # "options": {"temperature": 0}
             }
+            if options:
+                chat_options["options"] = options
+            if self.keep_alive is not None:
+                # an unloaded model loses its KV cache, and the next request pays the full prefill again
+                chat_options["keep_alive"] = self.keep_alive
 
             # TODO: some model does not contain the 'format_type' option, such as 'gemma'
             # add a whitelist and use re?
@@ -76,9 +377,44 @@ class BaseLLM(ABC):
             content = response["message"]["content"]
             response_time = response["created_at"]
 
-            return content, response_time
+            return content, response_time, self._ollama_usage(response)
 
         except Exception as e:
             error_message = f"Some error occur when interacting: {e}"
             print(error_message)
-            return error_message
+            return error_message, None, None
+
+    @staticmethod
+    def _ollama_usage(response) -> dict:
+        # durations are reported in nanoseconds; the first token comes right after loading and the prompt evaluation
+        load, prompt_eval = response.get("load_duration"), response.get("prompt_eval_duration")
+        return {
+            "prompt_tokens": response.get("prompt_eval_count"),
+            "completion_tokens": response.get("eval_count"),
+            "ttft": round(((load or 0) + prompt_eval) / 1e9, 4) if prompt_eval is not None else None,
+        }
+
+    async def _stream(self, messages: list, format_type: Optional[str] = None, options: Optional[dict] = None, usage: Optional[dict] = None) -> AsyncIterator[str]:
+        """Stream one request from the backend as text chunks, filling 'usage' at the end. Errors are raised to the caller."""
+        chat_options = {
+            "model": self.model_name,
+            "messages": messages,
+            "stream": True,
+        }
+        if options:
+            chat_options["options"] = options
+        if self.keep_alive is not None:
+            chat_options["keep_alive"] = self.keep_alive
+        if format_type == "json":
+            chat_options["format"] = "json"
+
+        parts = await self.client.chat(**chat_options)
+        try:
+            async for part in parts:
+                if part.get("done") and usage is not None:
+                    reported = self._ollama_usage(part)
+                    usage.update({k: v for k, v in reported.items() if v is not None and k != "ttft"})
+                yield part["message"]["content"]
+        finally:
+            # closing the response stream makes the server stop generating
+            await parts.aclose()
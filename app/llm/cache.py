@@ -0,0 +1,90 @@
+import os
+import json
+import asyncio
+import hashlib
+import aiofiles
+from pathlib import Path
+from typing import Any, Optional
+
+
+DEFAULT_CACHE_DIR = Path(".cache") / "llm"
+
+
+class LLMResponseCache:
+    """
+    A persistent, content-addressed cache of LLM responses.
+    The key is the sha256 of the model name, the messages, the format type and the sampling options,
+    so an identical request replays the stored response instead of running the model again.
+    Entries are evicted least recently used first once the cache grows beyond 'max_bytes'.
+    """
+    def __init__(self, cache_dir: Path = DEFAULT_CACHE_DIR, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            cache_dir (Path): Directory where the responses are stored.
+            max_bytes (int): Upper bound of the total size of the cache.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(model_name: str, messages: list, format_type: Optional[str] = None, options: Optional[dict] = None, **extra) -> str:
+        request = {
+            "model": model_name,
+            "messages": messages,
+            "format_type": format_type,
+            "options": options or {},
+            **extra,
+        }
+        return hashlib.sha256(json.dumps(request, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    async def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            async with aiofiles.open(path, "r", encoding="utf-8") as f:
+                value = json.loads(await f.read())
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+
+        # the access time drives the LRU eviction
+        os.utime(path)
+        self.hits += 1
+        return value
+
+    async def put(self, key: str, value: Any):
+        async with aiofiles.open(self._path(key), "w", encoding="utf-8") as f:
+            await f.write(json.dumps(value, ensure_ascii=False))
+        await asyncio.to_thread(self._enforce_size_limit)
+
+    def _enforce_size_limit(self):
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            path.unlink(missing_ok=True)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,210 @@
+import re
+import ast
+import json
+from typing import Any, Optional, Type
+
+from pydantic import BaseModel
+
+
+THINK_OPEN, THINK_CLOSE = "<think>", "</think>"
+
+# Python spellings some models use outside of strings
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+SMART_QUOTES = str.maketrans({"“": '"', "”": '"'})
+
+
+class JSONExtractionError(ValueError):
+    """The response holds no JSON object that could be parsed (or repaired)."""
+
+
+def strip_reasoning(text: str) -> str:
+    """The response without its <think> ... </think> sections. An unclosed section is dropped up to the end."""
+    text = re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL)
+    if THINK_OPEN in text:
+        text = text.split(THINK_OPEN, 1)[0]
+    return text
+
+
+class JSONObjectScanner:
+    """
+    Finds the first complete top-level JSON object in a text that only grows, such as a streamed response.
+    Every call scans only what was appended since the previous one, so it can be the 'stop_when' of 'chat_until'
+    and cut the generation as soon as the object is closed. A leading <think> section is skipped, and brace pairs
+    that do not parse to a non-empty object (e.g. "{x}" or "{}" in prose) are passed over.
+    """
+    def __init__(self):
+        self.closed: Optional[str] = None
+        self.start: Optional[int] = None
+        self._base: Optional[int] = None
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def __call__(self, text: str) -> bool:
+        if self.closed is not None:
+            return True
+        if self._base is None:
+            head = text.lstrip()
+            if head.startswith(THINK_OPEN):
+                end = text.find(THINK_CLOSE)
+                if end < 0:
+                    return False
+                self._base = end + len(THINK_CLOSE)
+            elif THINK_OPEN.startswith(head):
+                # too short to tell whether a reasoning section starts here
+                return False
+            else:
+                self._base = 0
+            self._pos = self._base
+
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            if self.start is None:
+                if char == "{":
+                    self.start, self._depth = i, 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    candidate = text[self.start:i + 1]
+                    self._pos = i + 1
+                    try:
+                        value = loads_lenient(candidate)
+                    except JSONExtractionError:
+                        value = None
+                    if not value or not isinstance(value, dict):
+                        self.start = None
+                        continue
+                    self.closed = candidate
+                    return True
+        self._pos = len(text)
+        return False
+
+
+def repair_json(candidate: str) -> str:
+    """
+    Fix the usual defects of LLM-written JSON in one pass: comments, trailing commas, Python literals,
+    typographic quotes, raw line breaks inside strings, and a truncated end (open strings and brackets are closed).
+    """
+    candidate = candidate.translate(SMART_QUOTES)
+    out = []
+    stack = []
+    in_string = escape = False
+    i, n = 0, len(candidate)
+    while i < n:
+        char = candidate[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            elif char == "\n":
+                char = "\\n"
+            elif char == "\t":
+                char = "\\t"
+            out.append(char)
+            i += 1
+            continue
+
+        if candidate.startswith("//", i):
+            i = candidate.find("\n", i) if "\n" in candidate[i:] else n
+            continue
+        if candidate.startswith("/*", i):
+            end = candidate.find("*/", i + 2)
+            i = end + 2 if end >= 0 else n
+            continue
+        literal = next((word for word in PYTHON_LITERALS if candidate.startswith(word, i)), None)
+        if literal and not (i and (candidate[i - 1].isalnum() or candidate[i - 1] == "_")):
+            out.append(PYTHON_LITERALS[literal])
+            i += len(literal)
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            _drop_trailing_comma(out)
+            if stack:
+                stack.pop()
+        out.append(char)
+        i += 1
+
+    # a truncated response: finish the open string, value and brackets
+    if in_string:
+        out.append('"')
+    text = "".join(out).rstrip()
+    if text.endswith(":"):
+        text += " null"
+    text = text.rstrip(",")
+    return text + "".join(reversed(stack))
+
+
+def _drop_trailing_comma(out: list):
+    j = len(out) - 1
+    while j >= 0 and out[j].isspace():
+        j -= 1
+    if j >= 0 and out[j] == ",":
+        del out[j]
+
+
+def loads_lenient(candidate: str) -> Any:
+    """json.loads, then json.loads of the repaired text, then a Python literal (single quotes)."""
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(repair_json(candidate))
+    except json.JSONDecodeError as e:
+        error = e
+    try:
+        value = ast.literal_eval(candidate)
+        if isinstance(value, dict):
+            return value
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        pass
+    raise JSONExtractionError(f"Could not parse the JSON object: {error}")
+
+
+def extract_json(text: str, schema: Optional[Type[BaseModel]] = None) -> Any:
+    """
+    The JSON object of an LLM response: reasoning sections, prose and code fences around it are ignored,
+    common defects are repaired, and a response that was cut off is closed.
+
+    Args:
+        text (str): The response.
+        schema (Optional[Type[BaseModel]]): Validate the object against this model and return the model instead of a dict.
+
+    Raises:
+        JSONExtractionError: There is no parsable object. pydantic's ValidationError (also a ValueError) if it does not fit the schema.
+    """
+    body = strip_reasoning(text).strip()
+    try:
+        value = json.loads(body)
+    except json.JSONDecodeError:
+        scanner = JSONObjectScanner()
+        if scanner(body):
+            value = loads_lenient(scanner.closed)
+        elif scanner.start is not None:
+            # never closed, e.g. the token budget ran out
+            value = loads_lenient(body[scanner.start:])
+        else:
+            raise JSONExtractionError(f"No JSON object in the response: {body[:200]!r}")
+    if not isinstance(value, dict):
+        raise JSONExtractionError(f"Expected a JSON object, got {type(value).__name__}.")
+    return schema.model_validate(value) if schema is not None else value
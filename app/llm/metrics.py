@@ -0,0 +1,188 @@
+import json
+import time
+import inspect
+import aiofiles
+from pathlib import Path
+from contextvars import ContextVar
+from dataclasses import dataclass, asdict, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+
+# the problem and contest the current task works on, used to aggregate the metrics
+current_problem: ContextVar[Optional[str]] = ContextVar("llm_problem", default=None)
+current_contest: ContextVar[Optional[str]] = ContextVar("llm_contest", default=None)
+# the tool or agent on whose behalf the current task talks to the LLM; inferred from the call stack if unset
+current_caller: ContextVar[Optional[str]] = ContextVar("llm_caller", default=None)
+
+SUMMARY_COLUMNS = ["calls", "cache_hits", "errors", "prompt_tokens", "completion_tokens", "total_latency", "mean_latency", "median_ttft"]
+
+
+def resolve_caller() -> Optional[str]:
+    """The current caller, or the first function outside of app.llm on the call stack (e.g. 'analyze_problem')."""
+    caller = current_caller.get()
+    if caller is not None:
+        return caller
+    # None on interpreters without frame support, the caller is then unknown
+    frame = inspect.currentframe()
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if not module.startswith("app.llm"):
+            if not module.startswith("app."):
+                return None
+            # co_qualname (e.g. 'SolverAgent.run') exists from Python 3.11 on
+            return getattr(frame.f_code, "co_qualname", frame.f_code.co_name)
+        frame = frame.f_back
+    return None
+
+
+@dataclass
+class LLMCallRecord:
+    """Metrics of one LLM call. Token counts and time-to-first-token are None where the backend does not report them."""
+    model: str
+    caller: Optional[str]
+    client: Optional[str]
+    problem: Optional[str]
+    contest: Optional[str]
+    started_at: str
+    latency: float
+    queue_wait: float = 0.0
+    ttft: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    samples: int = 1
+    cache_hit: bool = False
+    ok: bool = True
+    streamed: bool = False
+
+
+@dataclass
+class _Aggregate:
+    calls: int = 0
+    cache_hits: int = 0
+    errors: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency: float = 0.0
+    ttfts: List[float] = field(default_factory=list)
+
+    def add(self, record: LLMCallRecord):
+        self.calls += 1
+        self.cache_hits += record.cache_hit
+        self.errors += not record.ok
+        self.prompt_tokens += record.prompt_tokens or 0
+        self.completion_tokens += record.completion_tokens or 0
+        self.latency += record.latency
+        if record.ttft is not None:
+            self.ttfts.append(record.ttft)
+
+    def merge(self, other: "_Aggregate"):
+        self.calls += other.calls
+        self.cache_hits += other.cache_hits
+        self.errors += other.errors
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.latency += other.latency
+        self.ttfts.extend(other.ttfts)
+
+    def summary(self) -> dict:
+        ttfts = sorted(self.ttfts)
+        return {
+            "calls": self.calls,
+            "cache_hits": self.cache_hits,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_latency": round(self.latency, 2),
+            "mean_latency": round(self.latency / self.calls, 2) if self.calls else 0.0,
+            "median_ttft": round(ttfts[len(ttfts) // 2], 2) if ttfts else None,
+        }
+
+
+class LLMMetrics:
+    """
+    Collects one LLMCallRecord per LLM call: tokens, time-to-first-token, latency, queue wait, model, caller and
+    cache hits, tagged with the problem and contest of the calling task.
+    The records can be aggregated (per problem, contest, caller or model) and exported as JSONL.
+    """
+    def __init__(self):
+        self.records: List[LLMCallRecord] = []
+
+    def start(self) -> dict:
+        """Capture the context of a call that is about to start; pass it to 'record' when the call is done."""
+        return {
+            "caller": resolve_caller(),
+            "problem": current_problem.get(),
+            "contest": current_contest.get(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "start": time.perf_counter(),
+        }
+
+    def record(self, call: dict, model: str, client: Optional[str], usage: Optional[dict] = None, **fields) -> LLMCallRecord:
+        """
+        Args:
+            call (dict): What 'start' returned.
+            model (str): Model that answered.
+            client (Optional[str]): Client the request was scheduled for.
+            usage (Optional[dict]): Usage reported by the backend: 'prompt_tokens', 'completion_tokens', 'ttft', 'model'.
+            fields: Other LLMCallRecord fields, e.g. cache_hit, ok, queue_wait.
+        """
+        usage = usage or {}
+        record = LLMCallRecord(
+            model=usage.get("model") or model,
+            caller=call["caller"],
+            client=client,
+            problem=call["problem"],
+            contest=call["contest"],
+            started_at=call["started_at"],
+            latency=round(time.perf_counter() - call["start"], 4),
+            ttft=usage.get("ttft"),
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+            **fields,
+        )
+        self.records.append(record)
+        return record
+
+    def _groups(self, by: str, contest: Optional[str]) -> Dict[str, _Aggregate]:
+        groups: Dict[str, _Aggregate] = {}
+        for record in self.records:
+            if contest is not None and record.contest != contest:
+                continue
+            groups.setdefault(str(getattr(record, by)), _Aggregate()).add(record)
+        return groups
+
+    def aggregate(self, by: str = "problem", contest: Optional[str] = None) -> Dict[str, dict]:
+        """
+        Totals grouped by one LLMCallRecord field ('problem', 'contest', 'caller', 'model').
+
+        Args:
+            by (str): Field to group by.
+            contest (Optional[str]): Only count the calls made for this contest.
+        """
+        return {key: agg.summary() for key, agg in sorted(self._groups(by, contest).items())}
+
+    def summary_table(self, by: str = "problem", contest: Optional[str] = None) -> str:
+        """The aggregate as a fixed-width text table with a total row."""
+        groups = sorted(self._groups(by, contest).items())
+        total = _Aggregate()
+        for _, agg in groups:
+            total.merge(agg)
+
+        rows = [(key, agg.summary()) for key, agg in groups]
+        if groups:
+            rows.append(("TOTAL", total.summary()))
+        headers = [by] + SUMMARY_COLUMNS
+        cells = [headers] + [[key] + [str("-" if summary[c] is None else summary[c]) for c in SUMMARY_COLUMNS] for key, summary in rows]
+        widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+        lines = ["  ".join(value.ljust(width) for value, width in zip(row, widths)) for row in cells]
+        lines.insert(1, "  ".join("-" * width for width in widths))
+        return "\n".join(lines)
+
+    async def export_jsonl(self, path: Path, contest: Optional[str] = None):
+        """Write one JSON object per call to 'path'."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        lines = [json.dumps(asdict(r), ensure_ascii=False) for r in self.records if contest is None or r.contest == contest]
+        async with aiofiles.open(path, "w", encoding="utf-8") as f:
+            await f.write("\n".join(lines) + ("\n" if lines else ""))
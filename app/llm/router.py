@@ -0,0 +1,241 @@
+import time
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Deque, List, Optional
+
+from app.llm.base import BaseLLM
+
+
+class BackendStats:
+    """Rolling latency and error statistics of one backend behind a RouterLLM."""
+    def __init__(self, name: str, window: int):
+        self.name = name
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self.in_flight = 0
+        self.hedges_won = 0
+
+    def record_success(self, latency: Optional[float] = None):
+        if latency is not None:
+            self.latencies.append(latency)
+        self.outcomes.append(True)
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        self.outcomes.append(False)
+        self.consecutive_failures += 1
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+    def expected_latency(self) -> float:
+        # an untried backend looks fast, so it gets probed; busy backends look slower in proportion to their load
+        median = self.percentile(0.5) or 0.0
+        return median * (1 + self.in_flight)
+
+
+class RouterLLM(BaseLLM):
+    """
+    An LLM that spreads requests over several backends (e.g. a local OllamaLLM, LANLLM boxes and ApiLLM endpoints).
+    Every request goes to the healthy backend with the lowest expected latency. If it has not answered after its
+    p95 latency, the request is hedged: a duplicate is sent to the next best backend and the first answer wins.
+    A failed request fails over to the next backend, and a backend with too many errors is left alone for a while.
+    NOTE: Create the backends with their own 'create' first, then use RouterLLM.create(backends).
+    """
+    def __init__(
+        self,
+        backends: List[BaseLLM],
+        window: int = 50,
+        hedge_percentile: float = 0.95,
+        min_samples: int = 5,
+        max_hedges: int = 1,
+        max_error_rate: float = 0.5,
+        max_consecutive_failures: int = 3,
+        cooldown: float = 30.0,
+    ):
+        """
+        Args:
+            backends (List[BaseLLM]): Backends serving the same (or an equivalent) model.
+            window (int): Number of recent requests per backend the statistics are computed from.
+            hedge_percentile (float): Latency percentile of a backend after which its request is duplicated.
+            min_samples (int): Requests a backend must have answered before its latency is trusted for hedging.
+            max_hedges (int): Maximum number of duplicates of one request.
+            max_error_rate (float): Error rate over the window above which a backend is taken out of rotation.
+            max_consecutive_failures (int): Failures in a row after which a backend is taken out of rotation.
+            cooldown (float): Seconds an unhealthy backend stays out of rotation before it is probed again.
+        """
+        if not backends:
+            raise ValueError("RouterLLM needs at least one backend.")
+        self.backends = list(backends)
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.max_hedges = max_hedges
+        self.max_error_rate = max_error_rate
+        self.max_consecutive_failures = max_consecutive_failures
+        self.cooldown = cooldown
+        self._stats = [BackendStats(self._backend_name(backend), window) for backend in self.backends]
+        # the router can keep all of its backends busy at once
+        self.DEFAULT_MAX_IN_FLIGHT = sum(backend.DEFAULT_MAX_IN_FLIGHT for backend in self.backends)
+        super().__init__(model_name="router(" + ", ".join(stats.name for stats in self._stats) + ")")
+
+    @classmethod
+    async def create(cls, backends: List[BaseLLM], **kwargs):
+        return cls(backends, **kwargs)
+
+    @staticmethod
+    def _backend_name(backend: BaseLLM) -> str:
+        location = getattr(backend, "host", None) or getattr(backend, "base_url", None) or "localhost"
+        return f"{backend.model_name}@{location}"
+
+    def _create_client(self):
+        # every backend brings its own client
+        return None
+
+    async def _check_model_exists(self):
+        # the backends were checked when they were created
+        pass
+
+    def _healthy(self, stats: BackendStats, now: float) -> bool:
+        if now < stats.down_until:
+            return False
+        if stats.consecutive_failures >= self.max_consecutive_failures:
+            return False
+        return len(stats.outcomes) < self.min_samples or stats.error_rate <= self.max_error_rate
+
+    def _ranked(self) -> List[int]:
+        """Backend indices, healthy ones by expected latency first, then the unhealthy ones (as a last resort)."""
+        now = time.monotonic()
+        indices = range(len(self.backends))
+        healthy = sorted((i for i in indices if self._healthy(self._stats[i], now)), key=lambda i: self._stats[i].expected_latency())
+        unhealthy = sorted((i for i in indices if i not in healthy), key=lambda i: self._stats[i].down_until)
+        return healthy + unhealthy
+
+    def _mark_failure(self, index: int):
+        stats = self._stats[index]
+        stats.record_failure()
+        if not self._healthy(stats, time.monotonic()) and time.monotonic() >= stats.down_until:
+            stats.down_until = time.monotonic() + self.cooldown
+            # after the cooldown the backend gets one probe: a failure takes it out again, a success resets it
+            stats.consecutive_failures = self.max_consecutive_failures - 1
+            stats.outcomes.clear()
+            print(f"Backend '{stats.name}' looks unhealthy, skipping it for {self.cooldown:.0f}s.")
+
+    def _hedge_delay(self, index: int) -> Optional[float]:
+        stats = self._stats[index]
+        if len(stats.latencies) < self.min_samples:
+            return None
+        return stats.percentile(self.hedge_percentile)
+
+    async def _timed_chat(self, index: int, messages: list, format_type: Optional[str], options: Optional[dict]) -> tuple:
+        stats = self._stats[index]
+        stats.in_flight += 1
+        start = time.perf_counter()
+        try:
+            content, response_time, usage = await self.backends[index]._chat(messages, format_type, options)
+        finally:
+            stats.in_flight -= 1
+        if usage is not None:
+            usage.setdefault("model", stats.name)
+        return content, response_time, usage, time.perf_counter() - start
+
+    async def _chat(self, messages: list, format_type: Optional[str] = None, options: Optional[dict] = None) -> tuple:
+        candidates = deque(self._ranked())
+        running = {}
+        hedges = 0
+        last_error = "No backend answered."
+
+        def launch():
+            index = candidates.popleft()
+            task = asyncio.create_task(self._timed_chat(index, messages, format_type, options))
+            running[task] = index
+            return index
+
+        primary = first = launch()
+        try:
+            while running:
+                delay = self._hedge_delay(primary) if hedges < self.max_hedges and candidates else None
+                done, _ = await asyncio.wait(running, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # the request is slower than usual for this backend, race it against the next one
+                    hedges += 1
+                    primary = launch()
+                    print(f"Hedging a slow request, duplicated on '{self._stats[primary].name}'.")
+                    continue
+
+                for task in done:
+                    index = running.pop(task)
+                    try:
+                        content, response_time, usage, latency = task.result()
+                    except Exception as e:
+                        content, response_time, usage, latency = f"Some error occur when interacting: {e}", None, None, None
+                    if response_time is not None:
+                        self._stats[index].record_success(latency)
+                        if index != first:
+                            self._stats[index].hedges_won += 1
+                        return content, response_time, usage
+                    last_error = content
+                    self._mark_failure(index)
+
+                if not running and candidates:
+                    # every request in flight failed, fail over to the next backend
+                    primary = launch()
+                    print(f"Failing over to '{self._stats[primary].name}'.")
+        finally:
+            for task in running:
+                task.cancel()
+
+        return last_error, None, None
+
+    async def _stream(self, messages: list, format_type: Optional[str] = None, options: Optional[dict] = None, usage: Optional[dict] = None) -> AsyncIterator[str]:
+        # a stream cannot be hedged, but it can fail over as long as nothing was yielded yet
+        last_error = None
+        for index in self._ranked():
+            stats = self._stats[index]
+            if usage is not None:
+                usage["model"] = stats.name
+            stream = self.backends[index]._stream(messages, format_type, options, usage)
+            start = time.perf_counter()
+            started = False
+            stats.in_flight += 1
+            try:
+                async for chunk in stream:
+                    started = True
+                    yield chunk
+                stats.record_success(time.perf_counter() - start)
+                return
+            except Exception as e:
+                if started:
+                    raise
+                last_error = e
+                self._mark_failure(index)
+                print(f"Backend '{stats.name}' failed to stream ({e}), failing over.")
+            finally:
+                stats.in_flight -= 1
+                await stream.aclose()
+        raise RuntimeError(f"No backend could stream the response: {last_error}")
+
+    def stats(self) -> dict:
+        """Rolling latency (seconds) and error statistics per backend."""
+        now = time.monotonic()
+        report = {}
+        for stats in self._stats:
+            p50, p95 = stats.percentile(0.5), stats.percentile(0.95)
+            report[stats.name] = {
+                "requests": len(stats.outcomes),
+                "error_rate": round(stats.error_rate, 3),
+                "p50_latency": round(p50, 3) if p50 is not None else None,
+                "p95_latency": round(p95, 3) if p95 is not None else None,
+                "in_flight": stats.in_flight,
+                "hedges_won": stats.hedges_won,
+                "healthy": self._healthy(stats, now),
+            }
+        return report
@@ -0,0 +1,106 @@
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+
+# priority classes, lower is served first
+PRIORITY_ANALYSIS = 0   # short JSON calls: analysis, decisions, tool routing
+PRIORITY_PLAN = 1
+PRIORITY_DEFAULT = 2
+PRIORITY_CODEGEN = 3    # long generations: code, generators, brute force
+
+# the solver (or any other caller) on whose behalf the current task talks to the LLM
+current_client: ContextVar[Optional[str]] = ContextVar("llm_client", default=None)
+
+
+class LLMScheduler:
+    """
+    Admission control in front of one LLM backend.
+    At most 'max_in_flight' requests run at once; waiting requests are ordered by priority class first and then by
+    start-time fair queuing across clients, so one solver with many queued calls cannot starve the others.
+    Among equally served clients the one with the lower rank (e.g. problem A before problem G) goes first.
+    """
+    def __init__(self, max_in_flight: int = 2):
+        """
+        Args:
+            max_in_flight (int): Maximum number of concurrent requests against the backend.
+        """
+        self.max_in_flight = max_in_flight
+        self._in_flight = 0
+        self._queue: List[tuple] = []
+        self._seq = itertools.count()
+        self._ranks: Dict[str, int] = {}
+        self._last_ticket: Dict[str, int] = {}
+        self._virtual_time = 0
+        self._waits: Dict[int, List[float]] = {}
+
+    def register_client(self, client: str, rank: int):
+        """Give a client a tie-breaking rank; lower ranks are served first among clients with equal usage."""
+        self._ranks[client] = rank
+
+    def _ticket(self, client: Optional[str]) -> int:
+        # a client's next ticket follows its previous one, but never lies in the past,
+        # so an idle client cannot bank credit and then monopolize the backend
+        ticket = max(self._last_ticket.get(client, -1) + 1, self._virtual_time)
+        self._last_ticket[client] = ticket
+        return ticket
+
+    def _record_wait(self, priority: int, waited: float):
+        self._waits.setdefault(priority, []).append(waited)
+
+    async def _acquire(self, priority: int, client: Optional[str]):
+        enqueued_at = time.perf_counter()
+        ticket = self._ticket(client)
+        if self._in_flight < self.max_in_flight and not self._queue:
+            self._in_flight += 1
+            self._virtual_time = max(self._virtual_time, ticket)
+            self._record_wait(priority, 0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, ticket, self._ranks.get(client, len(self._ranks)), next(self._seq), future)
+        heapq.heappush(self._queue, entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # the slot was handed over right before the cancellation, pass it on
+                self._release()
+            raise
+        self._virtual_time = max(self._virtual_time, ticket)
+        self._record_wait(priority, time.perf_counter() - enqueued_at)
+
+    def _release(self):
+        while self._queue:
+            *_, future = heapq.heappop(self._queue)
+            if not future.done():
+                # the slot moves straight to the next waiter, the in-flight count stays the same
+                future.set_result(None)
+                return
+        self._in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_DEFAULT, client: Optional[str] = None):
+        """Wait for permission to send one request and hold it while the request runs."""
+        await self._acquire(priority, client if client is not None else current_client.get())
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> dict:
+        """Queue-wait metrics per priority class, in seconds."""
+        per_priority = {}
+        for priority, waits in sorted(self._waits.items()):
+            ordered = sorted(waits)
+            per_priority[priority] = {
+                "requests": len(ordered),
+                "mean_wait": round(sum(ordered) / len(ordered), 3),
+                "p95_wait": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+                "max_wait": round(ordered[-1], 3),
+            }
+        return {"in_flight": self._in_flight, "queued": len(self._queue), "wait_by_priority": per_priority}
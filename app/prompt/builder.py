@@ -0,0 +1,47 @@
+import textwrap
+from typing import Optional, Sequence, Tuple
+
+from app.prompt.SYSTEM import CP_SYSTEM_PROMPT
+
+
+def _section(heading: str, body: str) -> str:
+    return f"### {heading}\n{textwrap.dedent(str(body)).strip()}"
+
+
+def build_messages(
+    task: str,
+    description: Optional[str] = None,
+    tools: Optional[str] = None,
+    sections: Sequence[Tuple[str, str]] = (),
+    history: Optional[str] = None,
+    system: str = CP_SYSTEM_PROMPT,
+) -> list:
+    """
+    Assemble chat messages so that successive requests about the same problem share the longest possible prefix.
+    Backends reuse their KV / prompt cache only for an identical prefix, so the content goes from the most static
+    to the most volatile: system prompt, tools, problem statement, stage-specific sections, history, and the task last.
+
+    Args:
+        task (str): The instructions of this request, e.g. what to extract or what to write.
+        description (Optional[str]): The problem statement.
+        tools (Optional[str]): Description of the available tools (agents only).
+        sections (Sequence[Tuple[str, str]]): Extra (heading, body) sections, e.g. the analysis or the plan.
+        history (Optional[str]): The history of the agent, which changes every step.
+        system (str): The system prompt. Keep the default to share the prefix across all stages.
+    """
+    system_content = system.strip()
+    if tools:
+        system_content += "\n\n" + tools.strip()
+
+    parts = []
+    if description is not None:
+        parts.append(_section("Problem Statement", description))
+    parts.extend(_section(heading, body) for heading, body in sections)
+    if history is not None:
+        parts.append(_section("History of your actions for THIS problem", history))
+    parts.append(_section("Task", task))
+
+    return [
+        {"role": "system", "content": system_content},
+        {"role": "user", "content": "\n\n".join(parts)},
+    ]
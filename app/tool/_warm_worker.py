@@ -0,0 +1,213 @@
+"""
+A warm Python worker used by 'app.tool.warm_pool'. It is started as a plain script, so it only imports the standard library.
+
+The worker reads length-prefixed pickled requests from stdin and answers on stdout. For every request it forks:
+the child gets fresh stdio, rlimits and a new '__main__' module and executes the pre-compiled solution,
+so nothing a solution does at module level survives into the next run, while the interpreter start-up
+and the imports below are paid only once per worker.
+"""
+import os
+import sys
+import time
+import types
+import pickle
+import select
+import signal
+import struct
+import hashlib
+import builtins
+import resource
+import tempfile
+import traceback
+
+# modules that competitive programming solutions typically import, loaded once and shared with every fork
+import re
+import math
+import heapq
+import array
+import bisect
+import random
+import string
+import typing
+import decimal
+import fractions
+import operator
+import functools
+import itertools
+import collections
+
+
+_compiled = {}
+_current_child = None
+
+
+def _read_message(stream):
+    header = stream.read(4)
+    if len(header) < 4:
+        return None
+    size = struct.unpack(">I", header)[0]
+    return pickle.loads(stream.read(size))
+
+
+def _write_message(stream, message):
+    data = pickle.dumps(message)
+    stream.write(struct.pack(">I", len(data)) + data)
+    stream.flush()
+
+
+def _cancel_current(signum, frame):
+    if _current_child is not None:
+        try:
+            os.kill(_current_child, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+def _compile(source, filename):
+    key = hashlib.sha1(source.encode("utf-8")).hexdigest()
+    if key not in _compiled:
+        _compiled[key] = compile(source, filename, "exec")
+    return _compiled[key]
+
+
+def _exit_code(exc):
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    print(exc.code, file=sys.stderr)
+    return 1
+
+
+def _run_child(code, request, stdin_fd, out_w, err_w):
+    """Runs in the forked child and never returns."""
+    exit_code = 0
+    try:
+        signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+        os.dup2(stdin_fd, 0)
+        os.dup2(out_w, 1)
+        os.dup2(err_w, 2)
+        for fd in (stdin_fd, out_w, err_w):
+            os.close(fd)
+        if request.get("cwd"):
+            os.chdir(request["cwd"])
+
+        cpu_seconds = request["cpu_seconds"]
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+        resource.setrlimit(resource.RLIMIT_AS, (request["memory_bytes"], request["memory_bytes"]))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+        sys.stdin = open(0, "r", closefd=False)
+        sys.stdout = open(1, "w", closefd=False)
+        sys.stderr = open(2, "w", closefd=False)
+        sys.argv = [request["filename"], *request.get("argv", [])]
+
+        main_module = types.ModuleType("__main__")
+        main_module.__file__ = request["filename"]
+        main_module.__builtins__ = builtins
+        sys.modules["__main__"] = main_module
+        try:
+            exec(code, main_module.__dict__)
+        except SystemExit as exc:
+            exit_code = _exit_code(exc)
+        except BaseException:
+            traceback.print_exc()
+            exit_code = 1
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except BaseException:
+            exit_code = exit_code or 1
+    finally:
+        os._exit(exit_code)
+
+
+def _run(request):
+    global _current_child
+
+    try:
+        code = _compile(request["source"], request["filename"])
+    except (SyntaxError, ValueError) as exc:
+        # what 'python main.py' does with a source that does not compile: a traceback and exit code 1
+        return {
+            "exit_code": 1,
+            "term_signal": None,
+            "stdout": "",
+            "stderr": "".join(traceback.format_exception_only(type(exc), exc)),
+            "wall_time": 0.0,
+            "cpu_time": 0.0,
+            "max_rss_kb": 0,
+            "timed_out": False,
+        }
+    if "input_path" in request:
+        stdin_file = open(request["input_path"], "rb")
+    else:
+        stdin_file = tempfile.TemporaryFile()
+        stdin_file.write(request.get("stdin", b""))
+        stdin_file.seek(0)
+
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    wall_limit = request["wall_limit"]
+
+    start = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        for fd in (out_r, err_r):
+            os.close(fd)
+        _run_child(code, request, stdin_file.fileno(), out_w, err_w)
+
+    _current_child = pid
+    os.close(out_w)
+    os.close(err_w)
+    stdin_file.close()
+
+    chunks = {out_r: [], err_r: []}
+    open_fds = [out_r, err_r]
+    timed_out = False
+    while open_fds:
+        remaining = wall_limit - (time.perf_counter() - start)
+        if remaining <= 0 and not timed_out:
+            timed_out = True
+            _cancel_current(None, None)
+        readable, _, _ = select.select(open_fds, [], [], max(remaining, 0.05) if not timed_out else None)
+        for fd in readable:
+            data = os.read(fd, 1 << 16)
+            if data:
+                chunks[fd].append(data)
+            else:
+                open_fds.remove(fd)
+                os.close(fd)
+
+    _, status, usage = os.wait4(pid, 0)
+    wall_time = time.perf_counter() - start
+    _current_child = None
+
+    return {
+        "exit_code": os.WEXITSTATUS(status) if os.WIFEXITED(status) else None,
+        "term_signal": os.WTERMSIG(status) if os.WIFSIGNALED(status) else None,
+        "stdout": b"".join(chunks[out_r]).decode("utf-8", errors="replace"),
+        "stderr": b"".join(chunks[err_r]).decode("utf-8", errors="replace"),
+        "wall_time": wall_time,
+        "cpu_time": usage.ru_utime + usage.ru_stime,
+        "max_rss_kb": usage.ru_maxrss,
+        "timed_out": timed_out,
+    }
+
+
+def serve():
+    signal.signal(signal.SIGUSR1, _cancel_current)
+    requests, replies = sys.stdin.buffer, sys.stdout.buffer
+    while True:
+        request = _read_message(requests)
+        if request is None:
+            return
+        try:
+            reply = _run(request)
+        except Exception:
+            reply = {"error": traceback.format_exc()}
+        _write_message(replies, reply)
+
+
+if __name__ == "__main__":
+    serve()
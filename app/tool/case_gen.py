@@ -2,44 +2,51 @@ import asyncio
 import json
 import aiofiles
 from pathlib import Path
+from typing import Optional
 
 from app.protocols import AgentMessage
+from app.context import get_problem_context, peek_problem_context
 from app.agent.base import BaseLLM
+from app.llm.scheduler import PRIORITY_ANALYSIS, PRIORITY_CODEGEN
+from app.prompt.builder import build_messages
 from app.tool.parser import _write_to_file_async
 
 
-async def decide_and_generate_test_cases(plan: dict, description: str, problem_dir: str, llm: BaseLLM) -> AgentMessage:
+async def decide_and_generate_test_cases(plan: Optional[dict], description: Optional[str], problem_dir: str, llm: BaseLLM) -> AgentMessage:
     """
     1. the LLM is first to decide whether additional test cases need to be generated for the problem.
     2. if they are needed, generate them based on the edge_cases in the plan stage.
+    A missing plan or description is taken from the problem context.
     """
     source_name = "decide_and_generate_test_cases"
     print(f"\n[Tool: {source_name}]: Evaluating plan for problem in '{problem_dir}'...")
 
-    decision_prompt = f"""
-        You are a strategic assistant. Your task is to decide if generating additional test cases is a valuable and feasible action for the given problem, based on its plan.
-        If the implementation is too complicated or impossible, you should decide to not to generate.
-        
-        ### Problem Solving Plan
-        {json.dumps(plan, indent=2)}
+    if plan is None or description is None:
+        try:
+            context = await get_problem_context(problem_dir)
+        except Exception as e:
+            error_msg = f"Failed to load the problem context: {e}"
+            print(f"[Tool: {source_name}]: {error_msg}")
+            return AgentMessage(status="failure", source=source_name, message_type="error", error=error_msg)
+        plan = plan if plan is not None else context.plan or {}
+        description = description if description is not None else context.statement
 
-        ### Key Considerations
+    decision_task = """
+        Decide if generating additional test cases is a valuable and feasible action for the problem above, based on its plan.
+        If the implementation is too complicated or impossible, you should decide to not to generate.
         - **High Value**: Generation is valuable for problems with tricky edge cases (e.g., graph connectivity, number theory properties, max/min constraints).
         - **Low Value/Infeasible**: Generation is not useful for interactive problems, output-only problems, or problems where the output is not uniquely determined by the input (e.g., creative constructions).
 
-        ### Your Decision
         Based on the plan, especially the 'algorithm' and 'edge_cases_to_consider', is it a good idea to generate more test cases?
-        Respond with a single JSON object: {{"should_generate": boolean, "reason": "your brief reasoning"}}.
+        Respond with a single JSON object: {"should_generate": boolean, "reason": "your brief reasoning"}.
         Your response MUST be only the JSON object.
     """
-    
+    plan_str = json.dumps(plan, indent=2)
+
     try:
-        decision_response_str, _ = await llm.chat(
-            [
-                {"role": "system", "content": "You are a strategic assistant. Your task is to decide if generating additional test cases is a valuable and feasible action for the given problem, based on its plan. If the implementation is too complicated or impossible, you should decide to not to generate."},
-                {"role": "user", "content": decision_prompt}
-            ], format_type="json")
-        decision = json.loads(decision_response_str)
+        decision, _ = await llm.chat_json(
+            build_messages(decision_task, description=description, sections=[("Problem Solving Plan", plan_str)]),
+            priority=PRIORITY_ANALYSIS)
         
         should_generate = decision.get("should_generate", False)
         reason = decision.get("reason", "No reason provided.")
@@ -58,28 +65,18 @@ async def decide_and_generate_test_cases(plan: dict, description: str, problem_d
 
     print(f"[Tool: {source_name}]: Proceeding with test case generation...")
     
-    generation_prompt = f"""
-        You are an expert test case creator in competitive programming. Based on the provided problem description and a list of edge cases to consider, generate several new, challenging test cases.
-
-        ### Full Problem Description
-        {description}
-
-        ### Edge Cases to Focus On
-        {plan.get('edge_cases_to_consider', 'No specific edge cases listed.')}
-
-        ### Instructions
+    generation_task = """
+        Based on the problem statement above and the list of edge cases to consider, generate several new, challenging test cases.
         - Create several distinct test cases that specifically target the edge cases mentioned above.
-        - Provide the output in a valid JSON format: {{"test_cases": [{{"input": "...", "output": "..."}}]}}.
+        - Provide the output in a valid JSON format: {"test_cases": [{"input": "...", "output": "..."}]}.
         - Do not repeat the official sample cases.
         - Your response MUST be only the JSON object.
     """
+    edge_cases = str(plan.get('edge_cases_to_consider', 'No specific edge cases listed.'))
     try:
-        generation_response_str, _ = await llm.chat(
-        [
-            {"role": "system", "content": "You are an expert test case creator in competitive programming. Based on the provided problem description and a list of edge cases to consider, generate several new, challenging test cases."},
-            {"role": "user", "content": generation_prompt}
-        ], format_type="json")
-        generated_data = json.loads(generation_response_str)
+        generated_data, _ = await llm.chat_json(
+            build_messages(generation_task, description=description, sections=[("Edge Cases to Focus On", edge_cases)]),
+            priority=PRIORITY_CODEGEN)
         test_cases = generated_data.get("test_cases", [])
 
         if not test_cases:
@@ -101,6 +98,10 @@ async def decide_and_generate_test_cases(plan: dict, description: str, problem_d
             write_tasks.append(_write_to_file_async(target_path / f"ans_{i}.out", case_output))
         
         await asyncio.gather(*write_tasks)
+        # a context that is already loaded must see the new cases; otherwise they are read on its first load
+        context = peek_problem_context(problem_dir)
+        if context is not None:
+            await context.refresh_tests()
 
         summary = f"Successfully decided to generate and created {len(test_cases)} new test cases in '{problem_dir}'."
         print(f"[Tool: {source_name}]: {summary}")
@@ -1,33 +1,76 @@
-import json
 import re
+import json
+import asyncio
 from pathlib import Path
+from typing import List, Optional
 
 from app.protocols import AgentMessage
+from app.context import get_problem_context
 from app.agent.base import BaseLLM
+from app.llm.scheduler import PRIORITY_CODEGEN
+from app.prompt.builder import build_messages
 from app.tool.parser import _write_to_file_async
 
 
-async def generate_code(plan: dict, description: str, problem_dir: str, llm: BaseLLM) -> AgentMessage:
+# upper bound of generated tokens for one solution, including the reasoning of 'think' models
+CODEGEN_TOKEN_BUDGET = 8192
+
+
+def code_block_closed(text: str) -> bool:
+    """True once the response contains a complete ```python ... ``` block outside of any <think> section."""
+    if "<think>" in text:
+        if "</think>" not in text:
+            return False
+        text = text.rsplit("</think>", 1)[1]
+    return re.search(r"```python\s*\n.*?\n\s*```", text, re.DOTALL) is not None
+
+
+def _looks_like_code(text: str) -> bool:
+    """A response without a code block is only used if it is a Python program on its own that does some I/O."""
+    try:
+        compile(text, "<response>", "exec")
+    except (SyntaxError, ValueError):
+        return False
+    return any(word in text for word in ("print", "input", "sys.stdin", "sys.stdout"))
+
+
+def _extract_code(response_str: str) -> Optional[str]:
+    """
+    The python block of a response, ignoring any <think> section.
+    Without a closed block (e.g. the token budget ran out), the response itself if it looks like code, otherwise None.
+    """
+    if "<think>" in response_str and "</think>" not in response_str:
+        return None
+    if "</think>" in response_str:
+        response_str = response_str.rsplit("</think>", 1)[1]
+    match = re.search(r"```python\s*\n(.*?)\n\s*```", response_str, re.DOTALL)
+    if match:
+        return match.group(1)
+    if _looks_like_code(response_str):
+        print("Warning: the response has no ```python block, using it as the code.")
+        return response_str
+    return None
+
+
+async def generate_code(plan: Optional[dict], description: Optional[str], problem_dir: str, llm: BaseLLM, num_candidates: int = 1, code_file: str = "main.py") -> AgentMessage:
     """
     Generate source code for the solution based on the solution plan and topic description.
+    A missing plan or description is taken from the problem context.
+    The code is saved as 'code_file'. With 'num_candidates' > 1, several independent samples are drawn in one
+    batched request and saved as 'main_1.py' ... 'main_k.py' (for judging) instead.
     """
     source_name = "generate_code"
     print(f"\n[Tool: {source_name}]: Generating code for problem in '{problem_dir}'...")
+
+    if plan is None or description is None:
+        context = await get_problem_context(problem_dir)
+        plan = plan if plan is not None else context.plan or {}
+        description = description if description is not None else context.statement
     
     plan_str = json.dumps(plan, indent=2)
 
-    prompt = f"""
-        You are a world-class competitive programmer, an expert in writing clean, efficient, and correct Python code.
-
-        Your task is to write a complete and correct Python solution without comments for the following problem.
-
-        ### Full Problem Description
-        {description}
-
-        ### Your Detailed Plan
-        {plan_str}
-
-        ### Instructions
+    task = """
+        Write a complete and correct Python solution without comments for the problem above, following your plan.
         1.  Write a complete Python program that solves the problem.
         2.  Read all input from standard input (stdin).
         3.  Write all output to standard output (stdout).
@@ -35,38 +78,148 @@ async def generate_code(plan: dict, description: str, problem_dir: str, llm: Bas
         5.  Your response MUST contain ONLY the raw Python code. Do not include any extra text, explanations, or comments in the code.
         6.  Enclose the code in a ```python ... ``` markdown block.
     """
-    messages = [
-        {"role": "system", "content": "You are a world-class competitive programmer, an expert in writing clean, efficient, and correct Python code without comments."},
-        {"role": "user", "content": prompt}
-    ]
+    messages = build_messages(task, description=description, sections=[("Your Detailed Plan", plan_str)])
 
     try:
-        response_str, _ = await llm.chat(messages)
-        
-        # use 're' to get code part
-        match = re.search(r"```python\s*\n(.*?)\n\s*```", response_str, re.DOTALL)
-        if not match:
-            # TODO: the output is not in the specific format, may cause some error
-            code = response_str
-            print("Warning: generating might have some error. This is the code that llm gives : \n{code}")
+        if num_candidates <= 1:
+            # stream the answer and stop as soon as the code block is closed, the rest would be discarded anyway
+            response_str, response_time = await llm.chat_until(
+                messages,
+                stop_when=code_block_closed,
+                max_tokens=CODEGEN_TOKEN_BUDGET,
+                priority=PRIORITY_CODEGEN,
+            )
+            if response_time is None:
+                # the request failed, the response is the error message
+                return AgentMessage(status="failure", source=source_name, message_type="error", error=response_str)
+            responses = [response_str]
         else:
-            code = match.group(1)
+            # one batched request returns all the candidates, the prompt is only sent (and processed) once
+            responses, response_time = await llm.chat_n(messages, n=num_candidates, priority=PRIORITY_CODEGEN)
+            if response_time is None:
+                return AgentMessage(status="failure", source=source_name, message_type="error", error=responses[0])
 
-        if not code.strip():
-            return AgentMessage(status="failure", source=source_name, message_type="error", error="LLM returned empty code.")
+        codes = [code for code in map(_extract_code, responses) if code and code.strip()]
+        if not codes:
+            error_msg = "LLM returned no complete code block."
+            print(f"[Tool: {source_name}]: {error_msg}")
+            return AgentMessage(status="failure", source=source_name, message_type="error", error=error_msg)
 
         target_path = Path(problem_dir)
-        code_file_path = target_path / "main.py"
-        await _write_to_file_async(code_file_path, code)
-        
-        summary = f"Successfully generated Python code and saved to '{code_file_path}'."
+        if num_candidates <= 1:
+            code_paths = [target_path / code_file]
+        else:
+            code_paths = [target_path / f"main_{i}.py" for i in range(1, len(codes) + 1)]
+        await asyncio.gather(*[_write_to_file_async(path, code) for path, code in zip(code_paths, codes)])
+
+        if len(code_paths) == 1:
+            summary = f"Successfully generated Python code and saved to '{code_paths[0]}'."
+        else:
+            summary = f"Successfully generated {len(code_paths)} candidate solutions: {', '.join(path.name for path in code_paths)}."
         print(f"[Tool: {source_name}]: {summary}")
         return AgentMessage(
             source=source_name,
             message_type="tool_result",
-            payload={"summary": summary, "code_path": str(code_file_path)}
+            payload={"summary": summary, "code_path": str(code_paths[0]), "code_paths": [str(path) for path in code_paths]}
         )
     except Exception as e:
         error_msg = f"Failed to generate code due to an error: {e}"
         print(f"[Tool: {source_name}]: {error_msg}")
-        return AgentMessage(status="failure", source=source_name, message_type="error", error=error_msg)
\ No newline at end of file
+        return AgentMessage(status="failure", source=source_name, message_type="error", error=error_msg)
+
+
+# how much of a failing case is shown to the LLM
+REPAIR_MAX_CASES = 2
+REPAIR_MAX_CHARS = 1500
+
+
+def _excerpt(text: str, max_chars: int = REPAIR_MAX_CHARS) -> str:
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars] + f"\n... [{len(text) - max_chars} characters truncated]"
+
+
+def _failure_section(problem_dir: Path, result: dict) -> str:
+    """Input, expected output and actual outcome of one judged case, read from its 'sol_N.in' / 'ans_N.out'."""
+    index = result["name"].split("_")[-1]
+    case_input = (problem_dir / f"sol_{index}.in").read_text(encoding="utf-8")
+    expected = (problem_dir / f"ans_{index}.out").read_text(encoding="utf-8")
+    if result["verdict"] == "WA":
+        actual = f"Actual output:\n{_excerpt(result.get('output', ''))}"
+    else:
+        actual = f"Outcome: {result['verdict']} ({result.get('message', '')})"
+    return f"Input:\n{_excerpt(case_input)}\nExpected output:\n{_excerpt(expected)}\n{actual}"
+
+
+async def repair_code(problem_dir: str, failures: List[dict], llm: BaseLLM, code_file: str = "main.py", plan: Optional[dict] = None) -> AgentMessage:
+    """
+    Fix a solution that failed the local judge, from the failing cases instead of from scratch.
+    The prompt holds the statement and the plan (the same prefix as 'generate_code'), the current code, and for the
+    smallest failing cases their input, the expected output and the actual output or verdict.
+
+    Args:
+        problem_dir (str): Directory of the problem.
+        failures (List[dict]): The non-AC entries of the 'results' of 'judge_solution'.
+        llm (BaseLLM): The model that writes the fix.
+        code_file (str): Solution file inside the problem directory; it is overwritten with the repaired code.
+        plan (Optional[dict]): The solution plan. Defaults to the plan in the problem context.
+    """
+    source_name = "repair_code"
+    target_path = Path(problem_dir)
+    code_path = target_path / code_file
+    print(f"\n[Tool: {source_name}]: Repairing '{code_path}' from {len(failures)} failing cases...")
+
+    try:
+        context = await get_problem_context(problem_dir)
+        plan = plan if plan is not None else context.plan or {}
+        code = await asyncio.to_thread(code_path.read_text, encoding="utf-8")
+
+        # small cases are the easiest to trace by hand, and the cheapest to put in the prompt
+        def input_size(result: dict) -> int:
+            index = result["name"].split("_")[-1]
+            return (target_path / f"sol_{index}.in").stat().st_size
+        chosen = sorted(failures, key=input_size)[:REPAIR_MAX_CASES]
+        cases = await asyncio.gather(*[asyncio.to_thread(_failure_section, target_path, result) for result in chosen])
+    except Exception as e:
+        error_msg = f"Failed to prepare the repair: {e}"
+        print(f"[Tool: {source_name}]: {error_msg}")
+        return AgentMessage(status="failure", source=source_name, message_type="error", error=error_msg)
+
+    verdicts = sorted({result["verdict"] for result in failures})
+    task = f"""
+        Your solution above fails on the tests above ({', '.join(verdicts)}).
+        1.  Find the bug by tracing the failing inputs through the code. If a test timed out, the algorithm is too slow for the constraints: use a faster one.
+        2.  Write the complete corrected Python program. It reads from stdin and writes to stdout.
+        3.  Your response MUST contain ONLY the raw Python code, without comments, enclosed in a ```python ... ``` markdown block.
+    """
+    sections = [("Your Detailed Plan", json.dumps(plan, indent=2)), ("Current Code", f"```python\n{code}\n```")]
+    sections += [(f"Failing Test {i}", case) for i, case in enumerate(cases, 1)]
+    # the statement and the plan come first, as in 'generate_code', so the prefix is served from the backend's cache
+    messages = build_messages(task, description=context.statement, sections=sections)
+
+    try:
+        response_str, response_time = await llm.chat_until(
+            messages,
+            stop_when=code_block_closed,
+            max_tokens=CODEGEN_TOKEN_BUDGET,
+            priority=PRIORITY_CODEGEN,
+            use_cache=False,
+        )
+        # the judged code is only replaced by a complete program
+        if response_time is None:
+            print(f"[Tool: {source_name}]: {response_str}")
+            return AgentMessage(status="failure", source=source_name, message_type="error", error=response_str)
+        repaired = _extract_code(response_str)
+        if not repaired or not repaired.strip():
+            error_msg = "LLM returned no complete code block, the code was left unchanged."
+            print(f"[Tool: {source_name}]: {error_msg}")
+            return AgentMessage(status="failure", source=source_name, message_type="error", error=error_msg)
+        await _write_to_file_async(code_path, repaired)
+
+        summary = f"Repaired '{code_file}' using {len(chosen)} failing cases ({', '.join(verdicts)})."
+        print(f"[Tool: {source_name}]: {summary}")
+        return AgentMessage(source=source_name, message_type="tool_result", payload={"summary": summary, "code_path": str(code_path)})
+    except Exception as e:
+        error_msg = f"Failed to repair code due to an error: {e}"
+        print(f"[Tool: {source_name}]: {error_msg}")
+        return AgentMessage(status="failure", source=source_name, message_type="error", error=error_msg)
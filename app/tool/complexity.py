@@ -0,0 +1,268 @@
+import re
+import sys
+import math
+import asyncio
+import aiofiles
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+from app.protocols import AgentMessage
+from app.context import get_problem_context, peek_problem_context
+from app.agent.base import BaseLLM
+from app.llm.scheduler import PRIORITY_CODEGEN
+from app.prompt.builder import build_messages
+from app.tool.parser import _write_to_file_async
+from app.tool.problem_spec import load_problem_spec, resolve_limits
+from app.tool.warm_pool import WarmWorkerPool, get_shared_pool
+
+
+DEFAULT_SCALES = (10**3, 10**4, 10**5)
+GENERATOR_FILE = "gen.py"
+STRESS_DIR = "stress"
+
+# bounds above this are value ranges (e.g. N <= 10^18 in number theory), not input sizes
+MAX_PROFILE_SCALE = 10**7
+
+# (upper bound of the fitted exponent, label), checked in order
+COMPLEXITY_LABELS = [
+    (0.3, "O(1) or O(log N)"),
+    (1.25, "O(N) or O(N log N)"),
+    (1.75, "O(N sqrt N)"),
+    (2.5, "O(N^2)"),
+    (3.5, "O(N^3)"),
+]
+
+
+def max_scale_from_constraints(constraints: str) -> Optional[int]:
+    """
+    Find the largest input-size bound, such as 'N <= 2 * 10^5' or '|S| \\leq 5 \\times 10^5', in a constraints text.
+    Only clauses about a size variable (N, M, Q, K, |S|, ...) count, so value bounds like 'A_i <= 10^9' are ignored.
+    """
+    bounds = []
+    for clause in re.split(r"[\n,;]|\\\)|\$", constraints):
+        if not re.search(r"(?<![A-Za-z_])(N|M|Q|K|L|\|[A-Z]\|)(?![A-Za-z_])", clause):
+            continue
+        for match in re.finditer(r"(?:(\d+)\s*(?:\*|×|\\times)\s*)?10\s*\^\s*\{?(\d+)\}?", clause):
+            factor = int(match.group(1)) if match.group(1) else 1
+            bound = factor * 10 ** int(match.group(2))
+            if bound <= MAX_PROFILE_SCALE:
+                bounds.append(bound)
+    return max(bounds) if bounds else None
+
+
+def fit_exponent(points: List[dict]) -> Optional[float]:
+    """Least-squares slope of log(cpu_time) over log(N). Points that are too fast to measure are ignored."""
+    usable = [(math.log(p["n"]), math.log(p["cpu_time"])) for p in points if p["cpu_time"] >= 0.005]
+    if len(usable) < 2:
+        return None
+    mean_x = sum(x for x, _ in usable) / len(usable)
+    mean_y = sum(y for _, y in usable) / len(usable)
+    var_x = sum((x - mean_x) ** 2 for x, _ in usable)
+    if var_x == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in usable) / var_x
+
+
+def complexity_label(exponent: Optional[float]) -> str:
+    if exponent is None:
+        return "too fast to measure"
+    for bound, label in COMPLEXITY_LABELS:
+        if exponent < bound:
+            return label
+    return "exponential or worse than O(N^3)"
+
+
+async def generate_stress_generator(description: str, constraints: str, problem_dir: str, llm: BaseLLM) -> AgentMessage:
+    """
+    Ask the LLM for a small generator program instead of literal inputs.
+    The generator takes the scale N as its only argument and prints one valid input of that size.
+    """
+    source_name = "generate_stress_generator"
+    print(f"\n[Tool: {source_name}]: Writing an input generator for '{problem_dir}'...")
+
+    task = """
+        Write a Python program that generates ONE valid, large input for the problem above.
+        1.  The program takes a single integer N from the command line (sys.argv[1]) and prints one input whose size parameter equals N (clamped to the constraints).
+        2.  Choose the other values to make the solution work as hard as possible (worst case), using the random module with a fixed seed.
+        3.  Write the input to standard output with sys.stdout.write, line by line, without building the whole input in one string.
+        4.  The program must run in well under a few seconds for N = 2*10^5.
+        5.  Enclose the code in a ```python ... ``` markdown block and add no other text.
+    """
+    messages = build_messages(task, description=description, sections=[("Constraints", constraints)])
+
+    try:
+        response_str, response_time = await llm.chat(messages, priority=PRIORITY_CODEGEN)
+        if response_time is None:
+            # the request failed, the response is the error message
+            print(f"[Tool: {source_name}]: {response_str}")
+            return AgentMessage(status="failure", source=source_name, message_type="error", error=response_str)
+        match = re.search(r"```python\s*\n(.*?)\n\s*```", response_str, re.DOTALL)
+        code = match.group(1) if match else response_str
+        if not code.strip():
+            return AgentMessage(status="failure", source=source_name, message_type="error", error="LLM returned an empty generator.")
+
+        generator_path = Path(problem_dir) / GENERATOR_FILE
+        await _write_to_file_async(generator_path, code)
+
+        summary = f"Saved the input generator to '{generator_path}'."
+        print(f"[Tool: {source_name}]: {summary}")
+        return AgentMessage(
+            source=source_name,
+            message_type="tool_result",
+            payload={"summary": summary, "generator_path": str(generator_path)}
+        )
+    except Exception as e:
+        error_msg = f"Failed to generate the input generator: {e}"
+        print(f"[Tool: {source_name}]: {error_msg}")
+        return AgentMessage(status="failure", source=source_name, message_type="error", error=error_msg)
+
+
+async def _generate_input(generator_path: Path, n: int, target: Path, timeout: float):
+    """Run the generator and stream its output straight into 'target'."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with open(target, "wb") as out:
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, str(generator_path.resolve()), str(n),
+            stdout=out,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            _, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise RuntimeError(f"generator timed out for N={n}")
+    if proc.returncode != 0:
+        raise RuntimeError(f"generator failed for N={n}: {stderr.decode(errors='replace').strip()[-300:]}")
+
+
+async def profile_complexity(
+    problem_dir: str,
+    code_file: str = "main.py",
+    analysis: Optional[dict] = None,
+    llm: Optional[BaseLLM] = None,
+    scales: Sequence[int] = DEFAULT_SCALES,
+    max_scale: Optional[int] = None,
+    time_limit: Optional[float] = None,
+    memory_limit_mb: Optional[int] = None,
+    pool: Optional[WarmWorkerPool] = None,
+) -> AgentMessage:
+    """
+    Tool function: measure how the running time of a solution grows with the input size.
+    Inputs are produced at several scales by 'gen.py' (written by the LLM if missing), then the solution runs on each
+    and a power law is fitted to the CPU times. The estimate is reported next to the constraints of the analysis.
+
+    Args:
+        problem_dir (str): Directory of the problem.
+        code_file (str): Solution file inside the problem directory.
+        analysis (Optional[dict]): Output of 'analyze_problem'; its 'constraints' give the maximum scale.
+            Defaults to the analysis in the problem context, then to the constraints in 'problem.json'.
+        llm (Optional[BaseLLM]): Used to write 'gen.py' when it does not exist yet.
+        scales (Sequence[int]): Values of N to measure.
+        max_scale (Optional[int]): Largest N allowed by the constraints. Parsed from the analysis if omitted.
+        time_limit (Optional[float]): Time limit of the problem in seconds. Defaults to the limit in 'problem.json'.
+        memory_limit_mb (Optional[int]): Memory limit of the problem in MB. Defaults to the limit in 'problem.json'.
+        pool (Optional[WarmWorkerPool]): Worker pool to run the solution on. Defaults to the process-wide pool.
+    """
+    source_name = "profile_complexity"
+    target_path = Path(problem_dir)
+    code_path = target_path / code_file
+    generator_path = target_path / GENERATOR_FILE
+    print(f"\n[Tool: {source_name}]: Profiling '{code_path}'...")
+
+    if analysis is None and peek_problem_context(problem_dir) is not None:
+        analysis = peek_problem_context(problem_dir).analysis
+    if analysis is None:
+        spec = await asyncio.to_thread(load_problem_spec, target_path)
+        analysis = spec.analysis() if spec is not None else None
+    time_limit, memory_limit_mb = await asyncio.to_thread(resolve_limits, target_path, time_limit, memory_limit_mb)
+    constraints = (analysis or {}).get("constraints", "")
+    if isinstance(constraints, list):
+        constraints = "\n".join(map(str, constraints))
+    max_scale = max_scale or max_scale_from_constraints(constraints)
+
+    if not generator_path.exists():
+        if llm is None:
+            error_msg = f"No '{GENERATOR_FILE}' in '{problem_dir}' and no LLM to write one."
+            print(f"[Tool: {source_name}]: {error_msg}")
+            return AgentMessage(status="failure", source=source_name, message_type="error", error=error_msg)
+        context = await get_problem_context(problem_dir)
+        generator_msg = await generate_stress_generator(context.statement, constraints, problem_dir, llm)
+        if generator_msg.status == 'failure':
+            return generator_msg
+
+    try:
+        async with aiofiles.open(code_path, "r", encoding="utf-8") as f:
+            source = await f.read()
+    except FileNotFoundError:
+        error_msg = f"Solution file '{code_path}' does not exist."
+        print(f"[Tool: {source_name}]: {error_msg}")
+        return AgentMessage(status="failure", source=source_name, message_type="error", error=error_msg)
+
+    all_scales = sorted({n for n in scales if not max_scale or n < max_scale} | ({max_scale} if max_scale else set()))
+    pool = pool or get_shared_pool()
+    # a generous limit, so that the growth can still be measured past the real time limit
+    profile_limit = max(time_limit * 5, 10.0)
+
+    points = []
+    try:
+        for n in all_scales:
+            input_path = target_path / STRESS_DIR / f"stress_{n}.in"
+            await _generate_input(generator_path, n, input_path, timeout=60)
+            run = await pool.run(
+                source,
+                filename=str(code_path.resolve()),
+                input_path=input_path,
+                time_limit=profile_limit,
+                memory_limit_mb=memory_limit_mb,
+                cwd=target_path,
+            )
+            ok = run.exit_code == 0 and not run.timed_out
+            points.append({
+                "n": n,
+                "cpu_time": round(run.cpu_time, 4),
+                "wall_time": round(run.wall_time, 4),
+                "memory_kb": run.max_rss_kb,
+                "ok": ok,
+            })
+            print(f"[Tool: {source_name}]: N={n}: cpu {run.cpu_time:.3f}s{'' if ok else ' (failed)'}")
+            if not ok:
+                # larger inputs would only fail or time out as well
+                break
+    except RuntimeError as e:
+        error_msg = f"Failed to profile the solution: {e}"
+        print(f"[Tool: {source_name}]: {error_msg}")
+        return AgentMessage(status="failure", source=source_name, message_type="error", error=error_msg)
+
+    exponent = fit_exponent([p for p in points if p["ok"]])
+    estimate = complexity_label(exponent)
+
+    predicted_at_max = None
+    measured = [p for p in points if p["ok"]]
+    if max_scale and measured and exponent is not None:
+        last = measured[-1]
+        predicted_at_max = round(last["cpu_time"] * (max_scale / last["n"]) ** exponent, 3)
+    likely_tle = any(p["cpu_time"] > time_limit or not p["ok"] for p in points) or (predicted_at_max or 0) > time_limit
+
+    summary = f"Empirical complexity of '{code_file}': {estimate}"
+    if exponent is not None:
+        summary += f" (time ~ N^{exponent:.2f})"
+    if predicted_at_max is not None:
+        summary += f", predicted {predicted_at_max}s at N={max_scale}"
+    summary += ". Likely TLE." if likely_tle else "."
+    print(f"[Tool: {source_name}]: {summary}")
+
+    return AgentMessage(
+        source=source_name,
+        message_type="tool_result",
+        payload={
+            "summary": summary,
+            "estimate": estimate,
+            "exponent": round(exponent, 3) if exponent is not None else None,
+            "points": points,
+            "constraints": constraints,
+            "max_scale": max_scale,
+            "predicted_time_at_max": predicted_at_max,
+            "likely_tle": likely_tle,
+        }
+    )
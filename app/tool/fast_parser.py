@@ -0,0 +1,123 @@
+import re
+import lxml.html
+from typing import Dict, Iterator, List, Optional
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from app.tool.problem_spec import parse_limits
+
+
+SAMPLE_HEADING = re.compile(r"Sample (Input|Output)\s*(\d+)")
+# the direct children of a section that make up its body, as in 'problem_spec._section_body'
+SECTION_BLOCKS = ("p", "pre", "ul", "ol", "div")
+# BeautifulSoup leaves their content out of get_text()
+NON_TEXT_TAGS = ("script", "style", "template")
+
+_executor: Optional[Executor] = None
+
+
+def get_parse_executor() -> Executor:
+    """
+    The executor HTML pages are parsed on, so that parsing never blocks the fetch loop.
+    A thread pool by default (lxml releases the GIL while it parses); use 'set_parse_executor' with a
+    ProcessPoolExecutor for bulk scraping, the extractor and its result are picklable.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(thread_name_prefix="html-parse")
+    return _executor
+
+
+def set_parse_executor(executor: Optional[Executor]):
+    global _executor
+    _executor = executor
+
+
+def _strings(element) -> Iterator[str]:
+    """The text nodes of a subtree that BeautifulSoup's get_text() yields: no comments, nothing inside <script> or <style>."""
+    if element.tag not in NON_TEXT_TAGS and element.text:
+        yield element.text
+    for child in element:
+        # comments and processing instructions have a non-string tag
+        if isinstance(child.tag, str) and child.tag not in NON_TEXT_TAGS:
+            yield from _strings(child)
+        if child.tail:
+            yield child.tail
+
+
+def _text(element, separator: str = " ") -> str:
+    # same result as BeautifulSoup's get_text(separator, strip=True)
+    return separator.join(part.strip() for part in _strings(element) if part.strip())
+
+
+def _section_body(section) -> str:
+    # same result as 'problem_spec._section_body': <pre> blocks keep their line breaks
+    parts = []
+    for child in section:
+        if child.tag not in SECTION_BLOCKS:
+            continue
+        parts.append("".join(_strings(child)) if child.tag == "pre" else _text(child))
+    return "\n".join(part.strip("\n") for part in parts if part.strip())
+
+
+def extract_problem_lxml(page: str, problem_url: str) -> Dict:
+    """
+    Extract the title, the flattened statement, the samples and the structured spec of an AtCoder task page
+    in one pass over its sections. Sample inputs and outputs are paired by their number while walking,
+    instead of searching the document from the root for every sample.
+
+    Returns:
+        Dict: 'title', 'description_text', 'samples' (list of {'input', 'output'}) and 'spec' (ProblemSpec fields or None).
+    """
+    result = {"title": "Title not found", "description_text": "Description not found.", "samples": [], "spec": None}
+    if "atcoder.jp" not in problem_url:
+        return result
+
+    root = lxml.html.fromstring(page)
+    title_element = next(iter(root.xpath("//h2") or root.xpath("//span[contains(concat(' ', normalize-space(@class), ' '), ' h2 ')]")), None)
+    if title_element is not None:
+        # leave out the 'Editorial' link, like the BeautifulSoup extractor
+        editorial_link = title_element.find(".//a")
+        if editorial_link is not None:
+            editorial_link.drop_tree()
+        result["title"] = "".join(_strings(title_element)).strip()
+
+    statement = next(iter(root.xpath("//span[@class='lang-en']") or root.xpath("//div[@id='task-statement']")), None)
+    if statement is None:
+        return result
+    result["description_text"] = _text(statement)
+
+    sections = {}
+    sample_parts: Dict[int, Dict[str, str]] = {}
+    for section in statement.iter("section"):
+        heading = section.find(".//h3")
+        if heading is None:
+            continue
+        name = _text(heading, separator="")
+        match = SAMPLE_HEADING.fullmatch(name)
+        if match:
+            pre = section.find("pre")
+            if pre is not None:
+                sample_parts.setdefault(int(match.group(2)), {})[match.group(1).lower()] = "".join(_strings(pre))
+        else:
+            sections.setdefault(name, section)
+
+    samples: List[Dict[str, str]] = []
+    for index in sorted(sample_parts):
+        if len(sample_parts[index]) == 2:
+            samples.append({"input": sample_parts[index]["input"], "output": sample_parts[index]["output"]})
+    result["samples"] = samples
+
+    time_limit, memory_limit_mb = parse_limits(" ".join(_strings(root)))
+    result["spec"] = {
+        "title": result["title"],
+        "url": problem_url,
+        "time_limit": time_limit,
+        "memory_limit_mb": memory_limit_mb,
+        "statement": _section_body(sections["Problem Statement"]) if "Problem Statement" in sections else "",
+        "constraints": [_text(item) for item in sections["Constraints"].iter("li")] if "Constraints" in sections else [],
+        "input_format": _section_body(sections["Input"]) if "Input" in sections else "",
+        "output_format": _section_body(sections["Output"]) if "Output" in sections else "",
+        "samples": samples,
+    }
+    return result
+
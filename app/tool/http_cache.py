@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import aiofiles
+from pathlib import Path
+from typing import Optional
+from dataclasses import dataclass, asdict
+
+
+DEFAULT_CACHE_DIR = Path(".cache") / "http"
+
+
+class CacheMissError(Exception):
+    """Raised in offline mode when a URL is not in the cache."""
+
+
+@dataclass
+class CacheEntry:
+    """Metadata stored next to a cached response body."""
+    url: str
+    fetched_at: float
+    size: int
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class ResponseCache:
+    """
+    A persistent on-disk cache of GET responses, used by HttpSession.
+    Each URL is stored as '<sha256>.json' (metadata) and '<sha256>.body' (the decoded text).
+    Entries younger than 'ttl' are served without touching the network, older ones are revalidated with
+    a conditional request (If-None-Match / If-Modified-Since).
+    """
+    def __init__(
+        self,
+        cache_dir: Path = DEFAULT_CACHE_DIR,
+        ttl: float = 24 * 3600,
+        max_bytes: int = 256 * 1024 * 1024,
+        evict_after: float = 30 * 24 * 3600,
+        offline: bool = False,
+    ):
+        """
+        Args:
+            cache_dir (Path): Directory where the responses are stored.
+            ttl (float): Seconds during which a cached response is used without revalidation.
+            max_bytes (int): Upper bound of the total body size; least recently used entries are evicted first.
+            evict_after (float): Entries not used for this many seconds are removed by 'prune'.
+            offline (bool): Serve only from the cache and never touch the network.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.evict_after = evict_after
+        self.offline = offline
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, url: str) -> tuple:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{key}.json", self.cache_dir / f"{key}.body"
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return time.time() - entry.fetched_at < self.ttl
+
+    async def lookup(self, url: str) -> Optional[tuple]:
+        """Return (CacheEntry, body) for a cached URL, or None."""
+        meta_path, body_path = self._paths(url)
+        try:
+            async with aiofiles.open(meta_path, "r", encoding="utf-8") as f:
+                entry = CacheEntry(**json.loads(await f.read()))
+            async with aiofiles.open(body_path, "r", encoding="utf-8") as f:
+                body = await f.read()
+        except (FileNotFoundError, json.JSONDecodeError, TypeError):
+            return None
+
+        # the access time drives the LRU eviction
+        os.utime(meta_path)
+        return entry, body
+
+    async def store(self, url: str, body: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        meta_path, body_path = self._paths(url)
+        entry = CacheEntry(
+            url=url,
+            fetched_at=time.time(),
+            size=len(body.encode("utf-8")),
+            etag=etag,
+            last_modified=last_modified,
+        )
+        # body first, so that a metadata file always points at a complete body
+        async with aiofiles.open(body_path, "w", encoding="utf-8") as f:
+            await f.write(body)
+        async with aiofiles.open(meta_path, "w", encoding="utf-8") as f:
+            await f.write(json.dumps(asdict(entry)))
+
+        await asyncio.to_thread(self._enforce_size_limit)
+
+    async def revalidated(self, url: str, entry: CacheEntry):
+        """Mark an entry as fresh again after the server answered '304 Not Modified'."""
+        meta_path, _ = self._paths(url)
+        entry.fetched_at = time.time()
+        async with aiofiles.open(meta_path, "w", encoding="utf-8") as f:
+            await f.write(json.dumps(asdict(entry)))
+
+    @staticmethod
+    def conditional_headers(entry: CacheEntry) -> dict:
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def _remove(self, meta_path: Path):
+        meta_path.unlink(missing_ok=True)
+        meta_path.with_suffix(".body").unlink(missing_ok=True)
+
+    def _enforce_size_limit(self):
+        entries = []
+        total = 0
+        for meta_path in self.cache_dir.glob("*.json"):
+            body_path = meta_path.with_suffix(".body")
+            try:
+                size = body_path.stat().st_size
+                last_used = meta_path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            entries.append((last_used, size, meta_path))
+            total += size
+
+        if total <= self.max_bytes:
+            return
+        for _, size, meta_path in sorted(entries):
+            self._remove(meta_path)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def prune(self) -> int:
+        """Remove entries that have not been used for 'evict_after' seconds. Returns the number of removed entries."""
+        removed = 0
+        deadline = time.time() - self.evict_after
+        for meta_path in self.cache_dir.glob("*.json"):
+            try:
+                if meta_path.stat().st_mtime < deadline:
+                    self._remove(meta_path)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        self._enforce_size_limit()
+        return removed
@@ -0,0 +1,224 @@
+import os
+import sys
+import json
+import signal
+import asyncio
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+from dataclasses import dataclass, asdict
+from concurrent.futures import ThreadPoolExecutor
+
+from app.protocols import AgentMessage
+from app.context import collect_test_cases
+from app.tool.problem_spec import resolve_limits
+from app.tool.runner import RunResult, run_process
+from app.tool.warm_pool import WarmWorkerPool, get_shared_pool
+
+
+AC, WA, TLE, RE, MLE = "AC", "WA", "TLE", "RE", "MLE"
+
+# names of the cases that failed in the last judge run of each solution file, one '<code_file>.json' per solution:
+# candidates judged side by side (e.g. 'main_t0.py', 'main_v1.py') must not reorder each other's cases
+HISTORY_DIR = ".judge_history"
+
+
+@dataclass
+class CaseVerdict:
+    """Judged outcome of one test case."""
+    name: str
+    verdict: str
+    wall_time: float
+    cpu_time: float
+    memory_kb: int
+    message: str = ""
+    output: str = ""  # the start of the actual output of a WA, for repair prompts
+
+
+def order_cases(cases: List[Tuple[str, Path, Path]], previously_failing: List[str]) -> List[Tuple[str, Path, Path]]:
+    """
+    Order cases so that a wrong solution fails as early as possible:
+    cases that failed last time first, then by input size with the largest input hoisted to second place to expose TLE early.
+    """
+    by_size = sorted(cases, key=lambda case: case[1].stat().st_size)
+    failing = [case for case in by_size if case[0] in previously_failing]
+    rest = [case for case in by_size if case[0] not in previously_failing]
+    if len(rest) > 2:
+        rest.insert(1, rest.pop())
+    return failing + rest
+
+
+def _history_path(problem_dir: Path, code_file: str) -> Path:
+    return problem_dir / HISTORY_DIR / f"{Path(code_file).name}.json"
+
+
+def _load_history(problem_dir: Path, code_file: str) -> List[str]:
+    try:
+        return json.loads(_history_path(problem_dir, code_file).read_text(encoding="utf-8")).get("failing", [])
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+
+def _save_history(problem_dir: Path, code_file: str, failing: List[str]):
+    path = _history_path(problem_dir, code_file)
+    path.parent.mkdir(exist_ok=True)
+    # replaced as a whole, never read and merged: a concurrent judge of the same file only wins or loses the race
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    temp_path.write_text(json.dumps({"failing": failing}), encoding="utf-8")
+    os.replace(temp_path, path)
+
+
+def compare_tokens(output: str, expected: str) -> bool:
+    """Token-wise comparison: whitespace and line breaks between tokens do not matter."""
+    return output.split() == expected.split()
+
+
+def classify(name: str, run: RunResult, expected: str, time_limit: float, memory_limit_mb: int) -> CaseVerdict:
+    """Turn a raw run into a verdict. Limits are checked before correctness: a TLE run's output is not trusted."""
+    def verdict(kind: str, message: str = "", output: str = "") -> CaseVerdict:
+        return CaseVerdict(
+            name=name,
+            verdict=kind,
+            wall_time=round(run.wall_time, 4),
+            cpu_time=round(run.cpu_time, 4),
+            memory_kb=run.max_rss_kb,
+            message=message,
+            output=output,
+        )
+
+    if run.timed_out or run.term_signal == signal.SIGXCPU or run.cpu_time > time_limit:
+        return verdict(TLE, f"cpu {run.cpu_time:.3f}s, wall {run.wall_time:.3f}s, limit {time_limit}s")
+    if run.max_rss_kb > memory_limit_mb * 1024 or "MemoryError" in run.stderr:
+        return verdict(MLE, f"peak {run.max_rss_kb // 1024} MB, limit {memory_limit_mb} MB")
+    if run.term_signal is not None or run.exit_code != 0:
+        reason = f"signal {run.term_signal}" if run.term_signal is not None else f"exit code {run.exit_code}"
+        return verdict(RE, f"{reason}: {run.stderr.strip()[-500:]}")
+    if not compare_tokens(run.stdout, expected):
+        return verdict(WA, f"expected '{expected.strip()[:200]}', got '{run.stdout.strip()[:200]}'", output=run.stdout[:2000])
+    return verdict(AC)
+
+
+async def judge_solution(
+    problem_dir: str,
+    code_file: str = "main.py",
+    time_limit: Optional[float] = None,
+    memory_limit_mb: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    use_warm_pool: bool = True,
+    pool: Optional[WarmWorkerPool] = None,
+    fail_fast: bool = False,
+    max_failures: Optional[int] = None,
+) -> AgentMessage:
+    """
+    Tool function: run a Python solution against every 'sol_N.in'/'ans_N.out' pair of a problem directory.
+    The cases run concurrently, each in its own process under rlimits, and every case gets a verdict (AC/WA/TLE/RE/MLE).
+    Cases are started in fail-early order (see 'order_cases'); with 'fail_fast' or 'max_failures' the remaining
+    cases are cancelled, including the ones already running, once enough cases failed.
+
+    Args:
+        problem_dir (str): Directory of the problem.
+        code_file (str): Solution file inside the problem directory.
+        time_limit (Optional[float]): CPU time limit per case in seconds. Defaults to the limit in 'problem.json'.
+        memory_limit_mb (Optional[int]): Memory limit per case in MB. Defaults to the limit in 'problem.json'.
+        max_workers (Optional[int]): Number of cases judged at the same time when cold processes are used. Defaults to the number of CPUs.
+        use_warm_pool (bool): Fork each run from a warm interpreter instead of starting 'python main.py' per case.
+        pool (Optional[WarmWorkerPool]): Worker pool to use. Defaults to the process-wide pool.
+        fail_fast (bool): Stop at the first non-AC verdict.
+        max_failures (Optional[int]): Stop after this many non-AC verdicts.
+
+    Returns:
+        AgentMessage: The payload holds the overall verdict, the pass count, the per-case results and the skipped cases.
+    """
+    source_name = "judge_solution"
+    target_path = Path(problem_dir)
+    code_path = target_path / code_file
+    print(f"\n[Tool: {source_name}]: Judging '{code_path}'...")
+
+    if not code_path.exists():
+        error_msg = f"Solution file '{code_path}' does not exist."
+        print(f"[Tool: {source_name}]: {error_msg}")
+        return AgentMessage(status="failure", source=source_name, message_type="error", error=error_msg)
+
+    cases = await asyncio.to_thread(collect_test_cases, target_path)
+    if not cases:
+        error_msg = f"No test cases (sol_N.in / ans_N.out) found in '{problem_dir}'."
+        print(f"[Tool: {source_name}]: {error_msg}")
+        return AgentMessage(status="failure", source=source_name, message_type="error", error=error_msg)
+
+    time_limit, memory_limit_mb = await asyncio.to_thread(resolve_limits, target_path, time_limit, memory_limit_mb)
+    previously_failing = await asyncio.to_thread(_load_history, target_path, code_file)
+    cases = await asyncio.to_thread(order_cases, cases, previously_failing)
+    stop_after = 1 if fail_fast else max_failures
+
+    cancel = threading.Event()
+    if use_warm_pool:
+        pool = pool or get_shared_pool()
+        source = await asyncio.to_thread(code_path.read_text, encoding="utf-8")
+
+        async def run(input_path: Path) -> RunResult:
+            return await pool.run(
+                source,
+                filename=str(code_path.resolve()),
+                input_path=input_path,
+                time_limit=time_limit,
+                memory_limit_mb=memory_limit_mb,
+                cwd=target_path,
+            )
+        executor = None
+    else:
+        cmd = [sys.executable, str(code_path.resolve())]
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=max_workers or os.cpu_count())
+
+        async def run(input_path: Path) -> RunResult:
+            return await loop.run_in_executor(executor, run_process, cmd, input_path, time_limit, memory_limit_mb, target_path, cancel)
+
+    async def judge_case(name: str, input_path: Path, answer_path: Path) -> CaseVerdict:
+        result = await run(input_path)
+        expected = await asyncio.to_thread(answer_path.read_text, encoding="utf-8")
+        return classify(name, result, expected, time_limit, memory_limit_mb)
+
+    # tasks are created in the chosen order, and both runners hand out their slots first come, first served
+    tasks = {asyncio.ensure_future(judge_case(*case)): case[0] for case in cases}
+    results = []
+    failures = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            res = await next_done
+            results.append(res)
+            if res.verdict != AC:
+                failures += 1
+                if stop_after and failures >= stop_after:
+                    break
+    finally:
+        cancel.set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    judged = {res.name for res in results}
+    skipped = [name for name in tasks.values() if name not in judged]
+    failing = [res.name for res in results if res.verdict != AC]
+    await asyncio.to_thread(_save_history, target_path, code_file, failing)
+
+    passed = len(results) - len(failing)
+    overall = next((res.verdict for res in results if res.verdict != AC), AC)
+    summary = f"Judged '{code_file}' on {len(results)}/{len(cases)} cases: {overall} ({passed}/{len(results)} passed)."
+    if skipped:
+        summary += f" Stopped early, {len(skipped)} cases skipped."
+    print(f"[Tool: {source_name}]: {summary}")
+
+    return AgentMessage(
+        source=source_name,
+        message_type="tool_result",
+        payload={
+            "summary": summary,
+            "verdict": overall,
+            "passed": passed,
+            "total": len(cases),
+            "results": [asdict(res) for res in results],
+            "skipped": skipped,
+        }
+    )
@@ -0,0 +1,77 @@
+import json
+import time
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import Dict, Optional
+
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def content_hash(data: str) -> str:
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class ContestManifest:
+    """
+    Per-contest record of the problem directories written by the parser.
+    For every problem it keeps the source URL and the sha256 of each written file, so that
+    an incremental run can tell a complete directory from a missing, corrupted or outdated one.
+    """
+    def __init__(self, base_dir: Path, problems: Optional[Dict[str, dict]] = None):
+        self.base_dir = Path(base_dir)
+        self.problems: Dict[str, dict] = problems or {}
+
+    @property
+    def path(self) -> Path:
+        return self.base_dir / MANIFEST_NAME
+
+    @classmethod
+    async def load(cls, base_dir: Path) -> "ContestManifest":
+        return await asyncio.to_thread(cls._load_sync, Path(base_dir))
+
+    @classmethod
+    def _load_sync(cls, base_dir: Path) -> "ContestManifest":
+        try:
+            data = json.loads((base_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return cls(base_dir)
+        if data.get("version") != MANIFEST_VERSION:
+            # a manifest written by another layout is treated as absent, which forces a re-fetch
+            return cls(base_dir)
+        return cls(base_dir, data.get("problems", {}))
+
+    async def save(self):
+        data = {"version": MANIFEST_VERSION, "problems": self.problems}
+        await asyncio.to_thread(self.path.write_text, json.dumps(data, indent=2), encoding="utf-8")
+
+    def record(self, problem_id: str, url: str, files: Dict[str, str]):
+        self.problems[problem_id] = {"url": url, "files": files, "updated_at": time.time()}
+
+    def check(self, problem_id: str, url: str) -> Optional[str]:
+        """
+        Verify a materialized problem directory against the manifest.
+
+        Returns:
+            Optional[str]: None if the directory is complete and up to date, otherwise the reason why it must be re-fetched.
+        """
+        record = self.problems.get(problem_id)
+        if record is None:
+            return "not in manifest"
+        if record.get("url") != url:
+            return "source URL changed"
+
+        problem_dir = self.base_dir / problem_id
+        for name, expected in record.get("files", {}).items():
+            try:
+                actual = content_hash((problem_dir / name).read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                return f"missing file '{name}'"
+            if actual != expected:
+                return f"hash mismatch for '{name}'"
+        return None
+
+    async def check_async(self, problem_id: str, url: str) -> Optional[str]:
+        return await asyncio.to_thread(self.check, problem_id, url)
@@ -5,9 +5,13 @@ import aiofiles
 from pathlib import Path
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 from app.protocols import AgentMessage
+from app.tool.session import HttpSession, get_shared_session
+from app.tool.manifest import content_hash
+from app.tool.problem_spec import SPEC_FILE, ProblemSpec, parse_atcoder_spec
+from app.tool.fast_parser import extract_problem_lxml, get_parse_executor
 
 
 async def _write_to_file_async(file_path: Path, data: str):
@@ -22,12 +26,13 @@ async def _write_to_file_async(file_path: Path, data: str):
         print(f"Error occurs when writing into file {file_path}: {e}")
 
 
-async def parse_contest_page(contest_url: str) -> AgentMessage:
+async def parse_contest_page(contest_url: str, session: Optional[HttpSession] = None) -> AgentMessage:
     """
     Tool function: accesses the contest homepage and parses out the URLs of all the problems for that contest.
     
     Args:
         contest_url (str): URL of the contest.
+        session (Optional[HttpSession]): Pooled HTTP session to use. Defaults to the process-wide session.
 
     Returns:
         List[str]: Absolute URL of problems.
@@ -38,12 +43,11 @@ async def parse_contest_page(contest_url: str) -> AgentMessage:
     try:
         tasks_url = contest_url.rstrip('/') + '/tasks'
         
-        async with httpx.AsyncClient() as client:
-            print(f"[Tool: parse_contest_page]: Requesting problem list page: {tasks_url}")
-            response = await client.get(tasks_url, follow_redirects=True)
-            response.raise_for_status()
+        session = session or get_shared_session()
+        print(f"[Tool: parse_contest_page]: Requesting problem list page: {tasks_url}")
+        page = await session.get_text(tasks_url)
 
-        soup = BeautifulSoup(response.text, "lxml")
+        soup = BeautifulSoup(page, "lxml")
         task_rows = soup.select("div.table-responsive table tbody tr")
         
         if not task_rows:
@@ -75,34 +79,12 @@ async def parse_contest_page(contest_url: str) -> AgentMessage:
             error=error_msg
         )
 
-async def parse_problem_page(problem_url: str, target_dir: Path) -> AgentMessage:
+def extract_problem_bs4(page: str, problem_url: str) -> dict:
     """
-    Tool function: receives a problem URL, grabs and parses all the information and stores it in the specified folder.
-
-    Args:
-        problem_url (str): URL of a single problem.
-        target_dir (Path): Path to the destination folder where the parsing results will be stored.
-        
-    Returns:
-        str: A summary string describing the results of the execution.
+    Extract the title, the flattened statement, the samples and the structured spec of a task page with BeautifulSoup.
+    The reference implementation; 'app.tool.fast_parser.extract_problem_lxml' returns the same in a single pass.
     """
-    print(f"[Tool: parse_problem_page]: Start processing problem: {problem_url}")
-    source_name = "parse_problem_page"
-    
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(problem_url, follow_redirects=True, timeout=15)
-            response.raise_for_status()
-        soup = BeautifulSoup(response.text, "lxml")
-    except Exception as e:
-        error_msg = f"Failed to access page: {e}"
-        print(f"[Tool: parse_problem_page]: {error_msg}")
-        return AgentMessage(
-            status="failure", 
-            source=source_name, 
-            message_type="error", 
-            error=error_msg)
-
+    soup = BeautifulSoup(page, "lxml")
     description_text = "Description not found."
     title = "Title not found"
     
@@ -129,14 +111,53 @@ async def parse_problem_page(problem_url: str, target_dir: Path) -> AgentMessage
             if input_pre and output_pre:
                 samples.append({"input": input_pre.get_text(), "output": output_pre.get_text()})
 
-    write_tasks = []
-    description_content = f"# {title}\n\n**URL:** {problem_url}\n\n---\n\n{description_text}"
-    write_tasks.append(_write_to_file_async(target_dir / "problem.md", description_content))
-    for i, sample in enumerate(samples, 1):
-        write_tasks.append(_write_to_file_async(target_dir / f"sol_{i}.in", sample["input"]))
-        write_tasks.append(_write_to_file_async(target_dir / f"ans_{i}.out", sample["output"]))
+    spec = parse_atcoder_spec(soup, problem_url, title, samples).model_dump() if "atcoder.jp" in problem_url else None
+    return {"title": title, "description_text": description_text, "samples": samples, "spec": spec}
+
+
+async def parse_problem_page(problem_url: str, target_dir: Path, session: Optional[HttpSession] = None, fast: bool = True) -> AgentMessage:
+    """
+    Tool function: receives a problem URL, grabs and parses all the information and stores it in the specified folder.
+
+    Args:
+        problem_url (str): URL of a single problem.
+        target_dir (Path): Path to the destination folder where the parsing results will be stored.
+        session (Optional[HttpSession]): Pooled HTTP session to use. Defaults to the process-wide session.
+        fast (bool): Use the single-pass lxml extractor instead of BeautifulSoup. Either way, parsing runs
+            off the event loop, on the parse executor.
         
-    await asyncio.gather(*write_tasks)
+    Returns:
+        str: A summary string describing the results of the execution.
+    """
+    print(f"[Tool: parse_problem_page]: Start processing problem: {problem_url}")
+    source_name = "parse_problem_page"
+    
+    try:
+        session = session or get_shared_session()
+        page = await session.get_text(problem_url)
+        extractor = extract_problem_lxml if fast else extract_problem_bs4
+        extracted = await asyncio.get_running_loop().run_in_executor(get_parse_executor(), extractor, page, problem_url)
+    except Exception as e:
+        error_msg = f"Failed to access page: {e}"
+        print(f"[Tool: parse_problem_page]: {error_msg}")
+        return AgentMessage(
+            status="failure", 
+            source=source_name, 
+            message_type="error", 
+            error=error_msg)
+
+    title = extracted["title"]
+    samples = extracted["samples"]
+    description_content = f"# {title}\n\n**URL:** {problem_url}\n\n---\n\n{extracted['description_text']}"
+    files = {"problem.md": description_content}
+    if extracted["spec"] is not None:
+        # limits, constraints and formats are on the page, no need to ask an LLM for them later
+        files[SPEC_FILE] = ProblemSpec(**extracted["spec"]).model_dump_json(indent=2)
+    for i, sample in enumerate(samples, 1):
+        files[f"sol_{i}.in"] = sample["input"]
+        files[f"ans_{i}.out"] = sample["output"]
+
+    await asyncio.gather(*[_write_to_file_async(target_dir / name, data) for name, data in files.items()])
     
     summary = f"Successfully fetched the problem '{title}' into the folder: {target_dir}"
     print(f"[Tool: parse_problem_page]: {summary}")
@@ -144,5 +165,10 @@ async def parse_problem_page(problem_url: str, target_dir: Path) -> AgentMessage
     return AgentMessage(
         source=source_name,
         message_type="tool_result",
-        payload={"summary": summary, "target_dir": str(target_dir)}
+        payload={
+            "summary": summary,
+            "target_dir": str(target_dir),
+            "problem_url": problem_url,
+            "files": {name: content_hash(data) for name, data in files.items()},
+        }
     )
\ No newline at end of file
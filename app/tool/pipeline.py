@@ -1,16 +1,37 @@
 import json
+import time
 import asyncio
-from typing import List
+from typing import List, Optional
 from pathlib import Path
+from dataclasses import dataclass
 
 from app.tool.parser import *
+from app.tool.parser import _write_to_file_async
 from app.protocols import AgentMessage
+from app.tool.session import HttpSession, get_shared_session
+from app.tool.manifest import ContestManifest
+from app.tool.scheduler import FetchScheduler
+from app.agent.base import BaseLLM
+from app.llm.metrics import current_caller, current_problem
+from app.llm.scheduler import current_client
+from app.llm.base import current_sampling
+from app.context import get_problem_context
+from app.tool.think import analyze_problem, plan_solution_strategy, analyze_and_plan
+from app.tool.code_gen import generate_code, repair_code, REPAIR_MAX_CASES
+from app.tool.judge import judge_solution, AC
 
 
-async def parser_pipeline(contest_url: str) -> AgentMessage:
+async def parser_pipeline(contest_url: str, session: Optional[HttpSession] = None, incremental: bool = True) -> AgentMessage:
     """
     A deterministic pipeline that is responsible for the complete parsing of all question information for a contest.
     It calls multiple parsing tool functions sequentially.
+    All requests share one pooled HTTP session, so the contest page and every problem page reuse the same connections.
+
+    Args:
+        contest_url (str): URL of the contest.
+        session (Optional[HttpSession]): Pooled HTTP session to use. Defaults to the process-wide session.
+        incremental (bool): Skip problems whose directory matches the contest manifest ('manifest.json').
+            Missing, corrupted or outdated problems are still re-fetched.
 
     Returns:
         A JSON string summarizing the result, including the paths to problem directories.
@@ -18,7 +39,8 @@ async def parser_pipeline(contest_url: str) -> AgentMessage:
     print(f"\n--- Running Parsing Pipeline for: {contest_url} ---")
     
     source_name = "parser_pipeline"
-    contest_urls_msg = await parse_contest_page(contest_url)
+    session = session or get_shared_session()
+    contest_urls_msg = await parse_contest_page(contest_url, session=session)
 
     if contest_urls_msg.status == 'failure':
         print("--- Pipeline Finished with CRITICAL a FAILURE ---")
@@ -39,22 +61,42 @@ async def parser_pipeline(contest_url: str) -> AgentMessage:
     base_dir = Path(contest_name)
     base_dir.mkdir(exist_ok=True)
 
+    manifest = await ContestManifest.load(base_dir)
+
     parsing_tasks = []
     problem_dirs = []
+    fetched_ids = []
+    skipped_ids = []
     for url in problem_urls:
         problem_id = url.strip("/").split("/")[-1]
         target_dir = base_dir / problem_id
         problem_dirs.append(str(target_dir))
-        task = parse_problem_page(problem_url=url, target_dir=target_dir)
+
+        if incremental:
+            reason = await manifest.check_async(problem_id, url)
+            if reason is None:
+                skipped_ids.append(problem_id)
+                continue
+            print(f"[{source_name}]: Re-fetching '{problem_id}': {reason}.")
+
+        fetched_ids.append(problem_id)
+        task = parse_problem_page(problem_url=url, target_dir=target_dir, session=session)
         parsing_tasks.append(task)
 
     results = await asyncio.gather(*parsing_tasks)
 
+    for problem_id, res in zip(fetched_ids, results):
+        if res.status == 'success':
+            manifest.record(problem_id, res.payload["problem_url"], res.payload["files"])
+    await manifest.save()
+
     failed_tasks = [res for res in results if res.status == 'failure']
     if failed_tasks:
         print(f"Warning: {len(failed_tasks)} sub-tasks failed during parsing.")
+    if skipped_ids:
+        print(f"[{source_name}]: Skipped {len(skipped_ids)} up-to-date problems: {', '.join(skipped_ids)}")
 
-    summary = f"Parsing pipeline completed. Processed {len(problem_urls)} problems into '{base_dir}'."
+    summary = f"Parsing pipeline completed. Processed {len(problem_urls)} problems into '{base_dir}' ({len(fetched_ids)} fetched, {len(skipped_ids)} skipped)."
     print(f"--- Pipeline Finished: {summary} ---")
 
     return AgentMessage(
@@ -63,6 +105,366 @@ async def parser_pipeline(contest_url: str) -> AgentMessage:
         payload={
             "summary": summary,
             "problem_directories": problem_dirs,
+            "fetched_problems": fetched_ids,
+            "skipped_problems": skipped_ids,
             "sub_task_results": [res.model_dump() for res in results]
         }
-    )
\ No newline at end of file
+    )
+
+def contest_range(series: str, start: int, end: int, base_url: str = "https://atcoder.jp/contests/") -> List[str]:
+    """Build contest URLs for a numbered series, e.g. contest_range("abc", 300, 363) -> abc300 ... abc363 (inclusive)."""
+    return [f"{base_url.rstrip('/')}/{series}{number:03d}" for number in range(start, end + 1)]
+
+
+async def batch_parser_pipeline(
+    contest_urls: List[str],
+    session: Optional[HttpSession] = None,
+    scheduler: Optional[FetchScheduler] = None,
+    incremental: bool = True,
+) -> AgentMessage:
+    """
+    Run 'parser_pipeline' for many contests at once.
+    All contest and problem requests go through one FetchScheduler, which rate-limits, bounds the concurrency
+    and retries throttled requests, so the contests can be gathered without getting the client blocked.
+
+    Args:
+        contest_urls (List[str]): URLs of the contests, see 'contest_range'.
+        session (Optional[HttpSession]): Pooled HTTP session to use. Defaults to the process-wide session.
+        scheduler (Optional[FetchScheduler]): Scheduler for this batch. Defaults to the session's scheduler, or a new one.
+            The session gets its previous scheduler back once the batch is done.
+        incremental (bool): Passed to 'parser_pipeline'.
+    """
+    source_name = "batch_parser_pipeline"
+    print(f"\n=== Running Batch Parsing Pipeline for {len(contest_urls)} contests ===")
+
+    session = session or get_shared_session()
+    previous_scheduler = session.scheduler
+    scheduler = scheduler or previous_scheduler or FetchScheduler()
+    session.scheduler = scheduler
+
+    finished = 0
+
+    async def run_one(contest_url: str) -> AgentMessage:
+        nonlocal finished
+        result = await parser_pipeline(contest_url, session=session, incremental=incremental)
+        finished += 1
+        print(f"[{source_name}]: {finished}/{len(contest_urls)} contests done ({contest_url}: {result.status}).")
+        return result
+
+    try:
+        results = await asyncio.gather(*[run_one(url) for url in contest_urls])
+    finally:
+        # the session is shared: this batch's scheduler must not outlive it
+        session.scheduler = previous_scheduler
+
+    failed_contests = [url for url, res in zip(contest_urls, results) if res.status == 'failure']
+    problem_dirs = [d for res in results if res.status == 'success' for d in res.payload.get("problem_directories", [])]
+
+    summary = f"Batch parsing completed. {len(contest_urls) - len(failed_contests)}/{len(contest_urls)} contests parsed, {len(problem_dirs)} problems in total."
+    print(f"=== Batch Finished: {summary} ===")
+
+    return AgentMessage(
+        status="failure" if contest_urls and len(failed_contests) == len(contest_urls) else "success",
+        source=source_name,
+        message_type="pipeline_result",
+        payload={
+            "summary": summary,
+            "problem_directories": problem_dirs,
+            "failed_contests": failed_contests,
+            "fetch_stats": scheduler.stats(),
+        }
+    )
+
+
+async def _judge_safely(problem_dir: str, code_file: str, **kwargs) -> AgentMessage:
+    """'judge_solution', with an exception (e.g. a broken worker pool) turned into a failure message."""
+    try:
+        return await judge_solution(problem_dir=problem_dir, code_file=code_file, **kwargs)
+    except Exception as e:
+        error_msg = f"Failed to judge '{code_file}': {e}"
+        print(f"[Tool: judge_solution]: {error_msg}")
+        return AgentMessage(status="failure", source="judge_solution", message_type="error", error=error_msg)
+
+
+async def _best_version(problem_dir: str, code_file: str, versions: List[str]) -> tuple:
+    """Judge every version on all the test cases and return (code, verdict, passed, total) of the one that passes the most."""
+    stem = Path(code_file).stem
+    best = None
+    for index, code in enumerate(versions):
+        version_path = Path(problem_dir) / f"{stem}_v{index}.py"
+        await _write_to_file_async(version_path, code)
+        try:
+            judge_msg = await _judge_safely(problem_dir, version_path.name)
+        finally:
+            await asyncio.to_thread(version_path.unlink, missing_ok=True)
+        if judge_msg.status == 'failure':
+            # a version that cannot be judged is never kept
+            continue
+        passed = judge_msg.payload["passed"]
+        # on a tie the later version wins, it was repaired against more failures
+        if best is None or passed >= best[2]:
+            best = (code, judge_msg.payload["verdict"], passed, judge_msg.payload["total"])
+    # none of them could be judged again: keep the last version the caller judged
+    return best or (versions[-1], None, 0, 0)
+
+
+async def solve_pipeline(problem_dir: str, llm: BaseLLM, max_repairs: int = 2, code_file: str = "main.py", fused: bool = True) -> AgentMessage:
+    """
+    A deterministic pipeline that solves one problem: analyze -> plan -> generate code -> judge locally,
+    then, while the judge fails, repair the code from the failing cases and judge again.
+    Every step is fixed, so no LLM call is spent on deciding what to do next; the agentic solver is only
+    needed when this pipeline does not reach AC.
+    The best judged version of the code is left in 'code_file'.
+
+    Args:
+        problem_dir (str): Directory of the problem (statement and samples, see 'parser_pipeline').
+        llm (BaseLLM): The model used by every stage.
+        max_repairs (int): Number of repair rounds after the first failing judge.
+        code_file (str): Solution file inside the problem directory.
+        fused (bool): Get the analysis and the plan from one LLM call (see 'analyze_and_plan') instead of two.
+
+    Returns:
+        AgentMessage: 'success' if the code passed every local test. The payload holds the final verdict,
+        the pass count, the number of repairs and the wall time of every stage.
+    """
+    source_name = "solve_pipeline"
+    problem_name = Path(problem_dir).name
+    print(f"\n--- Running Solve Pipeline for: {problem_dir} ---")
+    # LLM requests are queued and accounted on behalf of this problem, like the ones of its solver agent
+    current_client.set(f"Solver-{problem_name}")
+    current_problem.set(problem_name)
+
+    timings = {}
+
+    async def stage(name: str, call):
+        current_caller.set(name)
+        start = time.perf_counter()
+        result = await call
+        timings[name] = round(timings.get(name, 0.0) + time.perf_counter() - start, 3)
+        return result
+
+    def failure(message: AgentMessage) -> AgentMessage:
+        print(f"--- Solve Pipeline for '{problem_name}' stopped at '{message.source}': {message.error} ---")
+        return AgentMessage(
+            status="failure",
+            source=source_name,
+            message_type="pipeline_result",
+            error=message.error,
+            payload={"summary": f"Stopped at '{message.source}'.", "verdict": None, "timings": timings},
+        )
+
+    if fused:
+        plan_msg = await stage("analyze_and_plan", analyze_and_plan(problem_dir=problem_dir, llm=llm))
+        if plan_msg.status == 'failure':
+            return failure(plan_msg)
+    else:
+        analysis_msg = await stage("analyze_problem", analyze_problem(problem_dir=problem_dir, llm=llm))
+        if analysis_msg.status == 'failure':
+            return failure(analysis_msg)
+        # the analysis, the plan and the statement are passed on through the problem context
+        plan_msg = await stage("plan_solution_strategy", plan_solution_strategy(analysis=None, description=None, llm=llm, problem_dir=problem_dir))
+        if plan_msg.status == 'failure':
+            return failure(plan_msg)
+    code_msg = await stage("generate_code", generate_code(plan=None, description=None, problem_dir=problem_dir, llm=llm))
+    if code_msg.status == 'failure':
+        return failure(code_msg)
+
+    code_path = Path(problem_dir) / code_file
+    versions = []  # the code of every judged version
+    repairs = 0
+    while True:
+        # a few failing cases are enough for a repair, the rest would only cost time
+        judge_msg = await stage("judge_solution", _judge_safely(problem_dir, code_file, max_failures=REPAIR_MAX_CASES))
+        if judge_msg.status == 'failure':
+            if not versions:
+                return failure(judge_msg)
+            # the repaired version cannot be judged: it counts as failed, and a judged version is restored below
+            break
+        versions.append(await asyncio.to_thread(code_path.read_text, encoding="utf-8"))
+        verdict = judge_msg.payload["verdict"]
+        if verdict == AC or repairs >= max_repairs:
+            break
+
+        repairs += 1
+        failures = [res for res in judge_msg.payload["results"] if res["verdict"] != AC]
+        repair_msg = await stage("repair_code", repair_code(problem_dir=problem_dir, failures=failures, llm=llm, code_file=code_file))
+        if repair_msg.status == 'failure':
+            break
+
+    if verdict == AC:
+        # an AC judge ran every case; the others stopped early, so their pass counts are not comparable
+        passed, total = judge_msg.payload["passed"], judge_msg.payload["total"]
+    else:
+        # a repair can make things worse: keep the version that passes the most cases of the full set
+        best_code, best_verdict, passed, total = await stage("judge_solution", _best_version(problem_dir, code_file, versions))
+        await _write_to_file_async(code_path, best_code)
+        verdict = best_verdict or verdict
+
+    summary = f"'{problem_name}': {verdict} after {repairs} repairs ({passed}/{total} passed by the kept version)."
+    print(f"--- Solve Pipeline Finished: {summary} ---")
+    return AgentMessage(
+        status="success" if verdict == AC else "failure",
+        source=source_name,
+        message_type="pipeline_result",
+        payload={
+            "summary": summary,
+            "verdict": verdict,
+            "passed": passed,
+            "total": total,
+            "repairs": repairs,
+            "code_path": str(code_path),
+            "timings": timings,
+        }
+    )
+
+
+@dataclass
+class SolveStrategy:
+    """One chain of a speculative solve: the model and the sampling options its plan and code are drawn with."""
+    name: str
+    llm: Optional[BaseLLM] = None  # defaults to the LLM given to 'speculative_solve'
+    temperature: Optional[float] = None
+    seed: Optional[int] = None
+
+    def options(self) -> Optional[dict]:
+        options = {key: value for key, value in (("temperature", self.temperature), ("seed", self.seed)) if value is not None}
+        return options or None
+
+
+# a careful chain and two more exploratory ones
+DEFAULT_STRATEGIES = [
+    SolveStrategy("t0", temperature=0.0),
+    SolveStrategy("t6", temperature=0.6),
+    SolveStrategy("t10", temperature=1.0),
+]
+
+
+async def speculative_solve(
+    problem_dir: str,
+    llm: BaseLLM,
+    strategies: Optional[List[SolveStrategy]] = None,
+    code_file: str = "main.py",
+) -> AgentMessage:
+    """
+    Race several independent plan -> code -> judge chains on one problem and keep the first that passes every local test.
+    Each chain draws its plan and code with its own model and sampling options, writes its candidate to
+    'main_<strategy>.py' and judges it as soon as it is written; once a candidate is AC, the other chains are
+    cancelled, including their in-flight LLM requests. This spends parallel compute to cut the time to the first
+    accepted solution. The analysis is shared: it extracts facts from the statement, the strategies differ from the plan on.
+
+    Args:
+        problem_dir (str): Directory of the problem.
+        llm (BaseLLM): The model for the analysis and for strategies without their own.
+        strategies (Optional[List[SolveStrategy]]): The chains to race. Defaults to DEFAULT_STRATEGIES.
+        code_file (str): Where the winning candidate is copied to. Without a winner, the candidate that passes the most
+            of all the cases is copied only if it beats the code already there.
+
+    Returns:
+        AgentMessage: 'success' if a candidate passed every local test. The payload names the winning strategy
+        and holds the outcome of every chain.
+    """
+    source_name = "speculative_solve"
+    problem_name = Path(problem_dir).name
+    strategies = strategies or DEFAULT_STRATEGIES
+    print(f"\n--- Running Speculative Solve for: {problem_dir} ({len(strategies)} strategies) ---")
+    current_client.set(f"Solver-{problem_name}")
+    current_problem.set(problem_name)
+    start = time.perf_counter()
+
+    current_caller.set("analyze_problem")
+    analysis_msg = await analyze_problem(problem_dir=problem_dir, llm=llm)
+    if analysis_msg.status == 'failure':
+        return AgentMessage(status="failure", source=source_name, message_type="pipeline_result", error=analysis_msg.error)
+    context = await get_problem_context(problem_dir)
+
+    async def chain(strategy: SolveStrategy) -> dict:
+        # tasks copy the context: the sampling options only apply to the requests of this chain
+        current_sampling.set(strategy.options())
+        chain_llm = strategy.llm or llm
+        candidate = f"main_{strategy.name}.py"
+        outcome = {"strategy": strategy.name, "code_file": candidate, "verdict": None, "passed": 0}
+
+        # the plan is kept out of the shared context until a chain wins
+        current_caller.set("plan_solution_strategy")
+        plan_msg = await plan_solution_strategy(analysis=context.analysis, description=context.statement, llm=chain_llm)
+        if plan_msg.status == 'failure':
+            return {**outcome, "error": plan_msg.error}
+        current_caller.set("generate_code")
+        code_msg = await generate_code(plan=plan_msg.payload["plan"], description=context.statement, problem_dir=problem_dir, llm=chain_llm, code_file=candidate)
+        if code_msg.status == 'failure':
+            return {**outcome, "error": code_msg.error}
+        judge_msg = await judge_solution(problem_dir=problem_dir, code_file=candidate, fail_fast=True)
+        if judge_msg.status == 'failure':
+            return {**outcome, "error": judge_msg.error}
+        return {
+            **outcome,
+            "verdict": judge_msg.payload["verdict"],
+            "passed": judge_msg.payload["passed"],
+            "total": judge_msg.payload["total"],
+            "plan": plan_msg.payload["plan"],
+            "elapsed": round(time.perf_counter() - start, 3),
+        }
+
+    tasks = [asyncio.ensure_future(chain(strategy)) for strategy in strategies]
+    outcomes = []
+    winner = None
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                outcome = await next_done
+            except Exception as e:
+                outcomes.append({"verdict": None, "passed": 0, "error": str(e)})
+                continue
+            outcomes.append(outcome)
+            print(f"[{source_name}]: Strategy '{outcome['strategy']}' finished: {outcome['verdict'] or outcome.get('error')}.")
+            if outcome["verdict"] == AC:
+                winner = outcome
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    code_path = Path(problem_dir) / code_file
+    best, verdict, passed, total = winner, None, None, None
+    if winner is not None:
+        # an AC judge ran every case
+        verdict, passed, total = AC, winner["passed"], winner["total"]
+    judged = [outcome for outcome in outcomes if outcome.get("verdict")]
+    if winner is None and judged:
+        # the fail-fast judges stopped at different cases, so their pass counts are not comparable: judge the
+        # candidates on the full set, together with the code already in 'code_file', which wins a tie
+        versions = [await asyncio.to_thread((Path(problem_dir) / outcome["code_file"]).read_text, encoding="utf-8") for outcome in judged]
+        if code_path.exists():
+            versions.append(await asyncio.to_thread(code_path.read_text, encoding="utf-8"))
+        best_code, verdict, passed, total = await _best_version(problem_dir, code_file, versions)
+        index = versions.index(best_code)
+        best = judged[index] if index < len(judged) and verdict is not None else None
+    if best is not None:
+        code = await asyncio.to_thread((Path(problem_dir) / best["code_file"]).read_text, encoding="utf-8")
+        await _write_to_file_async(code_path, code)
+        context.plan = best["plan"]
+
+    elapsed = round(time.perf_counter() - start, 3)
+    if winner is not None:
+        summary = f"'{problem_name}': AC by strategy '{winner['strategy']}' after {elapsed}s, {len(tasks) - len(outcomes)} strategies cancelled."
+    else:
+        kept = f"kept strategy '{best['strategy']}'" if best is not None else f"'{code_file}' left unchanged"
+        summary = f"'{problem_name}': no strategy reached AC in {elapsed}s, {kept} ({passed or 0}/{total or 0} passed on the full set)."
+    print(f"--- Speculative Solve Finished: {summary} ---")
+    return AgentMessage(
+        status="success" if winner is not None else "failure",
+        source=source_name,
+        message_type="pipeline_result",
+        payload={
+            "summary": summary,
+            "verdict": verdict,
+            "passed": passed,
+            "total": total,
+            "winner": winner["strategy"] if winner is not None else None,
+            "kept": best["strategy"] if best is not None else None,
+            "code_path": str(code_path),
+            "elapsed": elapsed,
+            "strategies": [{k: v for k, v in outcome.items() if k != "plan"} for outcome in outcomes],
+        }
+    )
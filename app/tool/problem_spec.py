@@ -0,0 +1,117 @@
+import re
+from pathlib import Path
+from typing import List, Optional, Tuple
+from pydantic import BaseModel, Field
+
+
+SPEC_FILE = "problem.json"
+
+# used when a problem has no 'problem.json' or its page did not state the limits
+DEFAULT_TIME_LIMIT = 2.0
+DEFAULT_MEMORY_LIMIT_MB = 1024
+
+# e.g. "Time Limit: 2 sec / Memory Limit: 1024 MB" (or "実行時間制限: 2 sec / メモリ制限: 1024 MiB")
+LIMITS_PATTERN = re.compile(r"(?:Time Limit|実行時間制限)\s*:\s*([\d.]+)\s*sec.*?(?:Memory Limit|メモリ制限)\s*:\s*(\d+)\s*(MB|MiB|KB|KiB)", re.DOTALL)
+
+
+class Sample(BaseModel):
+    input: str
+    output: str
+
+
+class ProblemSpec(BaseModel):
+    """The statement of a problem, parsed deterministically from its page."""
+    title: str
+    url: str
+    time_limit: Optional[float] = Field(None, description="Time limit in seconds.")
+    memory_limit_mb: Optional[int] = Field(None, description="Memory limit in MB.")
+    statement: str = Field("", description="The 'Problem Statement' section.")
+    constraints: List[str] = Field(default_factory=list, description="One entry per constraint, TeX as on the page.")
+    input_format: str = ""
+    output_format: str = ""
+    samples: List[Sample] = Field(default_factory=list)
+
+    def analysis(self) -> dict:
+        """The parts of an 'analyze_problem' result that the page states explicitly."""
+        return {
+            "input_format": self.input_format,
+            "output_format": self.output_format,
+            "constraints": self.constraints,
+            "time_limit": self.time_limit,
+            "memory_limit_mb": self.memory_limit_mb,
+        }
+
+
+def parse_limits(page_text: str) -> Tuple[Optional[float], Optional[int]]:
+    """(time limit in seconds, memory limit in MB) from the text of a task page."""
+    match = LIMITS_PATTERN.search(page_text)
+    if not match:
+        return None, None
+    memory = int(match.group(2))
+    if match.group(3) in ("KB", "KiB"):
+        memory //= 1024
+    return float(match.group(1)), memory
+
+
+def _section_body(section) -> str:
+    # the heading is the first element of the section; <pre> blocks keep their line breaks
+    parts = []
+    for child in section.find_all(["p", "pre", "ul", "ol", "div"], recursive=False):
+        if child.name == "pre":
+            parts.append(child.get_text())
+        else:
+            parts.append(child.get_text(" ", strip=True))
+    return "\n".join(part.strip("\n") for part in parts if part.strip())
+
+
+def parse_atcoder_spec(soup, problem_url: str, title: str, samples: List[dict]) -> ProblemSpec:
+    """
+    Parse an AtCoder task page (as BeautifulSoup) into a ProblemSpec.
+    The English statement is split into its '<section><h3>...</h3>...</section>' parts.
+    """
+    time_limit, memory_limit_mb = parse_limits(soup.get_text(" "))
+    statement = soup.find("span", class_="lang-en") or soup.find("div", id="task-statement") or soup
+
+    sections = {}
+    for section in statement.find_all("section"):
+        heading = section.find("h3")
+        if heading is not None:
+            sections.setdefault(heading.get_text(strip=True), section)
+
+    constraints = []
+    if "Constraints" in sections:
+        constraints = [item.get_text(" ", strip=True) for item in sections["Constraints"].find_all("li")]
+
+    return ProblemSpec(
+        title=title,
+        url=problem_url,
+        time_limit=time_limit,
+        memory_limit_mb=memory_limit_mb,
+        statement=_section_body(sections["Problem Statement"]) if "Problem Statement" in sections else "",
+        constraints=constraints,
+        input_format=_section_body(sections["Input"]) if "Input" in sections else "",
+        output_format=_section_body(sections["Output"]) if "Output" in sections else "",
+        samples=[Sample(**sample) for sample in samples],
+    )
+
+
+def load_problem_spec(problem_dir: Path) -> Optional[ProblemSpec]:
+    """The 'problem.json' of a problem directory, or None if it does not exist. Blocking."""
+    path = Path(problem_dir) / SPEC_FILE
+    try:
+        return ProblemSpec.model_validate_json(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def resolve_limits(problem_dir: Path, time_limit: Optional[float] = None, memory_limit_mb: Optional[int] = None) -> Tuple[float, int]:
+    """Explicit limits win, then the limits of 'problem.json', then the defaults. Blocking."""
+    if time_limit is None or memory_limit_mb is None:
+        spec = load_problem_spec(problem_dir)
+        if spec is not None:
+            time_limit = time_limit if time_limit is not None else spec.time_limit
+            memory_limit_mb = memory_limit_mb if memory_limit_mb is not None else spec.memory_limit_mb
+    return (
+        time_limit if time_limit is not None else DEFAULT_TIME_LIMIT,
+        memory_limit_mb if memory_limit_mb is not None else DEFAULT_MEMORY_LIMIT_MB,
+    )
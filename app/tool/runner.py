@@ -0,0 +1,147 @@
+import os
+import sys
+import time
+import signal
+import resource
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from typing import List, Optional
+from dataclasses import dataclass
+
+
+# address space headroom on top of the memory limit, the interpreter maps more than it touches
+ADDRESS_SPACE_HEADROOM_MB = 256
+
+
+@dataclass
+class RunResult:
+    """Raw outcome of running a program on one input."""
+    exit_code: Optional[int]
+    term_signal: Optional[int]
+    stdout: str
+    stderr: str
+    wall_time: float
+    cpu_time: float
+    max_rss_kb: int
+    timed_out: bool
+
+
+def cpu_seconds_for(time_limit: float) -> int:
+    return int(time_limit) + 1
+
+
+def wall_limit_for(time_limit: float) -> float:
+    return max(time_limit * 2, time_limit + 1)
+
+
+def address_space_for(memory_limit_mb: int) -> int:
+    return (memory_limit_mb + ADDRESS_SPACE_HEADROOM_MB) * 1024 * 1024
+
+
+# sets the limits in the child and execs the command, where prlimit (Linux only) is not available
+_LIMIT_WRAPPER = (
+    "import os, sys, resource\n"
+    "cpu, memory = int(sys.argv[1]), int(sys.argv[2])\n"
+    "resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))\n"
+    "resource.setrlimit(resource.RLIMIT_AS, (memory, memory))\n"
+    "resource.setrlimit(resource.RLIMIT_CORE, (0, 0))\n"
+    "os.execvp(sys.argv[3], sys.argv[3:])\n"
+)
+
+
+def _limited_command(cmd: List[str], cpu_seconds: int, memory_bytes: int) -> List[str]:
+    """
+    The command to spawn. With prlimit the limits are set on the child from here right after the spawn, which
+    costs nothing; otherwise a small wrapper sets them in the child, at the price of one more interpreter start.
+    (A preexec_fn is not an option: the judge spawns from several threads at once.)
+    """
+    if hasattr(resource, "prlimit"):
+        return cmd
+    return [sys.executable, "-S", "-c", _LIMIT_WRAPPER, str(cpu_seconds), str(memory_bytes), *cmd]
+
+
+def _limit_resources(pid: int, cpu_seconds: int, memory_bytes: int):
+    """Set the limits of a freshly spawned child, which is still starting its interpreter."""
+    if not hasattr(resource, "prlimit"):
+        return
+    try:
+        resource.prlimit(pid, resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+        resource.prlimit(pid, resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+        resource.prlimit(pid, resource.RLIMIT_CORE, (0, 0))
+    except ProcessLookupError:
+        # already gone, there is nothing left to limit
+        pass
+
+
+def run_process(
+    cmd: List[str],
+    input_path: Path,
+    time_limit: float,
+    memory_limit_mb: int,
+    cwd: Optional[Path] = None,
+    cancel: Optional[threading.Event] = None,
+) -> RunResult:
+    """
+    Run a command with 'input_path' as stdin under CPU, wall-clock and memory limits. Blocking.
+    Stdout and stderr go to temporary files, so large inputs and outputs never fill a pipe.
+    Setting the 'cancel' event kills the process early.
+    """
+    cpu_seconds = cpu_seconds_for(time_limit)
+    memory_bytes = address_space_for(memory_limit_mb)
+    wall_limit = wall_limit_for(time_limit)
+
+    with open(input_path, "rb") as stdin, tempfile.TemporaryFile() as stdout, tempfile.TemporaryFile() as stderr:
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            _limited_command(cmd, cpu_seconds, memory_bytes),
+            stdin=stdin,
+            stdout=stdout,
+            stderr=stderr,
+            cwd=cwd,
+        )
+        _limit_resources(proc.pid, cpu_seconds, memory_bytes)
+        # kill by pid under a lock: Popen.kill would poll and could reap the child before wait4 sees its rusage
+        reaped = threading.Lock()
+
+        def kill():
+            with reaped:
+                if proc.returncode is None:
+                    os.kill(proc.pid, signal.SIGKILL)
+
+        finished = threading.Event()
+
+        def watchdog():
+            deadline = time.monotonic() + wall_limit
+            while not finished.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or (cancel is not None and cancel.is_set()):
+                    kill()
+                    return
+                # poll the cancel event only when there is one
+                finished.wait(min(remaining, 0.05) if cancel is not None else remaining)
+
+        killer = threading.Thread(target=watchdog, daemon=True)
+        killer.start()
+        try:
+            _, status, usage = os.wait4(proc.pid, 0)
+            with reaped:
+                # the child is already reaped, keep Popen from waiting on it again
+                proc.returncode = os.waitstatus_to_exitcode(status)
+        finally:
+            finished.set()
+        wall_time = time.perf_counter() - start
+
+        stdout.seek(0)
+        stderr.seek(0)
+        return RunResult(
+            exit_code=os.WEXITSTATUS(status) if os.WIFEXITED(status) else None,
+            term_signal=os.WTERMSIG(status) if os.WIFSIGNALED(status) else None,
+            stdout=stdout.read().decode("utf-8", errors="replace"),
+            stderr=stderr.read().decode("utf-8", errors="replace"),
+            wall_time=wall_time,
+            cpu_time=usage.ru_utime + usage.ru_stime,
+            max_rss_kb=usage.ru_maxrss,
+            timed_out=wall_time >= wall_limit,
+        )
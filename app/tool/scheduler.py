@@ -0,0 +1,141 @@
+import time
+import random
+import asyncio
+import httpx
+from typing import Awaitable, Callable, Optional
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """A token bucket that allows 'rate' requests per second with bursts of up to 'capacity' requests."""
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        # the lock makes waiters take tokens one after another, in arrival order
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class FetchScheduler:
+    """
+    A global scheduler for outgoing HTTP requests.
+    Every request waits for a token of the rate limiter and a free concurrency slot,
+    and is retried with jittered exponential backoff on 429/5xx responses and transport errors.
+    """
+    def __init__(
+        self,
+        rate: float = 5.0,
+        burst: int = 10,
+        max_concurrency: int = 8,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        progress_every: int = 10,
+        on_progress: Optional[Callable[[dict], None]] = None,
+    ):
+        """
+        Args:
+            rate (float): Sustained number of requests per second.
+            burst (int): Number of requests that may be sent back-to-back before the rate applies.
+            max_concurrency (int): Maximum number of requests in flight.
+            max_retries (int): Retries of one request before giving up.
+            backoff_base (float): Base delay in seconds of the exponential backoff.
+            backoff_max (float): Upper bound of a single backoff delay.
+            progress_every (int): Print a progress line every N finished requests (0 disables printing).
+            on_progress (Optional[Callable[[dict], None]]): Called with the current stats after every finished request.
+        """
+        self.bucket = TokenBucket(rate, burst)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.progress_every = progress_every
+        self.on_progress = on_progress
+
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+
+    def stats(self) -> dict:
+        return {
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "pending": self.submitted - self.completed - self.failed,
+        }
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(self.backoff_max, float(retry_after))
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _report(self):
+        stats = self.stats()
+        done = stats["completed"] + stats["failed"]
+        if self.progress_every and (done % self.progress_every == 0 or stats["pending"] == 0):
+            print(
+                f"[FetchScheduler]: {done}/{stats['submitted']} requests done "
+                f"({stats['retries']} retries, {stats['failed']} failed)"
+            )
+        if self.on_progress:
+            self.on_progress(stats)
+
+    async def run(self, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        """
+        Run one request through the scheduler.
+
+        Args:
+            send (Callable[[], Awaitable[httpx.Response]]): Issues the request; called again for every retry.
+
+        Returns:
+            httpx.Response: The last response. It may still carry a retryable status if all retries were used up.
+        """
+        self.submitted += 1
+        try:
+            for attempt in range(self.max_retries + 1):
+                response = None
+                await self.bucket.acquire()
+                try:
+                    async with self._slots:
+                        response = await send()
+                    if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                        break
+                except httpx.TransportError:
+                    if attempt == self.max_retries:
+                        raise
+
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt, response))
+        except BaseException:
+            self.failed += 1
+            self._report()
+            raise
+
+        if response.status_code >= 400:
+            self.failed += 1
+        else:
+            self.completed += 1
+        self._report()
+        return response
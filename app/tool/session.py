@@ -0,0 +1,171 @@
+import asyncio
+import httpx
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from app.tool.http_cache import ResponseCache, CacheMissError
+from app.tool.scheduler import FetchScheduler
+
+
+DEFAULT_HEADERS = {
+    "User-Agent": "DBL/0.1 (+https://github.com/T90REAL/DBL)",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+def _http2_available() -> bool:
+    """HTTP/2 in httpx needs the optional 'h2' package (pip install httpx[http2])."""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class HttpSession:
+    """
+    A process-wide, pooled HTTP session shared by the parser tools.
+    It keeps connections alive between requests (and multiplexes them over HTTP/2 when available),
+    and caps how many requests may be in flight against a single host at the same time.
+    With a ResponseCache attached, 'get_text' serves pages from disk and revalidates them with conditional requests.
+    """
+    def __init__(
+        self,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        per_host_limit: int = 4,
+        timeout: float = 15.0,
+        http2: bool = True,
+        headers: Optional[Dict[str, str]] = None,
+        cache: Optional[ResponseCache] = None,
+        scheduler: Optional[FetchScheduler] = None,
+    ):
+        """
+        Args:
+            max_connections (int): Maximum number of open connections in the pool.
+            max_keepalive_connections (int): Maximum number of idle connections kept alive for reuse.
+            keepalive_expiry (float): Seconds an idle connection is kept before it is closed.
+            per_host_limit (int): Maximum number of concurrent requests against one host.
+            timeout (float): Default timeout of a request in seconds.
+            http2 (bool): Use HTTP/2 if the 'h2' package is installed.
+            headers (Optional[Dict[str, str]]): Extra headers sent with every request.
+            cache (Optional[ResponseCache]): On-disk response cache used by 'get_text'. None disables caching.
+            scheduler (Optional[FetchScheduler]): Rate limiter and retry policy applied to every request on the network.
+        """
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.http2 = http2 and _http2_available()
+        self.headers = {**DEFAULT_HEADERS, **(headers or {})}
+        self.cache = cache
+        self.scheduler = scheduler
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # created lazily so that the session can be built outside of a running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=self.limits,
+                timeout=self.timeout,
+                headers=self.headers,
+                follow_redirects=True,
+            )
+        return self._client
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_semaphores[host]
+
+    async def _send_once(self, url: str, **kwargs) -> httpx.Response:
+        async with self._host_semaphore(url):
+            return await self.client.get(url, **kwargs)
+
+    async def _send(self, url: str, **kwargs) -> httpx.Response:
+        if self.scheduler is None:
+            return await self._send_once(url, **kwargs)
+        return await self.scheduler.run(lambda: self._send_once(url, **kwargs))
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """Send a GET request through the shared pool, respecting the per-host concurrency cap."""
+        response = await self._send(url, **kwargs)
+        response.raise_for_status()
+        return response
+
+    async def get_text(self, url: str) -> str:
+        """
+        Return the body of a page, going through the response cache if one is attached.
+        In offline mode only cached pages are served, and a missing page raises CacheMissError.
+        """
+        if self.cache is None:
+            return (await self.get(url)).text
+
+        cached = await self.cache.lookup(url)
+        if cached is not None:
+            entry, body = cached
+            if self.cache.offline or self.cache.is_fresh(entry):
+                return body
+        elif self.cache.offline:
+            raise CacheMissError(f"'{url}' is not cached and the session is offline.")
+
+        headers = ResponseCache.conditional_headers(cached[0]) if cached else {}
+        response = await self._send(url, headers=headers)
+
+        if response.status_code == 304 and cached is not None:
+            await self.cache.revalidated(url, entry)
+            return body
+
+        response.raise_for_status()
+        await self.cache.store(
+            url,
+            response.text,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+        return response.text
+
+    async def aclose(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    async def __aenter__(self) -> "HttpSession":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+
+_shared_session: Optional[HttpSession] = None
+
+
+def get_shared_session() -> HttpSession:
+    """Return the process-wide session, creating it with default settings (cache and scheduler included) on first use."""
+    global _shared_session
+    if _shared_session is None:
+        _shared_session = HttpSession(cache=ResponseCache(), scheduler=FetchScheduler())
+    return _shared_session
+
+
+def set_shared_session(session: HttpSession):
+    """Replace the process-wide session, e.g. to use different connection limits."""
+    global _shared_session
+    _shared_session = session
+
+
+async def close_shared_session():
+    """Close the process-wide session. Call this once before the event loop shuts down."""
+    global _shared_session
+    if _shared_session is not None:
+        await _shared_session.aclose()
+        _shared_session = None
@@ -0,0 +1,244 @@
+import re
+import time
+import asyncio
+import aiofiles
+from pathlib import Path
+from typing import Optional
+
+from app.protocols import AgentMessage
+from app.context import get_problem_context, peek_problem_context
+from app.agent.base import BaseLLM
+from app.llm.scheduler import PRIORITY_CODEGEN
+from app.prompt.builder import build_messages
+from app.tool.judge import compare_tokens
+from app.tool.parser import _write_to_file_async
+from app.tool.problem_spec import resolve_limits
+from app.tool.warm_pool import WarmWorkerPool, get_shared_pool
+
+
+BRUTE_FILE = "brute.py"
+SMALL_GENERATOR_FILE = "gen_small.py"
+# counterexamples found by stress testing are stored from this index on, each run adds the next one
+COUNTEREXAMPLE_START_INDEX = 201
+
+
+def _extract_code(response_str: str) -> str:
+    match = re.search(r"```python\s*\n(.*?)\n\s*```", response_str, re.DOTALL)
+    return match.group(1) if match else response_str
+
+
+async def generate_stress_programs(plan: Optional[dict], description: Optional[str], problem_dir: str, llm: BaseLLM) -> AgentMessage:
+    """
+    Ask the LLM for the two helpers of stress testing, in parallel:
+    a deliberately naive but obviously correct reference solution ('brute.py'),
+    and a generator of small random inputs that takes a seed as its only argument ('gen_small.py').
+    A missing plan or description is taken from the problem context.
+    """
+    source_name = "generate_stress_programs"
+    print(f"\n[Tool: {source_name}]: Writing a brute-force solution and a small input generator for '{problem_dir}'...")
+
+    if plan is None or description is None:
+        context = await get_problem_context(problem_dir)
+        plan = plan if plan is not None else context.plan or {}
+        description = description if description is not None else context.statement
+
+    brute_task = """
+        Write the SIMPLEST possible correct Python solution for the problem above.
+        Ignore the time limit completely: use exhaustive search, brute force or direct simulation, whatever is most obviously correct.
+        It only has to work for very small inputs.
+        1.  Read all input from standard input and write the answer to standard output.
+        2.  Correctness matters far more than speed. Do not optimize.
+        3.  Enclose the code in a ```python ... ``` markdown block and add no other text.
+    """
+    generator_task = """
+        Write a Python program that prints ONE small random valid input for the problem above.
+        1.  The program takes an integer seed from the command line (sys.argv[1]) and calls random.seed with it.
+        2.  Keep every size tiny (e.g. N between 1 and 8, values between 1 and 10) so that a brute-force solution finishes instantly, but still respect all constraints.
+        3.  Vary the sizes with the seed, and sometimes produce the edge cases listed above.
+        4.  Enclose the code in a ```python ... ``` markdown block and add no other text.
+    """
+    edge_cases = str(plan.get('edge_cases_to_consider', 'No specific edge cases listed.'))
+
+    try:
+        (brute_str, brute_time), (generator_str, generator_time) = await asyncio.gather(
+            llm.chat(build_messages(brute_task, description=description), priority=PRIORITY_CODEGEN),
+            llm.chat(build_messages(generator_task, description=description, sections=[("Edge Cases to Focus On", edge_cases)]), priority=PRIORITY_CODEGEN),
+        )
+        # a failed request returns the error message instead of a program
+        if brute_time is None or generator_time is None:
+            error_msg = brute_str if brute_time is None else generator_str
+            print(f"[Tool: {source_name}]: {error_msg}")
+            return AgentMessage(status="failure", source=source_name, message_type="error", error=error_msg)
+        brute_code, generator_code = _extract_code(brute_str), _extract_code(generator_str)
+        if not brute_code.strip() or not generator_code.strip():
+            return AgentMessage(status="failure", source=source_name, message_type="error", error="LLM returned an empty program.")
+
+        target_path = Path(problem_dir)
+        await asyncio.gather(
+            _write_to_file_async(target_path / BRUTE_FILE, brute_code),
+            _write_to_file_async(target_path / SMALL_GENERATOR_FILE, generator_code),
+        )
+
+        summary = f"Saved '{BRUTE_FILE}' and '{SMALL_GENERATOR_FILE}' to '{problem_dir}'."
+        print(f"[Tool: {source_name}]: {summary}")
+        return AgentMessage(source=source_name, message_type="tool_result", payload={"summary": summary})
+    except Exception as e:
+        error_msg = f"Failed to generate the stress testing programs: {e}"
+        print(f"[Tool: {source_name}]: {error_msg}")
+        return AgentMessage(status="failure", source=source_name, message_type="error", error=error_msg)
+
+
+def _save_counterexample(problem_dir: Path, case_input: str, expected: str) -> Path:
+    """
+    Save a counterexample as the first free 'sol_N.in' / 'ans_N.out' pair from COUNTEREXAMPLE_START_INDEX on,
+    so the ones found by earlier runs are kept. An input that was already saved is not added again. Blocking.
+    """
+    index = COUNTEREXAMPLE_START_INDEX
+    while True:
+        input_path = problem_dir / f"sol_{index}.in"
+        try:
+            # exclusive creation claims the index, even against a concurrent run
+            with open(input_path, "x", encoding="utf-8") as f:
+                f.write(case_input)
+        except FileExistsError:
+            if input_path.read_text(encoding="utf-8") == case_input:
+                return input_path
+            index += 1
+            continue
+        (problem_dir / f"ans_{index}.out").write_text(expected, encoding="utf-8")
+        return input_path
+
+
+async def stress_test(
+    problem_dir: str,
+    code_file: str = "main.py",
+    iterations: int = 1000,
+    max_mismatches: int = 10,
+    time_limit: Optional[float] = None,
+    memory_limit_mb: Optional[int] = None,
+    pool: Optional[WarmWorkerPool] = None,
+) -> AgentMessage:
+    """
+    Tool function: compare a solution with the brute-force reference on many small random inputs.
+    Every seed is a generator run plus one run of each solution, spread over all cores by the warm worker pool.
+    The smallest input on which the two disagree is saved as a verified test case (the next free 'sol_N.in' /
+    'ans_N.out' from 'sol_201.in' on), with the brute-force output as the expected answer.
+
+    Args:
+        problem_dir (str): Directory of the problem; it must contain 'brute.py' and 'gen_small.py'.
+        code_file (str): Solution file inside the problem directory.
+        iterations (int): Number of random inputs to try.
+        max_mismatches (int): Stop once this many disagreeing inputs were found.
+        time_limit (Optional[float]): CPU time limit of every single run in seconds. Defaults to the limit in 'problem.json'.
+        memory_limit_mb (Optional[int]): Memory limit of every single run in MB. Defaults to the limit in 'problem.json'.
+        pool (Optional[WarmWorkerPool]): Worker pool to run on. Defaults to the process-wide pool.
+    """
+    source_name = "stress_test"
+    target_path = Path(problem_dir)
+    print(f"\n[Tool: {source_name}]: Stress testing '{target_path / code_file}' against '{BRUTE_FILE}'...")
+
+    sources = {}
+    for name in (code_file, BRUTE_FILE, SMALL_GENERATOR_FILE):
+        try:
+            async with aiofiles.open(target_path / name, "r", encoding="utf-8") as f:
+                sources[name] = await f.read()
+        except FileNotFoundError:
+            error_msg = f"'{name}' does not exist in '{problem_dir}'. Run generate_stress_programs first."
+            print(f"[Tool: {source_name}]: {error_msg}")
+            return AgentMessage(status="failure", source=source_name, message_type="error", error=error_msg)
+
+    time_limit, memory_limit_mb = await asyncio.to_thread(resolve_limits, target_path, time_limit, memory_limit_mb)
+    pool = pool or get_shared_pool()
+    try:
+        await pool.start()
+    except Exception as e:
+        error_msg = f"Could not start the worker pool: {e}"
+        print(f"[Tool: {source_name}]: {error_msg}")
+        return AgentMessage(status="failure", source=source_name, message_type="error", error=error_msg)
+
+    def run(name: str, stdin: bytes = b"", argv=()):
+        return pool.run(
+            sources[name],
+            filename=str((target_path / name).resolve()),
+            stdin=stdin,
+            argv=argv,
+            time_limit=time_limit,
+            memory_limit_mb=memory_limit_mb,
+            cwd=target_path,
+        )
+
+    seeds = iter(range(1, iterations + 1))
+    mismatches = []
+    stats = {"tested": 0, "unverifiable": 0, "generator_errors": 0}
+    stop = asyncio.Event()
+
+    async def worker():
+        for seed in seeds:
+            if stop.is_set():
+                return
+            generated = await run(SMALL_GENERATOR_FILE, argv=[str(seed)])
+            if generated.exit_code != 0 or generated.timed_out:
+                stats["generator_errors"] += 1
+                if stats["generator_errors"] >= 5:
+                    stop.set()
+                continue
+            case_input = generated.stdout.encode("utf-8")
+
+            expected, actual = await asyncio.gather(run(BRUTE_FILE, case_input), run(code_file, case_input))
+            if expected.exit_code != 0 or expected.timed_out:
+                # the reference itself failed, so this input cannot be verified
+                stats["unverifiable"] += 1
+                continue
+
+            stats["tested"] += 1
+            if actual.exit_code != 0 or actual.timed_out or not compare_tokens(actual.stdout, expected.stdout):
+                mismatches.append({
+                    "seed": seed,
+                    "input": generated.stdout,
+                    "expected": expected.stdout,
+                    "actual": actual.stdout if actual.exit_code == 0 else actual.stderr.strip()[-500:],
+                })
+                if len(mismatches) >= max_mismatches:
+                    stop.set()
+
+    start = time.perf_counter()
+    # two workers per pool slot keep every worker busy while the others wait for replies
+    workers = [asyncio.ensure_future(worker()) for _ in range(pool.size * 2)]
+    try:
+        await asyncio.gather(*workers)
+    except Exception as e:
+        error_msg = f"Stress test aborted after {stats['tested']} verified inputs: {e}"
+        print(f"[Tool: {source_name}]: {error_msg}")
+        return AgentMessage(status="failure", source=source_name, message_type="error", error=error_msg)
+    finally:
+        # one failing worker (e.g. the pool lost a process) must not leave the others running
+        stop.set()
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    rate = stats["tested"] / elapsed if elapsed > 0 else 0.0
+
+    if stats["generator_errors"] >= 5 and not stats["tested"]:
+        error_msg = f"'{SMALL_GENERATOR_FILE}' keeps failing, no input could be generated."
+        print(f"[Tool: {source_name}]: {error_msg}")
+        return AgentMessage(status="failure", source=source_name, message_type="error", error=error_msg)
+
+    payload = {**stats, "mismatches": len(mismatches), "cases_per_second": round(rate, 1)}
+    if not mismatches:
+        summary = f"No disagreement on {stats['tested']} random inputs ({rate:.1f} verified cases/s)."
+    else:
+        minimal = min(mismatches, key=lambda m: (len(m["input"]), m["seed"]))
+        input_path = await asyncio.to_thread(_save_counterexample, target_path, minimal["input"], minimal["expected"])
+        context = peek_problem_context(problem_dir)
+        if context is not None:
+            await context.refresh_tests()
+        summary = (
+            f"Found {len(mismatches)} disagreeing inputs in {stats['tested']} tries ({rate:.1f} verified cases/s). "
+            f"The smallest one (seed {minimal['seed']}) was saved as '{input_path.name}'."
+        )
+        payload["counterexample"] = minimal
+    payload["summary"] = summary
+    print(f"[Tool: {source_name}]: {summary}")
+
+    return AgentMessage(source=source_name, message_type="tool_result", payload=payload)
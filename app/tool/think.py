@@ -1,9 +1,12 @@
 import json
-import aiofiles
-from pathlib import Path
+from typing import List, Optional, Union
+from pydantic import BaseModel, ValidationError
 
 from app.protocols import AgentMessage
+from app.context import get_problem_context
 from app.agent.base import BaseLLM
+from app.llm.scheduler import PRIORITY_ANALYSIS, PRIORITY_PLAN
+from app.prompt.builder import build_messages
 
 async def analyze_problem(problem_dir: str, llm: BaseLLM) -> AgentMessage:
 	"""
@@ -16,22 +19,25 @@ async def analyze_problem(problem_dir: str, llm: BaseLLM) -> AgentMessage:
 	if problem_dir.endswith("/"):
 		problem_dir = problem_dir[:-1]
 
-	problem_path = Path(problem_dir) / "problem.md"
 	try:
-		async with aiofiles.open(problem_path, "r", encoding="utf-8") as f:
-			description = await f.read()
-	except FileNotFoundError:
-		error_msg = f"Could not find problem file at {problem_path}"
+		context = await get_problem_context(problem_dir)
+	except FileNotFoundError as e:
+		error_msg = str(e)
 		print(f"[Tool: {source_name}]: {error_msg}")
 		return AgentMessage(status="failure", source=source_name, message_type="error", error=error_msg)
+	if context.analysis is not None:
+		print(f"[Tool: {source_name}]: Reusing the analysis of this problem.")
+		return AgentMessage(source=source_name, message_type="tool_result", payload={"analysis": context.analysis})
+	if context.spec is not None and context.spec.constraints and context.spec.input_format:
+		# everything the LLM would extract was parsed from the page already
+		context.analysis = context.spec.analysis()
+		summary = "Took the key information from the parsed problem.json, no LLM call needed."
+		print(f"[Tool: {source_name}]: {summary}")
+		return AgentMessage(source=source_name, message_type="tool_result", payload={"summary": summary, "analysis": context.analysis})
+	description = context.statement
 
-	prompt = f"""
-		You are a meticulous assistant for a competitive programming AI. Your task is to carefully read the following problem description and extract key information into a structured JSON format.
-
-		### Problem Description
-		{description}
-
-		### Instructions
+	task = """
+		You are a meticulous assistant for a competitive programming AI. Carefully read the problem statement above and extract key information into a structured JSON format.
 		Extract the following information and provide it in a single JSON object with the specified keys:
 		1.  "problem_type": A brief classification of the problem (e.g., "Graph Theory", "Dynamic Programming", "Math", "String Manipulation", "Ad-hoc").
 		2.  "input_format": A concise description of how the input is given from Standard Input.
@@ -40,16 +46,12 @@ async def analyze_problem(problem_dir: str, llm: BaseLLM) -> AgentMessage:
 
 		Your response MUST be only the JSON object.
 	"""
-	
-	messages = [
-		{"role": "system", "content": "You are a meticulous assistant for a competitive programming AI. Your task is to carefully read the following problem description and extract key information into a structured JSON format."},
-		{"role": "user", "content": prompt}
-	]
+	# the problem statement comes before the task, so the later stages reuse the cached prefix
+	messages = build_messages(task, description=description)
 	
 	try:
-		response_str, _ = await llm.chat(messages, format_type="json")
-
-		analysis_data = json.loads(response_str)
+		analysis_data, _ = await llm.chat_json(messages, priority=PRIORITY_ANALYSIS)
+		context.analysis = analysis_data
 		
 		summary = "Successfully analyzed the problem and extracted key information."
 		print(f"[Tool: {source_name}]: {summary}")
@@ -69,25 +71,23 @@ async def analyze_problem(problem_dir: str, llm: BaseLLM) -> AgentMessage:
 		)
 
 
-async def plan_solution_strategy(analysis: dict, description: str, llm: BaseLLM) -> AgentMessage:
+async def plan_solution_strategy(analysis: Optional[dict], description: Optional[str], llm: BaseLLM, problem_dir: Optional[str] = None) -> AgentMessage:
 	"""
 	Based on the structured analysis results and original descriptions to develop a solution strategy.
+	With 'problem_dir', a missing analysis or description is taken from the problem context, and the plan is stored there.
 	"""
 	source_name = "plan_solution_strategy"
 	print(f"\n[Tool: {source_name}]: Devising a solution strategy...")
+
+	context = await get_problem_context(problem_dir) if problem_dir else None
+	if context is not None:
+		analysis = analysis if analysis is not None else context.analysis or {}
+		description = description if description is not None else context.statement
 	
 	analysis_str = json.dumps(analysis, indent=2)
 
-	prompt = f"""
-		You are a world-class competitive programmer and algorithm expert. Your task is to devise a high-level plan to solve the given problem.
-
-		### Structured Analysis of the Problem
-		{analysis_str}
-
-		### Full Problem Description
-		{description}
-
-		### Instructions
+	task = """
+		Devise a high-level plan to solve the problem above.
 		Based on all the information provided, create a step-by-step plan to solve the problem. Your plan should include:
 		1.  "algorithm": The name of the main algorithm or data structure to be used (e.g., "Dijkstra's Algorithm", "Segment Tree", "Depth First Search").
 		2.  "data_structures": Any necessary data structures (e.g., "Adjacency List for graph", "Priority Queue", "2D DP array").
@@ -96,14 +96,12 @@ async def plan_solution_strategy(analysis: dict, description: str, llm: BaseLLM)
 
 		Respond with a single JSON object containing these keys. Your response MUST be only the JSON object.
 	"""
-	messages = [
-		{"role": "system", "content": "You are a world-class competitive programmer and algorithm expert. Your task is to devise a high-level plan to solve the given problem."},
-		{"role": "user", "content": prompt}
-	]
+	messages = build_messages(task, description=description, sections=[("Structured Analysis of the Problem", analysis_str)])
 
 	try:
-		response_str, _ = await llm.chat(messages, format_type="json")
-		plan_data = json.loads(response_str)
+		plan_data, _ = await llm.chat_json(messages, priority=PRIORITY_PLAN)
+		if context is not None:
+			context.plan = plan_data
 		
 		summary = f"Successfully created a solution plan. Chosen algorithm: {plan_data.get('algorithm', 'N/A')}"
 		print(f"[Tool: {source_name}]: {summary}")
@@ -116,3 +114,97 @@ async def plan_solution_strategy(analysis: dict, description: str, llm: BaseLLM)
 		error_msg = f"Failed to create a plan due to LLM or JSON parsing error: {e}"
 		print(f"[Tool: {source_name}]: {error_msg}")
 		return AgentMessage(status="failure", source=source_name, message_type="error", error=error_msg)
+
+
+class ProblemAnalysis(BaseModel):
+	"""The key information 'analyze_problem' extracts from a statement."""
+	problem_type: str
+	input_format: str
+	output_format: str
+	constraints: Union[str, List[str]]
+
+
+class SolutionPlan(BaseModel):
+	"""The plan 'plan_solution_strategy' devises."""
+	algorithm: str
+	data_structures: Union[str, List[str]]
+	step_by_step_plan: Union[str, List[str]]
+	edge_cases_to_consider: Union[str, List[str]]
+
+
+class AnalysisAndPlan(BaseModel):
+	"""The answer of the fused call: both results in one object."""
+	analysis: ProblemAnalysis
+	plan: SolutionPlan
+
+
+async def analyze_and_plan(problem_dir: str, llm: BaseLLM) -> AgentMessage:
+	"""
+	Analyze the problem and devise the plan in one LLM call instead of two: the second call would re-send the
+	statement together with the first call's JSON. The answer is validated against the AnalysisAndPlan schema;
+	if it does not fit, the two-call path ('analyze_problem', then 'plan_solution_strategy') is used instead.
+	An analysis that is already known (from the context or 'problem.json') is kept, and then only the plan is asked for.
+	Both results are stored in the problem context.
+	"""
+	source_name = "analyze_and_plan"
+	print(f"\n[Tool: {source_name}]: Analyzing and planning problem in '{problem_dir}'...")
+
+	try:
+		context = await get_problem_context(problem_dir)
+	except FileNotFoundError as e:
+		error_msg = str(e)
+		print(f"[Tool: {source_name}]: {error_msg}")
+		return AgentMessage(status="failure", source=source_name, message_type="error", error=error_msg)
+	if context.analysis is not None or (context.spec is not None and context.spec.constraints and context.spec.input_format):
+		# nothing to fuse: the analysis costs no LLM call
+		return await _two_calls(problem_dir, llm, source_name)
+
+	schema = json.dumps(AnalysisAndPlan.model_json_schema(), indent=2)
+	task = f"""
+		You are an expert competitive programmer. Carefully read the problem statement above, extract its key information and devise a high-level plan to solve it.
+		Respond with a single JSON object with two keys:
+		1.  "analysis": {{"problem_type": a brief classification (e.g. "Graph Theory", "Dynamic Programming"), "input_format": how the input is given, "output_format": what to print, "constraints": all constraints on the input}}.
+		2.  "plan": {{"algorithm": the main algorithm or data structure, "data_structures": the necessary data structures, "step_by_step_plan": the logic from reading input to printing the output, "edge_cases_to_consider": a list of edge cases}}.
+
+		The object MUST follow this JSON schema:
+		{schema}
+
+		Your response MUST be only the JSON object.
+	"""
+	# the statement first, as in the two-call path, so the later stages reuse the cached prefix
+	messages = build_messages(task, description=context.statement)
+
+	try:
+		result, _ = await llm.chat_json(messages, schema=AnalysisAndPlan, priority=PRIORITY_ANALYSIS)
+	except (ValidationError, ValueError) as e:
+		print(f"[Tool: {source_name}]: The fused answer does not fit the schema ({str(e).splitlines()[0]}), falling back to two calls.")
+		return await _two_calls(problem_dir, llm, source_name)
+
+	context.analysis = result.analysis.model_dump()
+	context.plan = result.plan.model_dump()
+	summary = f"Analyzed the problem and created a solution plan in one call. Chosen algorithm: {result.plan.algorithm}"
+	print(f"[Tool: {source_name}]: {summary}")
+	return AgentMessage(
+		source=source_name,
+		message_type="tool_result",
+		payload={"summary": summary, "analysis": context.analysis, "plan": context.plan, "fused": True}
+	)
+
+
+async def _two_calls(problem_dir: str, llm: BaseLLM, source_name: str) -> AgentMessage:
+	analysis_msg = await analyze_problem(problem_dir=problem_dir, llm=llm)
+	if analysis_msg.status == 'failure':
+		return analysis_msg
+	plan_msg = await plan_solution_strategy(analysis=None, description=None, llm=llm, problem_dir=problem_dir)
+	if plan_msg.status == 'failure':
+		return plan_msg
+	return AgentMessage(
+		source=source_name,
+		message_type="tool_result",
+		payload={
+			"summary": f"Analyzed the problem and created a solution plan in two calls. Chosen algorithm: {plan_msg.payload['plan'].get('algorithm', 'N/A')}",
+			"analysis": analysis_msg.payload["analysis"],
+			"plan": plan_msg.payload["plan"],
+			"fused": False,
+		}
+	)
@@ -0,0 +1,187 @@
+import os
+import sys
+import pickle
+import signal
+import struct
+import asyncio
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+from app.tool.runner import RunResult, cpu_seconds_for, wall_limit_for, address_space_for
+
+
+WORKER_SCRIPT = Path(__file__).with_name("_warm_worker.py")
+
+
+class WarmWorker:
+    """Client side of one warm interpreter process (see '_warm_worker.py')."""
+    def __init__(self, proc: asyncio.subprocess.Process):
+        self.proc = proc
+
+    @classmethod
+    async def spawn(cls) -> "WarmWorker":
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, str(WORKER_SCRIPT),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+        )
+        return cls(proc)
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.returncode is None
+
+    async def send(self, request: dict):
+        data = pickle.dumps(request)
+        self.proc.stdin.write(struct.pack(">I", len(data)) + data)
+        await self.proc.stdin.drain()
+
+    async def receive(self) -> dict:
+        header = await self.proc.stdout.readexactly(4)
+        size = struct.unpack(">I", header)[0]
+        return pickle.loads(await self.proc.stdout.readexactly(size))
+
+    def cancel_run(self):
+        """Ask the worker to kill the solution it is currently running. The worker still replies to the request."""
+        if self.alive:
+            self.proc.send_signal(signal.SIGUSR1)
+
+    async def close(self):
+        if self.alive:
+            self.proc.stdin.close()
+            try:
+                await asyncio.wait_for(self.proc.wait(), timeout=2)
+            except asyncio.TimeoutError:
+                self.proc.kill()
+                await self.proc.wait()
+
+
+class WarmWorkerPool:
+    """
+    A pool of pre-started Python workers for judging Python solutions.
+    Each run is forked from a warm worker instead of starting a new interpreter, which removes the
+    interpreter start-up from every test case. The forked child is thrown away after the run, so runs stay isolated.
+    """
+    def __init__(self, size: Optional[int] = None):
+        """
+        Args:
+            size (Optional[int]): Number of workers, i.e. runs executed at the same time. Defaults to the number of CPUs.
+        """
+        self.size = size or os.cpu_count() or 1
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers: List[WarmWorker] = []
+        self._start_lock = asyncio.Lock()
+
+    async def start(self):
+        async with self._start_lock:
+            if self._idle is not None:
+                return
+            self._workers = list(await asyncio.gather(*[WarmWorker.spawn() for _ in range(self.size)]))
+            self._idle = asyncio.Queue()
+            for worker in self._workers:
+                self._idle.put_nowait(worker)
+
+    async def _replace(self, worker: WarmWorker) -> WarmWorker:
+        await worker.close()
+        fresh = await WarmWorker.spawn()
+        self._workers[self._workers.index(worker)] = fresh
+        return fresh
+
+    async def _release_after_reply(self, worker: WarmWorker):
+        """Finish a cancelled request in the background so the worker's stream stays in sync."""
+        try:
+            worker.cancel_run()
+            await worker.receive()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            worker = await self._replace(worker)
+        self._idle.put_nowait(worker)
+
+    async def run(
+        self,
+        source: str,
+        filename: str = "main.py",
+        input_path: Optional[Path] = None,
+        stdin: bytes = b"",
+        argv: Sequence[str] = (),
+        time_limit: float = 2.0,
+        memory_limit_mb: int = 1024,
+        cwd: Optional[Path] = None,
+    ) -> RunResult:
+        """
+        Run a Python source on one input in a fresh fork of a warm worker.
+
+        Args:
+            source (str): Python source of the program. It is compiled once per worker and cached.
+            filename (str): File name shown in tracebacks and used as sys.argv[0].
+            input_path (Optional[Path]): File used as stdin. Takes precedence over 'stdin'.
+            stdin (bytes): Input data if no input file is given.
+            argv (Sequence[str]): Extra command-line arguments.
+            time_limit (float): CPU time limit in seconds (the wall-clock limit is derived from it).
+            memory_limit_mb (int): Memory limit in MB.
+            cwd (Optional[Path]): Working directory of the run.
+        """
+        await self.start()
+        request = {
+            "source": source,
+            "filename": filename,
+            "argv": list(argv),
+            "cpu_seconds": cpu_seconds_for(time_limit),
+            "memory_bytes": address_space_for(memory_limit_mb),
+            "wall_limit": wall_limit_for(time_limit),
+            "cwd": str(cwd) if cwd else None,
+        }
+        if input_path is not None:
+            request["input_path"] = str(Path(input_path).resolve())
+        else:
+            request["stdin"] = stdin
+
+        worker = await self._idle.get()
+        try:
+            if not worker.alive:
+                worker = await self._replace(worker)
+            await worker.send(request)
+            reply = await worker.receive()
+        except asyncio.CancelledError:
+            asyncio.ensure_future(self._release_after_reply(worker))
+            raise
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            self._idle.put_nowait(await self._replace(worker))
+            raise RuntimeError(f"Warm worker died while running '{filename}': {e}") from e
+
+        self._idle.put_nowait(worker)
+        if "error" in reply:
+            raise RuntimeError(f"Warm worker failed to run '{filename}':\n{reply['error']}")
+        return RunResult(**reply)
+
+    async def close(self):
+        if self._idle is None:
+            return
+        await asyncio.gather(*[worker.close() for worker in self._workers])
+        self._workers = []
+        self._idle = None
+
+    async def __aenter__(self) -> "WarmWorkerPool":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+_shared_pool: Optional[WarmWorkerPool] = None
+
+
+def get_shared_pool() -> WarmWorkerPool:
+    """Return the process-wide worker pool. Its workers are started on first use."""
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = WarmWorkerPool()
+    return _shared_pool
+
+
+async def close_shared_pool():
+    """Stop the workers of the process-wide pool. Call this once before the event loop shuts down."""
+    global _shared_pool
+    if _shared_pool is not None:
+        await _shared_pool.close()
+        _shared_pool = None
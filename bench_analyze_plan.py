@@ -0,0 +1,116 @@
+"""
+Compare the two-call analyze -> plan path with the fused 'analyze_and_plan' call on a fixed set of parsed problems.
+Latency and tokens come from the LLM metrics; plan quality is measured downstream, by generating code from each
+plan and judging it on the local tests of the problem.
+
+usage: python bench_analyze_plan.py CONTEST_OR_PROBLEM_DIR ... [--model deepseek-r1:8b] [--no-judge]
+"""
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+from app.llm.ollama import OllamaLLM
+from app.llm.metrics import LLMMetrics, current_problem
+from app.context import get_problem_context, invalidate_problem_context, STATEMENT_FILE
+from app.tool.think import analyze_problem, plan_solution_strategy, analyze_and_plan
+from app.tool.code_gen import generate_code
+from app.tool.judge import judge_solution, AC
+from app.tool.warm_pool import close_shared_pool
+
+
+def problem_dirs(paths):
+    """Problem directories, given directly or as the contest directories written by 'parser_pipeline'."""
+    dirs = []
+    for path in map(Path, paths):
+        if (path / STATEMENT_FILE).exists():
+            dirs.append(path)
+        else:
+            dirs.extend(sorted(child for child in path.iterdir() if (child / STATEMENT_FILE).exists()))
+    return dirs
+
+
+async def two_calls(problem_dir, llm):
+    analysis_msg = await analyze_problem(problem_dir=str(problem_dir), llm=llm)
+    if analysis_msg.status == 'failure':
+        return analysis_msg
+    return await plan_solution_strategy(analysis=None, description=None, llm=llm, problem_dir=str(problem_dir))
+
+
+async def fused(problem_dir, llm):
+    return await analyze_and_plan(problem_dir=str(problem_dir), llm=llm)
+
+
+async def run_mode(name, solve, dirs, llm, judge):
+    """One row per problem: latency of the analysis and plan, tokens, and the verdict of the code written from the plan."""
+    rows = []
+    for problem_dir in dirs:
+        invalidate_problem_context(problem_dir)
+        context = await get_problem_context(problem_dir)
+        # without it the analysis would be taken from problem.json and there would be nothing to compare
+        context.spec = None
+        current_problem.set(problem_dir.name)
+
+        llm.metrics = LLMMetrics()
+        start = time.perf_counter()
+        result = await solve(problem_dir, llm)
+        latency = time.perf_counter() - start
+        usage = llm.metrics.aggregate("problem").get(problem_dir.name, {})
+
+        verdict = "-"
+        if judge and result.status == 'success':
+            code_file = f"main_bench_{name}.py"
+            code_msg = await generate_code(plan=context.plan, description=context.statement, problem_dir=str(problem_dir), llm=llm, code_file=code_file)
+            if code_msg.status == 'success':
+                judge_msg = await judge_solution(problem_dir=str(problem_dir), code_file=code_file)
+                if judge_msg.status == 'success':
+                    verdict = f"{judge_msg.payload['verdict']} {judge_msg.payload['passed']}/{judge_msg.payload['total']}"
+        rows.append({
+            "problem": problem_dir.name,
+            "status": result.status,
+            "fused": (result.payload or {}).get("fused", False),
+            "latency": latency,
+            "calls": usage.get("calls", 0),
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
+            "verdict": verdict,
+        })
+    for problem_dir in dirs:
+        # the next mode starts from scratch, and nobody else gets the context without its spec
+        invalidate_problem_context(problem_dir)
+    return rows
+
+
+def print_rows(name, rows):
+    print(f"\n=== {name} ===")
+    print(f"{'problem':<12} {'status':<8} {'fused':<6} {'latency s':>10} {'calls':>6} {'prompt':>8} {'completion':>11}  verdict")
+    for row in rows:
+        print(f"{row['problem']:<12} {row['status']:<8} {str(row['fused']):<6} {row['latency']:>10.2f} {row['calls']:>6} {row['prompt_tokens']:>8} {row['completion_tokens']:>11}  {row['verdict']}")
+    accepted = sum(row["verdict"].startswith(AC) for row in rows)
+    print(f"{'TOTAL':<12} {'':<8} {'':<6} {sum(r['latency'] for r in rows):>10.2f} {sum(r['calls'] for r in rows):>6} "
+          f"{sum(r['prompt_tokens'] for r in rows):>8} {sum(r['completion_tokens'] for r in rows):>11}  {accepted}/{len(rows)} AC")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fused analyze+plan call against the two-call path.")
+    parser.add_argument("paths", nargs="+", help="Contest or problem directories written by the parser pipeline.")
+    parser.add_argument("--model", default="deepseek-r1:8b")
+    parser.add_argument("--no-judge", action="store_true", help="Skip generating and judging code from the plans.")
+    args = parser.parse_args()
+
+    dirs = problem_dirs(args.paths)
+    if not dirs:
+        print("No problem directories found.")
+        return
+    # no response cache: both modes must really talk to the model
+    llm = OllamaLLM(model_name=args.model)
+
+    try:
+        for name, solve in (("two_calls", two_calls), ("fused", fused)):
+            print_rows(name, await run_mode(name, solve, dirs, llm, judge=not args.no_judge))
+    finally:
+        await close_shared_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
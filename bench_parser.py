@@ -0,0 +1,97 @@
+"""
+Compare the BeautifulSoup and the single-pass lxml extractors of problem pages.
+
+usage: python bench_parser.py [page.html ... | contest_url] [iterations]
+       python bench_parser.py --check [page.html ...]
+
+--check only compares the output of the two extractors, on the pages in fixtures/atcoder by default,
+prints the fields that differ and exits with status 1 if any page differs.
+"""
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures" / "atcoder"
+
+from app.tool.parser import parse_contest_page, extract_problem_bs4
+from app.tool.fast_parser import extract_problem_lxml
+from app.tool.session import get_shared_session, close_shared_session
+
+
+async def load_pages(sources):
+    """(url, html) pairs from local files, or from the task pages of a contest (served by the response cache if warm)."""
+    if len(sources) == 1 and sources[0].startswith("http"):
+        session = get_shared_session()
+        try:
+            contest = await parse_contest_page(sources[0], session=session)
+            urls = contest.payload["problem_urls"] if contest.payload else []
+            return list(zip(urls, await asyncio.gather(*[session.get_text(url) for url in urls])))
+        finally:
+            await close_shared_session()
+    # local pages are treated as AtCoder pages
+    return [(f"https://atcoder.jp/local/{Path(source).stem}", Path(source).read_text(encoding="utf-8")) for source in sources]
+
+
+def timeit(extractor, page, url, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        extractor(page, url)
+    return (time.perf_counter() - start) / iterations
+
+
+def differences(expected: dict, actual: dict, path: str = "") -> list:
+    """The keys (e.g. 'spec.statement') at which two extracted results differ."""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        found = []
+        for key in sorted(expected.keys() | actual.keys()):
+            found += differences(expected.get(key), actual.get(key), f"{path}.{key}" if path else key)
+        return found
+    return [] if expected == actual else [path]
+
+
+def check(sources) -> int:
+    pages = asyncio.run(load_pages(sources or sorted(str(path) for path in FIXTURE_DIR.glob("*.html"))))
+    failed = 0
+    for url, page in pages:
+        expected, actual = extract_problem_bs4(page, url), extract_problem_lxml(page, url)
+        diff = differences(expected, actual)
+        failed += bool(diff)
+        print(f"{url.rsplit('/', 1)[-1]:<40} {'same' if not diff else 'DIFFERENT'}")
+        for key in diff:
+            print(f"    {key}:\n        bs4:  {_value(expected, key)!r}\n        lxml: {_value(actual, key)!r}")
+    print(f"{len(pages) - failed}/{len(pages)} pages extracted identically.")
+    return 1 if failed or not pages else 0
+
+
+def _value(result: dict, key: str):
+    for part in key.split("."):
+        result = result.get(part) if isinstance(result, dict) else None
+    return result
+
+
+def main():
+    args = sys.argv[1:]
+    if args and args[0] == "--check":
+        sys.exit(check(args[1:]))
+    iterations = int(args.pop()) if args and args[-1].isdigit() else 50
+    if not args:
+        print(__doc__)
+        return
+
+    pages = asyncio.run(load_pages(args))
+    total_bs4 = total_lxml = 0.0
+    print(f"{'page':<40} {'bs4 ms':>9} {'lxml ms':>9} {'speedup':>8}  same")
+    for url, page in pages:
+        same = extract_problem_bs4(page, url) == extract_problem_lxml(page, url)
+        bs4_time = timeit(extract_problem_bs4, page, url, iterations)
+        lxml_time = timeit(extract_problem_lxml, page, url, iterations)
+        total_bs4 += bs4_time
+        total_lxml += lxml_time
+        print(f"{url.rsplit('/', 1)[-1]:<40} {bs4_time * 1000:>9.2f} {lxml_time * 1000:>9.2f} {bs4_time / lxml_time:>7.1f}x  {same}")
+    if pages:
+        print(f"{'TOTAL':<40} {total_bs4 * 1000:>9.2f} {total_lxml * 1000:>9.2f} {total_bs4 / total_lxml:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
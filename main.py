@@ -1,12 +1,16 @@
 from app.agent.get_prob import *
-from app.llm.lan import LAN_LLM
-from app.llm.ollama import Ollama_LLM
+from app.llm.lan import LANLLM
+from app.llm.ollama import OllamaLLM
 from app.tool.pipeline import *
+from app.tool.session import close_shared_session
 
 
 async def main():
     contest_url = "https://atcoder.jp/contests/abc363"
-    await parser_pipeline(contest_url=contest_url)
+    try:
+        await parser_pipeline(contest_url=contest_url)
+    finally:
+        await close_shared_session()
 
     # agent = GetProblemAgent(name="work")
     # await agent.execute(contest_url=contest_url)
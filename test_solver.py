@@ -7,12 +7,15 @@ from app.tool.pipeline import parser_pipeline
 from app.tool.think import analyze_problem, plan_solution_strategy
 from app.llm.ollama import OllamaLLM
 from app.llm.lan import LANLLM
+from app.llm.router import RouterLLM
 from app.tool.case_gen import decide_and_generate_test_cases
+from app.tool.session import close_shared_session
 
 async def main():
     contest_url = "https://atcoder.jp/contests/abc363"
     print("--- STAGE 1: Preparing problem data... ---")
     parsing_result_msg = await parser_pipeline(contest_url)
+    await close_shared_session()
     if parsing_result_msg.status == 'failure':
         print(f"Pipeline failed: {parsing_result_msg.error}")
         return
@@ -26,6 +29,10 @@ async def main():
 
     # llm = OllamaLLM(model_name="gemma3:4b")
     llm = OllamaLLM(model_name="deepseek-r1:8b")
+    # spread the requests over several hosts, e.g.:
+    # llm = await RouterLLM.create([llm, await LANLLM.create(model_name="deepseek-r1:8b", host="http://192.168.1.100:10000")])
+    llm.enable_cache()
+    llm.enable_metrics()
 
     print("\n--- STAGE 2: Executing 'analyze_problem' tool... ---")
     
@@ -38,17 +45,13 @@ async def main():
         print("\nAnalysis failed. Stopping test.")
         return
 
-    try:
-        description = (target_problem_dir / "problem.md").read_text(encoding="utf-8")
-    except FileNotFoundError:
-        print("Could not read problem description for planning step.")
-        return
-        
+    # the statement and the analysis are shared through the problem context, loaded once
     print("\n--- STAGE 3: Executing 'plan_solution_strategy' tool... ---")
     plan_msg = await plan_solution_strategy(
-        analysis=analysis_msg.payload.get("analysis", {}),
-        description=description,
-        llm=llm
+        analysis=None,
+        description=None,
+        llm=llm,
+        problem_dir=str(target_problem_dir)
     )
     
     print("\n--- PLAN RESULT ---")
@@ -56,8 +59,8 @@ async def main():
 
     print("\n--- STAGE 4: Executing 'decide_and_generate_test_cases' tool... ---")
     generation_decision_msg = await decide_and_generate_test_cases(
-        plan=plan_msg.payload.get("plan", {}),
-        description=description,
+        plan=None,
+        description=None,
         problem_dir=str(target_problem_dir),
         llm=llm
     )
@@ -65,6 +68,8 @@ async def main():
     print("\n--- FINAL RESULT OF THE FLOW ---")
     print(generation_decision_msg.to_json())
     
+    print(f"\nLLM cache: {llm.cache.stats()}")
+    print(f"\nLLM usage per stage:\n{llm.metrics.summary_table('caller')}")
     print("\n--- TEST COMPLETE ---")
 
 if __name__ == "__main__":